@@ -0,0 +1,310 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .profiling import current_profile
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() in ("1", "true", "yes")
+# Requisições em andamento por worker, todas as classes somadas; 0 usa o dobro de DB_POOL_MAXSIZE.
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "0"))
+# Requisições esperando vaga, por worker; além disso, são rejeitadas na hora.
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "200"))
+# Limite por cliente (token bucket): requisições por segundo e rajada; 0 desliga.
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "50"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "100"))
+# Identifica o cliente pelo primeiro endereço de X-Forwarded-For (só atrás de um proxy confiável).
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() in ("1", "true", "yes")
+# Clientes lembrados pelo rate limiter; os vistos há mais tempo são esquecidos primeiro.
+RATE_LIMIT_MAX_CLIENTS = 10_000
+
+
+@dataclass(frozen=True)
+class PriorityClass:
+    name: str
+    rank: int  # menor = atendido primeiro
+    # Fração da capacidade em uso a partir da qual a classe espera: a diferença
+    # entre as classes é a capacidade reservada para as de cima.
+    admit_below: float
+    max_wait: float  # segundos na fila antes do 503
+    retry_after: int
+
+
+CRITICAL = PriorityClass("critical", 0, 1.0, 5.0, 1)
+NORMAL = PriorityClass("normal", 1, 0.8, 2.0, 2)
+LOW = PriorityClass("low", 2, 0.5, 0.5, 10)
+
+
+@dataclass(frozen=True)
+class RoutePolicy:
+    priority: PriorityClass
+    max_concurrency: Optional[int] = None  # limite próprio da rota, além do da classe
+
+
+DEFAULT_POLICY = RoutePolicy(NORMAL)
+# Listagens completas (`stream=true`) varrem a tabela inteira.
+FULL_LISTING_POLICY = RoutePolicy(LOW, 2)
+# Valores que o pydantic aceita como verdadeiro num parâmetro bool, sem diferenciar maiúsculas.
+TRUTHY_VALUES = {"1", "on", "t", "true", "y", "yes"}
+LISTING_ROUTES = ("/users/", "/vehicles/", "/employee/", "/rental/")
+
+# (método, template da rota) -> política. As reservas e o que o balcão precisa para
+# fazê-las vêm primeiro; relatórios e cargas em lote cedem sob carga.
+ROUTE_POLICIES: Dict[Tuple[str, str], RoutePolicy] = {
+    ("POST", "/rental/"): RoutePolicy(CRITICAL),
+    ("PUT", "/rental/{rental_id}"): RoutePolicy(CRITICAL),
+    ("POST", "/rental/quote"): RoutePolicy(CRITICAL),
+    ("GET", "/vehicles/availability"): RoutePolicy(CRITICAL),
+    ("GET", "/rental/reports/summary"): RoutePolicy(LOW, 2),
+    ("GET", "/rental/reports/timeseries"): RoutePolicy(LOW, 2),
+    ("GET", "/jobs/{job_id}/result"): RoutePolicy(LOW, 4),
+    **{
+        (method, f"{prefix}{path}"): RoutePolicy(LOW, 2)
+        for prefix in LISTING_ROUTES
+        for method, path in (("POST", "bulk"), ("PUT", "bulk"), ("POST", "bulk/delete"))
+    },
+}
+
+# Sem controle: health, métricas, o feed de eventos (conexões longas) e a documentação.
+EXEMPT_ROUTES = {"/", "/health/db", "/health/ready", "/metrics", "/vehicles/stream", "/openapi.json", "/docs", "/redoc"}
+
+
+class AdmissionRejectedError(Exception):
+    def __init__(self, priority: PriorityClass, reason: str):
+        self.priority = priority
+        self.reason = reason
+        super().__init__(f"Server busy ({reason}); retry in {priority.retry_after}s")
+
+
+def route_policy(method: str, route: str, query_string: bytes) -> Tuple[RoutePolicy, str]:
+    """Política da requisição e a chave que conta as requisições da rota em andamento."""
+    key = f"{method} {route}"
+    if method == "GET" and route in LISTING_ROUTES and _streams(query_string):
+        return FULL_LISTING_POLICY, f"{key} stream"
+    return ROUTE_POLICIES.get((method, route), DEFAULT_POLICY), key
+
+
+def _streams(query_string: bytes) -> bool:
+    # Como o FastAPI, vale o último `stream` da query string.
+    values = parse_qs(query_string.decode("latin-1")).get("stream")
+    return bool(values) and values[-1].lower() in TRUTHY_VALUES
+
+
+class _Waiter:
+    __slots__ = ("policy", "key", "future")
+
+    def __init__(self, policy: RoutePolicy, key: str, future: asyncio.Future):
+        self.policy = policy
+        self.key = key
+        self.future = future
+
+
+class AdmissionController:
+    """
+    Limita as requisições em andamento por worker, antes que esperem por uma
+    conexão do pool. Uma requisição só roda enquanto a capacidade em uso está
+    abaixo do limiar da sua classe e a rota está abaixo do próprio limite;
+    senão espera numa fila limitada, ordenada por classe, por no máximo o
+    `max_wait` da classe, e então é rejeitada com 503. As vagas liberadas vão
+    primeiro para quem é mais urgente, e as reservas continuam fluindo quando
+    os relatórios se acumulam.
+    """
+
+    def __init__(self, max_concurrency: int, queue_size: int = ADMISSION_QUEUE_SIZE):
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.in_flight = 0
+        self._class_in_flight: Dict[str, int] = {}
+        self._route_in_flight: Dict[str, int] = {}
+        self._waiters: List[Tuple[int, int, _Waiter]] = []
+        self._order = itertools.count()
+        self.admitted: Dict[str, int] = {}
+        self.rejected: Dict[Tuple[str, str], int] = {}
+        self.rate_limited = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, waiter in self._waiters if not waiter.future.done())
+
+    def _can_start(self, policy: RoutePolicy, key: str) -> bool:
+        if self.in_flight >= max(1, int(self.max_concurrency * policy.priority.admit_below)):
+            return False
+        return policy.max_concurrency is None or self._route_in_flight.get(key, 0) < policy.max_concurrency
+
+    def _start(self, policy: RoutePolicy, key: str):
+        name = policy.priority.name
+        self.in_flight += 1
+        self._class_in_flight[name] = self._class_in_flight.get(name, 0) + 1
+        self._route_in_flight[key] = self._route_in_flight.get(key, 0) + 1
+        self.admitted[name] = self.admitted.get(name, 0) + 1
+
+    def _reject(self, priority: PriorityClass, reason: str) -> AdmissionRejectedError:
+        self.rejected[(priority.name, reason)] = self.rejected.get((priority.name, reason), 0) + 1
+        return AdmissionRejectedError(priority, reason)
+
+    async def acquire(self, policy: RoutePolicy, key: str):
+        if not self._waiters and self._can_start(policy, key):
+            self._start(policy, key)
+            return
+        if self.queued >= self.queue_size and not self._evict(policy.priority):
+            raise self._reject(policy.priority, "queue_full")
+        waiter = _Waiter(policy, key, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, (policy.priority.rank, next(self._order), waiter))
+        self._wake()
+        try:
+            await asyncio.wait_for(waiter.future, policy.priority.max_wait)
+        except asyncio.TimeoutError:
+            raise self._reject(policy.priority, "deadline") from None
+        except asyncio.CancelledError:
+            # Cliente desconectou; a vaga já concedida volta para os outros.
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(policy, key)
+            raise
+
+    def _evict(self, priority: PriorityClass) -> bool:
+        """Fila cheia: rejeita o mais recente na fila de uma classe inferior para abrir espaço para `priority`."""
+        candidates = [
+            (rank, order, waiter) for rank, order, waiter in self._waiters
+            if rank > priority.rank and not waiter.future.done()
+        ]
+        if not candidates:
+            return False
+        _, _, waiter = max(candidates, key=lambda entry: (entry[0], entry[1]))
+        waiter.future.set_exception(self._reject(waiter.policy.priority, "evicted"))
+        return True
+
+    def release(self, policy: RoutePolicy, key: str):
+        self.in_flight -= 1
+        self._class_in_flight[policy.priority.name] -= 1
+        self._route_in_flight[key] -= 1
+        self._wake()
+
+    def _wake(self):
+        """Concede as vagas livres aos que esperam, por classe e ordem de chegada."""
+        if not self._waiters:
+            return
+        remaining = []
+        for entry in sorted(self._waiters):
+            waiter = entry[2]
+            if waiter.future.done():
+                continue  # desistiu (prazo ou desconexão)
+            if self._can_start(waiter.policy, waiter.key):
+                self._start(waiter.policy, waiter.key)
+                waiter.future.set_result(None)
+            else:
+                remaining.append(entry)
+        self._waiters = remaining  # ordenada, então ainda é um heap válido
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": dict(self._class_in_flight),
+            "queued": self.queued,
+            "admitted": dict(self.admitted),
+            "rejected": {f"{name}:{reason}": count for (name, reason), count in self.rejected.items()},
+            "rate_limited": self.rate_limited,
+        }
+
+
+class RateLimiter:
+    """Token bucket por cliente: `rate` requisições por segundo, rajadas de até `burst`."""
+
+    def __init__(self, rate: float, burst: int, max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def check(self, client: str) -> float:
+        """Consome um token; devolve 0 se a requisição pode seguir, senão os segundos até o próximo token."""
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(client, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[client] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+def client_key(scope: Scope) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _route_template(scope: Scope) -> Optional[str]:
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match is Match.FULL:
+            return route.path
+    return None
+
+
+class AdmissionMiddleware:
+    """
+    Middleware ASGI que aplica o limite por cliente (429) e o controle de
+    admissão (503) antes que a requisição chegue à rota. As rotas críticas não
+    têm limite por cliente: um balcão atrás de um endereço compartilhado
+    precisa continuar reservando.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.controller = controller
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route = _route_template(scope)
+        if route is None or route in EXEMPT_ROUTES:
+            await self.app(scope, receive, send)
+            return
+        policy, key = route_policy(scope["method"], route, scope["query_string"])
+        profile = current_profile()
+        if profile is not None:
+            # Rejeições aparecem nas métricas com a rota, não como "unmatched".
+            profile.route = route
+
+        if self.limiter is not None and policy.priority is not CRITICAL:
+            wait = self.limiter.check(client_key(scope))
+            if wait:
+                self.controller.rate_limited += 1
+                response = JSONResponse(
+                    status_code=429, content={"detail": "Too many requests"},
+                    headers={"Retry-After": str(math.ceil(wait))},
+                )
+                await response(scope, receive, send)
+                return
+
+        try:
+            await self.controller.acquire(policy, key)
+        except AdmissionRejectedError as exc:
+            response = JSONResponse(
+                status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(exc.priority.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(policy, key)
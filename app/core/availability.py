@@ -0,0 +1,123 @@
+from bisect import bisect_left, insort
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class _VehicleBookings:
+    """
+    Bookings of a single vehicle, sorted by start date.
+    `max_end[i]` is the latest return date among the first i+1 bookings, so an
+    overlap test is one binary search plus one lookup.
+    """
+    __slots__ = ("intervals", "starts", "max_end")
+
+    def __init__(self):
+        self.intervals: List[Tuple[date, date, int]] = []
+        self.starts: List[date] = []
+        self.max_end: List[date] = []
+
+    def _reindex(self):
+        self.starts = [start for start, _, _ in self.intervals]
+        self.max_end = []
+        latest = None
+        for _, end, _ in self.intervals:
+            latest = end if latest is None or end > latest else latest
+            self.max_end.append(latest)
+
+    def add(self, start: date, end: date, rental_id: int):
+        insort(self.intervals, (start, end, rental_id))
+        self._reindex()
+
+    def remove(self, start: date, end: date, rental_id: int):
+        self.intervals.remove((start, end, rental_id))
+        self._reindex()
+
+    def overlaps(self, start: date, end: date) -> bool:
+        # Bookings that begin before `end` are the first `i` ones; one of them
+        # overlaps [start, end) if any of them returns after `start`.
+        i = bisect_left(self.starts, end)
+        return i > 0 and self.max_end[i - 1] > start
+
+
+class AvailabilityIndex:
+    """
+    In-process interval index over rental(id_vehicle, rent_date, return_date).
+
+    A booking occupies the vehicle on [rent_date, return_date). Only bookings
+    returning after `horizon` are kept, which is exact for any query starting
+    on or after the horizon; earlier queries must fall back to the database.
+    Kept up to date by RentalRepository writes and rebuilt periodically to pick
+    up writes made by other workers.
+    """
+
+    def __init__(self):
+        self.horizon: Optional[date] = None
+        self._vehicles: Dict[int, _VehicleBookings] = {}
+        self._rentals: Dict[int, Tuple[int, date, date]] = {}
+        self._pending: Optional[list] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.horizon is not None
+
+    def covers(self, start: date) -> bool:
+        """Whether queries starting at `start` can be answered from memory."""
+        return self.horizon is not None and start >= self.horizon
+
+    def begin_rebuild(self):
+        """Starts recording writes so they can be replayed over the fresh snapshot."""
+        self._pending = []
+
+    def finish_rebuild(self, horizon: date, rows: Iterable[dict]):
+        """
+        Replaces the index content with `rows` (dicts with id, id_vehicle,
+        rent_date and return_date) and replays writes seen since `begin_rebuild`.
+        """
+        pending, self._pending = self._pending or [], None
+        self.horizon = horizon
+        self._vehicles = {}
+        self._rentals = {}
+        for row in rows:
+            self._add(row['id'], row['id_vehicle'], row['rent_date'], row['return_date'])
+        for op, args in pending:
+            getattr(self, op)(*args)
+
+    def abort_rebuild(self):
+        self._pending = None
+
+    def _add(self, rental_id: int, vehicle_id: Optional[int], start: date, end: date):
+        self._remove(rental_id)
+        # A rental without a vehicle (id_vehicle is nullable in the table) occupies none.
+        if self.horizon is None or end <= self.horizon or vehicle_id is None:
+            return
+        self._vehicles.setdefault(vehicle_id, _VehicleBookings()).add(start, end, rental_id)
+        self._rentals[rental_id] = (vehicle_id, start, end)
+
+    def _remove(self, rental_id: int):
+        entry = self._rentals.pop(rental_id, None)
+        if entry is None:
+            return
+        vehicle_id, start, end = entry
+        bookings = self._vehicles[vehicle_id]
+        bookings.remove(start, end, rental_id)
+        if not bookings.intervals:
+            del self._vehicles[vehicle_id]
+
+    def add(self, rental_id: int, vehicle_id: Optional[int], start: date, end: date):
+        """Registers (or moves) a booking."""
+        if self._pending is not None:
+            self._pending.append(('_add', (rental_id, vehicle_id, start, end)))
+        self._add(rental_id, vehicle_id, start, end)
+
+    def remove(self, rental_id: int):
+        if self._pending is not None:
+            self._pending.append(('_remove', (rental_id,)))
+        self._remove(rental_id)
+
+    def is_free(self, vehicle_id: int, start: date, end: date) -> bool:
+        bookings = self._vehicles.get(vehicle_id)
+        return bookings is None or not bookings.overlaps(start, end)
+
+    def booked_vehicles(self, start: date, end: date) -> Set[int]:
+        """Returns the ids of vehicles with a booking overlapping [start, end)."""
+        return {vid for vid, bookings in self._vehicles.items() if bookings.overlaps(start, end)}
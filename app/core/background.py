@@ -0,0 +1,25 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodically(interval: float, func: Callable[[], Awaitable[None]], name: str, immediately: bool = False):
+    """
+    Calls `func` every `interval` seconds until cancelled, logging failures.
+    With `immediately=True` the first call happens right away; an `interval`
+    of 0 calls it only once.
+    """
+    if not immediately:
+        await asyncio.sleep(interval)
+    while True:
+        try:
+            await func()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Background task %s failed", name)
+        if interval <= 0:
+            return
+        await asyncio.sleep(interval)
@@ -0,0 +1,62 @@
+import os
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Longest wait (seconds) for the vehicle lock before giving up.
+BOOKING_LOCK_WAIT_SECONDS = int(os.getenv("BOOKING_LOCK_WAIT_SECONDS", "5"))
+
+
+class BookingError(Exception):
+    """A booking that cannot be made; `status_code` is the HTTP status to answer with."""
+    status_code = 409
+
+
+class BookingConflictError(BookingError):
+    def __init__(self, vehicle_id: int, conflicting_id: Optional[int]):
+        self.vehicle_id = vehicle_id
+        self.conflicting_id = conflicting_id
+        super().__init__(
+            f"Vehicle {vehicle_id} is already booked for overlapping dates"
+            + (f" (rental {conflicting_id})" if conflicting_id is not None else "")
+        )
+
+
+class VehicleUnavailableError(BookingError):
+    def __init__(self, vehicle_id: int):
+        self.vehicle_id = vehicle_id
+        super().__init__(f"Vehicle {vehicle_id} is not available for rental")
+
+
+class VehicleNotFoundError(BookingError):
+    status_code = 422
+
+    def __init__(self, vehicle_id: int):
+        self.vehicle_id = vehicle_id
+        super().__init__(f"Vehicle {vehicle_id} not found")
+
+
+class InvalidBookingError(BookingError):
+    status_code = 422
+
+
+class BatchCalendar:
+    """
+    Bookings per vehicle for a batch (those already in the database and the
+    ones accepted from the batch itself), to check a bulk create with one query.
+    """
+
+    def __init__(self, existing: Iterable[dict]):
+        self._bookings: Dict[int, List[Tuple[Optional[int], date, date]]] = {}
+        for row in existing:
+            self._bookings.setdefault(row['id_vehicle'], []).append(
+                (row['id'], row['rent_date'], row['return_date'])
+            )
+
+    def book(self, vehicle_id: int, start: date, end: date) -> Tuple[bool, Optional[int]]:
+        """Adds the booking unless it overlaps; returns (accepted, conflicting rental id)."""
+        bookings = self._bookings.setdefault(vehicle_id, [])
+        for booking_id, booked_start, booked_end in bookings:
+            if booked_start < end and booked_end > start:
+                return False, booking_id
+        bookings.append((None, start, end))
+        return True, None
@@ -0,0 +1,45 @@
+import json
+from typing import Any, Dict, List, Tuple, Type, TypeVar
+from pydantic import BaseModel, ValidationError
+from ..schemas.bulk import BulkRowError
+
+# Row limits per request and per multi-row INSERT.
+MAX_BULK_ROWS = 1000
+BULK_BATCH_SIZE = 500
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def _validation_detail(exc: ValidationError) -> Any:
+    return json.loads(exc.json(include_url=False))
+
+
+def validate_rows(
+    model: Type[ModelT], rows: List[Dict[str, Any]]
+) -> Tuple[List[Tuple[int, ModelT]], List[BulkRowError]]:
+    """Validates each row on its own so one bad row does not reject the whole batch."""
+    valid, errors = [], []
+    for index, row in enumerate(rows):
+        try:
+            valid.append((index, model.model_validate(row)))
+        except ValidationError as exc:
+            errors.append(BulkRowError(index=index, detail=_validation_detail(exc)))
+    return valid, errors
+
+
+def validate_update_rows(
+    model: Type[ModelT], rows: List[Dict[str, Any]]
+) -> Tuple[List[Tuple[int, int, ModelT]], List[BulkRowError]]:
+    """Like `validate_rows`, for rows carrying the target `id` next to the changed fields."""
+    valid, errors = [], []
+    for index, row in enumerate(rows):
+        changes = dict(row)
+        entity_id = changes.pop("id", None)
+        if not isinstance(entity_id, int) or isinstance(entity_id, bool) or entity_id <= 0:
+            errors.append(BulkRowError(index=index, detail="Each row needs a positive integer 'id'."))
+            continue
+        try:
+            valid.append((index, entity_id, model.model_validate(changes)))
+        except ValidationError as exc:
+            errors.append(BulkRowError(index=index, detail=_validation_detail(exc)))
+    return valid, errors
@@ -0,0 +1,150 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Type, TypeVar
+
+from pydantic import BaseModel
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # memory | redis | none
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+class LRUBackend:
+    """In-process LRU with a per-entry TTL. Stores the objects themselves."""
+    stores_objects = True
+
+    def __init__(self, maxsize: int = CACHE_MAXSIZE, ttl: float = CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    async def delete_prefix(self, prefix: str):
+        for key in [key for key in self._data if key.startswith(prefix)]:
+            del self._data[key]
+
+    async def close(self):
+        self._data.clear()
+
+
+class RedisBackend:
+    """
+    Backend for any client exposing the redis.asyncio API (get, set with `ex`,
+    delete, scan_iter). Values are stored as JSON so workers can share them.
+    """
+    stores_objects = False
+
+    def __init__(self, client: Any, ttl: float = CACHE_TTL_SECONDS):
+        self.client = client
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: Any):
+        await self.client.set(key, value, ex=max(1, int(self.ttl)))
+
+    async def delete(self, key: str):
+        await self.client.delete(key)
+
+    async def delete_prefix(self, prefix: str):
+        keys = [key async for key in self.client.scan_iter(match=f"{prefix}*")]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def close(self):
+        close = getattr(self.client, "aclose", None) or getattr(self.client, "close", None)
+        if close is not None:
+            await close()
+
+
+class EntityCache:
+    """
+    Entity (`*InDB`) cache by id, split by namespace (the table name).
+    Keeps hit/miss counters per namespace. Entries written by a read that raced
+    with a write may be stale until their TTL expires.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    @staticmethod
+    def _key(namespace: str, key: Any) -> str:
+        return f"{namespace}:{key}"
+
+    async def get(self, namespace: str, key: Any, model: Type[ModelT]) -> Optional[ModelT]:
+        value = await self.backend.get(self._key(namespace, key))
+        if value is None:
+            self.misses[namespace] = self.misses.get(namespace, 0) + 1
+            return None
+        self.hits[namespace] = self.hits.get(namespace, 0) + 1
+        return value if self.backend.stores_objects else model.model_validate_json(value)
+
+    async def set(self, namespace: str, key: Any, value: BaseModel):
+        stored = value if self.backend.stores_objects else value.model_dump_json()
+        await self.backend.set(self._key(namespace, key), stored)
+
+    async def invalidate(self, namespace: str, key: Any):
+        await self.backend.delete(self._key(namespace, key))
+
+    async def clear(self, namespace: str):
+        await self.backend.delete_prefix(f"{namespace}:")
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        namespaces = sorted(set(self.hits) | set(self.misses))
+        return {
+            "backend": type(self.backend).__name__,
+            "evictions": getattr(self.backend, "evictions", None),
+            "namespaces": {
+                namespace: {
+                    "hits": self.hits.get(namespace, 0),
+                    "misses": self.misses.get(namespace, 0),
+                }
+                for namespace in namespaces
+            },
+        }
+
+
+def create_cache() -> Optional[EntityCache]:
+    """Creates the cache configured in CACHE_BACKEND, or None when it is off."""
+    if CACHE_BACKEND == "none":
+        return None
+    if CACHE_BACKEND == "redis":
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from exc
+        return EntityCache(RedisBackend(redis.from_url(REDIS_URL)))
+    if CACHE_BACKEND == "memory":
+        return EntityCache(LRUBackend())
+    raise ValueError(f"Unknown CACHE_BACKEND: {CACHE_BACKEND!r}")
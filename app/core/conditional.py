@@ -0,0 +1,87 @@
+import hashlib
+import time
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional, Sequence
+
+from fastapi import Request, Response
+
+# Clients and proxies may store the response but must revalidate it (If-None-Match) before use.
+CACHE_CONTROL = "no-cache"
+
+
+def _etag(request: Request, versions: dict, epoch: str) -> str:
+    token = ";".join(f"{table}={version}" for table, (version, _) in sorted(versions.items()))
+    digest = hashlib.blake2b(f"{epoch}|{request.url.path}?{request.url.query}|{token}".encode(), digest_size=12)
+    return f'"{digest.hexdigest()}"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110): W/"x" and "x" are the same tag.
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def _not_modified_since(if_modified_since: str, changed_at: float) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have one-second resolution; a change in the same second as the
+    # client's copy could be newer than it, so that case is answered in full.
+    return changed_at + 1 <= since
+
+
+async def conditional_response(
+    request: Request, tables: Sequence[str], build: Callable[[], Awaitable[Response]]
+) -> Response:
+    """
+    Answers a GET whose body depends only on `tables` with ETag / Last-Modified
+    validators. The tag comes from the URL and the tables' version counters
+    (bumped by every repository write). A matching If-None-Match gets a 304
+    without touching the database, and full bodies are served from the shared
+    response cache while the versions stay the same. The versions are read
+    before `build` runs, so a body never carries a tag newer than its data.
+    Writes made outside the API (or a lagging replica) are not seen until the
+    next write through the API bumps the table.
+
+    Without Redis the counters are per worker, so writes handled by another
+    worker go unseen: tags then also change every LOCAL_VERSIONS_WINDOW_SECONDS
+    (see LocalVersions), which bounds how long a 304 or a cached body can be
+    stale, and Last-Modified / If-Modified-Since are not used.
+    """
+    state = request.app.state
+    store = state.table_versions
+    versions = await store.current(tables)
+    epoch = store.epoch
+    if store.window:
+        epoch = f"{epoch}.{int(time.time() // store.window)}"
+    etag = _etag(request, versions, epoch)
+    changed_at = max(changed for _, changed in versions.values())
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if store.window:
+        # Last-Modified has no window: with per-worker counters it would stay out of date indefinitely.
+        changed_at = 0
+    if changed_at:
+        headers["Last-Modified"] = format_datetime(datetime.fromtimestamp(int(changed_at), timezone.utc), usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if _matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and changed_at and _not_modified_since(if_modified_since, changed_at):
+            return Response(status_code=304, headers=headers)
+
+    cache = state.response_cache
+    body: Optional[bytes] = await cache.get(etag) if cache is not None else None
+    if body is not None:
+        return Response(content=body, media_type="application/json", headers=headers)
+    response = await build()
+    if response.status_code == 200 and hasattr(response, "body"):
+        if cache is not None:
+            await cache.set(etag, response.body)
+        response.headers.update(headers)
+    return response
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import os
+from functools import cached_property
+from typing import Any, Optional, Set
+
+# Events buffered per client; a client that falls this far behind gets a `resync` instead.
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+# Open /vehicles/stream connections, per worker.
+EVENT_MAX_SUBSCRIBERS = int(os.getenv("EVENT_MAX_SUBSCRIBERS", "1000"))
+# Keep-alive interval when there are no events (proxies close idle connections).
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+
+
+class TooManySubscribersError(Exception):
+    """The worker already has EVENT_MAX_SUBSCRIBERS clients connected."""
+
+
+class Event:
+    """
+    A published event. The JSON body is built once per event, and the SSE
+    frame at most once, whatever the number of subscribers.
+    """
+
+    def __init__(self, seq: int, type: str, data: Any = None):
+        self.seq = seq
+        self.type = type
+        self.json = json.dumps({"seq": seq, "type": type, "data": data}, default=str, separators=(",", ":"))
+
+    @cached_property
+    def sse(self) -> str:
+        return f"id: {self.seq}\nevent: {self.type}\ndata: {self.json}\n\n"
+
+
+class Subscription:
+    """
+    Bounded queue of one client. When it is full the pending events are
+    dropped and replaced by a single `resync` event: the client then reloads
+    GET /vehicles/ (cheap with its ETag) instead of slowing everyone down.
+    """
+
+    def __init__(self, hub: "EventHub", maxsize: int):
+        self.hub = hub
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.resyncs = 0
+
+    def offer(self, event: Event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(Event(event.seq, "resync"))
+            self.resyncs += 1
+            self.hub.resyncs += 1
+
+    def end(self, event: Event):
+        """Delivers the final event, dropping the pending ones if the queue is full."""
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def next(self, timeout: float = EVENT_HEARTBEAT_SECONDS) -> Optional[Event]:
+        """Next event, or None after `timeout` seconds without one (time for a keep-alive)."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class EventHub:
+    """
+    Fans the write events (vehicles and bookings) out to this worker's
+    /vehicles/stream clients. publish() never waits: each subscriber has
+    its own bounded queue, so a slow client only affects itself. Events from
+    writes handled by other workers are not seen here; `seq` lets a client
+    notice that it reconnected to another worker and should reload.
+    """
+
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE, max_subscribers: int = EVENT_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: Set[Subscription] = set()
+        self.seq = 0
+        self.published = 0
+        self.resyncs = 0
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def ensure_capacity(self):
+        """Raises TooManySubscribersError if subscribe() would, without subscribing."""
+        if len(self._subscribers) >= self.max_subscribers:
+            raise TooManySubscribersError(f"More than {self.max_subscribers} clients are subscribed")
+
+    def subscribe(self) -> Subscription:
+        self.ensure_capacity()
+        subscription = Subscription(self, self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def close(self):
+        """Worker drain: every open stream gets a final `shutdown` event and ends; clients reconnect elsewhere."""
+        event = Event(self.seq, "shutdown")
+        for subscription in self._subscribers:
+            subscription.end(event)
+
+    def publish(self, type: str, data: Any = None):
+        self.seq += 1
+        if not self._subscribers:
+            return
+        event = Event(self.seq, type, data)
+        self.published += 1
+        for subscription in self._subscribers:
+            subscription.offer(event)
@@ -0,0 +1,195 @@
+import asyncio
+import csv
+import importlib
+import importlib.util
+import os
+import types
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+from pydantic import BaseModel
+
+# Linhas acumuladas antes de cada escrita no arquivo (um row group / record batch nos formatos colunares).
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "10000"))
+# Codec dos arquivos Parquet e Arrow IPC; o zstd é suportado pelos dois.
+EXPORT_COMPRESSION = os.getenv("EXPORT_COMPRESSION", "zstd")
+
+COLUMNAR_FORMATS = ("parquet", "arrow")
+
+# (nome da coluna, tipo Python anotado no modelo)
+Column = Tuple[str, Any]
+
+
+def parquet_available() -> bool:
+    """Parquet e Arrow precisam do pacote opcional pyarrow, importado só quando uma exportação dessas roda."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def model_columns(model: Type[BaseModel], prefix: str = "") -> List[Column]:
+    return [(f"{prefix}{name}", field.annotation) for name, field in model.model_fields.items()]
+
+
+def _base_type(annotation):
+    if get_origin(annotation) in (Union, types.UnionType):
+        (annotation,) = [arg for arg in get_args(annotation) if arg is not type(None)]
+    return get_origin(annotation) or annotation
+
+
+def _caster(annotation) -> Optional[Callable[[Any], Any]]:
+    """Conversão dos valores crus do driver (DECIMAL, TINYINT) para o tipo do modelo."""
+    base = _base_type(annotation)
+    if base is float:
+        return float
+    if base is bool:
+        return bool
+    return None
+
+
+async def _batches(rows: AsyncIterator[dict], columns: List[Column], batch_size: int) -> AsyncIterator[List[dict]]:
+    names = [name for name, _ in columns]
+    casts = [(name, cast) for name, annotation in columns if (cast := _caster(annotation)) is not None]
+    batch = []
+    async for row in rows:
+        record = {name: row.get(name) for name in names}
+        for name, cast in casts:
+            if record[name] is not None:
+                record[name] = cast(record[name])
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def write_json(path: str, model: BaseModel) -> int:
+    """Escreve um único modelo (um relatório) como JSON."""
+    body = model.model_dump_json()
+    with open(path, "w", encoding="utf-8") as file:
+        await asyncio.to_thread(file.write, body)
+    return 1
+
+
+async def write_csv(
+    path: str, columns: List[Column], rows: AsyncIterator[dict], batch_size: int = EXPORT_BATCH_SIZE
+) -> int:
+    """Escreve as linhas como CSV com cabeçalho, em blocos; retorna o número de linhas."""
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=[name for name, _ in columns])
+        writer.writeheader()
+        async for batch in _batches(rows, columns, batch_size):
+            await asyncio.to_thread(writer.writerows, batch)
+            count += len(batch)
+    return count
+
+
+def _arrow_type(pa: types.ModuleType, annotation):
+    base = _base_type(annotation)
+    # datetime antes de date: datetime é subclasse de date.
+    for python_type, arrow_type in (
+        (bool, pa.bool_()), (int, pa.int64()), (float, pa.float64()),
+        (datetime, pa.timestamp("us")), (date, pa.date32()),
+    ):
+        if isinstance(base, type) and issubclass(base, python_type):
+            return arrow_type
+    return pa.string()
+
+
+def arrow_schema(columns: List[Column]):
+    """Schema fixo montado a partir dos modelos, para que um primeiro lote cheio de NULLs não dê o tipo errado a uma coluna."""
+    pa = importlib.import_module("pyarrow")
+    return pa.schema([(name, _arrow_type(pa, annotation)) for name, annotation in columns])
+
+
+def _open_columnar(format: str, path: str, schema):
+    if format == "parquet":
+        pq = importlib.import_module("pyarrow.parquet")
+        return pq.ParquetWriter(path, schema, compression=EXPORT_COMPRESSION)
+    ipc = importlib.import_module("pyarrow.ipc")
+    return ipc.new_file(path, schema, options=ipc.IpcWriteOptions(compression=EXPORT_COMPRESSION))
+
+
+async def write_columnar(
+    path: str, format: str, columns: List[Column], rows: AsyncIterator[dict], batch_size: int = EXPORT_BATCH_SIZE
+) -> int:
+    """Escreve as linhas como Parquet ou Arrow IPC (`format`), um bloco por vez; retorna o número de linhas."""
+    pa = importlib.import_module("pyarrow")
+    schema = arrow_schema(columns)
+    count = 0
+    writer = _open_columnar(format, path, schema)
+    try:
+        async for batch in _batches(rows, columns, batch_size):
+            await asyncio.to_thread(writer.write_table, pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    finally:
+        writer.close()
+    return count
+
+
+class PartitionedExport:
+    """
+    Resultado de write_partitioned(): arquivos escritos, linhas e o maior id
+    exportado (a marca d'água da próxima exportação incremental).
+    """
+
+    def __init__(self):
+        self.files: List[str] = []
+        self.rows = 0
+        self.last_id: Optional[int] = None
+
+
+async def write_partitioned(
+    directory: str,
+    format: str,
+    columns: List[Column],
+    rows: AsyncIterator[dict],
+    partition: Callable[[dict], str],
+    file_name: str,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> PartitionedExport:
+    """
+    Grava as linhas em `directory/<partition(row)>/<file_name>`, um arquivo
+    colunar por partição. Cada partição acumula no máximo `batch_size` linhas,
+    então a memória é limitada pelas partições vistas juntas no fluxo (poucas,
+    para linhas em ordem de id particionadas por data). Os arquivos são gravados
+    como `.part` e só renomeados quando todas as partições terminam; uma
+    execução que falha não deixa nada para trás e pode ser repetida.
+    """
+    pa = importlib.import_module("pyarrow")
+    schema = arrow_schema(columns)
+    result = PartitionedExport()
+    writers: Dict[str, Any] = {}
+    buffers: Dict[str, List[dict]] = {}
+
+    async def flush(key: str):
+        batch, buffers[key] = buffers[key], []
+        if key not in writers:
+            os.makedirs(os.path.join(directory, key), exist_ok=True)
+            writers[key] = _open_columnar(format, os.path.join(directory, key, f"{file_name}.part"), schema)
+        await asyncio.to_thread(writers[key].write_table, pa.Table.from_pylist(batch, schema=schema))
+
+    try:
+        # Os blocos vêm de _batches() para aplicar as mesmas conversões; a divisão por partição é feita aqui.
+        async for batch in _batches(rows, columns, batch_size):
+            for record in batch:
+                key = partition(record)
+                buffers.setdefault(key, []).append(record)
+                if len(buffers[key]) >= batch_size:
+                    await flush(key)
+            result.rows += len(batch)
+            result.last_id = batch[-1]["id"]
+        for key, pending in buffers.items():
+            if pending:
+                await flush(key)
+    except BaseException:
+        for key, writer in writers.items():
+            writer.close()
+            os.remove(os.path.join(directory, key, f"{file_name}.part"))
+        raise
+    for key, writer in writers.items():
+        writer.close()
+        final = os.path.join(directory, key, file_name)
+        os.replace(f"{final}.part", final)
+        result.files.append(final)
+    return result
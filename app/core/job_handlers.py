@@ -0,0 +1,41 @@
+from datetime import date
+from typing import Dict
+from ..schemas.job import JobInDB
+from ..repositories.rental_repository import RentalRepository, export_columns
+from .exports import COLUMNAR_FORMATS, write_columnar, write_csv, write_json
+from .jobs import JobHandler
+
+
+def job_handlers(state) -> Dict[str, JobHandler]:
+    """
+    Handlers of the job types. They read through the jobs' own pool (or a
+    replica), never through the pool that serves the bookings.
+    """
+    def rental_repo() -> RentalRepository:
+        return RentalRepository(
+            state.job_pool, projections=state.rental_projections, replicas=state.replicas, metrics=state.metrics
+        )
+
+    async def summary_report(job: JobInDB, path: str) -> int:
+        return await write_json(path, await rental_repo().get_summary_report())
+
+    async def timeseries_report(job: JobInDB, path: str) -> int:
+        params = job.params
+        report = await rental_repo().get_timeseries(
+            params["granularity"], date.fromisoformat(params["from"]), date.fromisoformat(params["to"])
+        )
+        return await write_json(path, report)
+
+    async def export_rentals(job: JobInDB, path: str) -> int:
+        format, relations = job.params["format"], tuple(job.params.get("expand", ()))
+        columns = export_columns(relations)
+        rows = rental_repo().stream_export(relations, after_id=job.params.get("after_id", 0))
+        if format in COLUMNAR_FORMATS:
+            return await write_columnar(path, format, columns, rows)
+        return await write_csv(path, columns, rows)
+
+    return {
+        "report.summary": summary_report,
+        "report.timeseries": timeseries_report,
+        "export.rentals": export_rentals,
+    }
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+import tempfile
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Jobs executando ao mesmo tempo, por worker do uvicorn.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Jobs aguardando na fila (todos os processos); acima disso POST /jobs/... responde 503.
+JOB_QUEUE_MAXSIZE = int(os.getenv("JOB_QUEUE_MAXSIZE", "100"))
+# Tempo máximo de um job; depois disso ele é cancelado e marcado como falho.
+JOB_TIMEOUT_SECONDS = int(os.getenv("JOB_TIMEOUT_SECONDS", "600"))
+# Vezes que um job interrompido (processo morto no meio) volta para a fila.
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Intervalo entre as consultas à fila quando nenhum job foi enfileirado por este processo.
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "5"))
+# Tentativas de gravar o estado final de um job quando o banco falha, com espera crescente entre elas.
+JOB_STATUS_ATTEMPTS = 3
+JOB_STATUS_RETRY_SECONDS = 1.0
+# Diretório dos arquivos de resultado; deve ser compartilhado quando os workers rodam em vários hosts.
+JOB_RESULT_DIR = os.getenv("JOB_RESULT_DIR", os.path.join(tempfile.gettempdir(), "br-rental-car-jobs"))
+
+# handler(job, path) escreve o resultado em `path` e retorna o número de linhas.
+JobHandler = Callable[[Any, str], Awaitable[int]]
+
+
+class JobQueueFullError(Exception):
+    """Há jobs demais esperando na fila."""
+
+
+def result_file(job) -> str:
+    """Nome do arquivo de resultado: o id do job com a extensão do formato pedido (JSON por padrão)."""
+    return f"{job.id}.{job.params.get('format', 'json')}"
+
+
+class JobRunner:
+    """
+    Executa os jobs da tabela `job` com um número fixo de workers (tarefas
+    asyncio) por processo. A tabela é a fila: os workers reservam a linha
+    enfileirada mais antiga com SKIP LOCKED, então vários workers do uvicorn a
+    compartilham e cada job roda uma vez. notify() acorda os workers locais logo
+    após uma inserção; fora isso eles olham a tabela a cada JOB_POLL_SECONDS.
+    """
+
+    def __init__(
+        self,
+        repository: Callable[[], Any],
+        handlers: Dict[str, JobHandler],
+        workers: int = JOB_WORKERS,
+        result_dir: str = JOB_RESULT_DIR,
+        timeout: int = JOB_TIMEOUT_SECONDS,
+        poll_interval: float = JOB_POLL_SECONDS,
+    ):
+        self.repository = repository
+        self.handlers = handlers
+        self.workers = workers
+        self.result_dir = result_dir
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        os.makedirs(self.result_dir, exist_ok=True)
+        # Margem além do timeout: um job ainda rodando em outro processo não é tomado dele.
+        requeued = await self.repository().requeue_stale(self.timeout + 60, JOB_MAX_ATTEMPTS)
+        if requeued:
+            logger.warning("Requeued %d jobs interrupted by a previous shutdown", requeued)
+        self._tasks = [asyncio.create_task(self._work(), name=f"job-worker-{i}") for i in range(self.workers)]
+
+    async def close(self):
+        """Cancela os workers; os jobs que eles executavam voltam para a fila."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        self._wakeup.set()
+
+    def result_path(self, job) -> str:
+        return os.path.join(self.result_dir, job.result_file or result_file(job))
+
+    async def _work(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                job = await self.repository().claim_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Could not claim the next job")
+                job = None
+            if job is not None:
+                try:
+                    await self._run(job)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("Job %s (%s) could not be run", job.id, job.kind)
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, job):
+        repository = self.repository()
+        handler: Optional[JobHandler] = self.handlers.get(job.kind)
+        if handler is None:
+            await self._record(job, "failed", repository.mark_failed, job.id, f"Unknown job kind '{job.kind}'")
+            return
+        name = result_file(job)
+        path = os.path.join(self.result_dir, name)
+        partial = f"{path}.part"
+        try:
+            rows = await asyncio.wait_for(handler(job, partial), self.timeout)
+            os.replace(partial, path)
+        except asyncio.CancelledError:
+            _remove(partial)
+            try:
+                await asyncio.shield(repository.requeue(job.id))
+            except Exception:
+                logger.exception("Could not requeue job %s; requeue_stale picks it up on a later startup", job.id)
+            raise
+        except asyncio.TimeoutError:
+            _remove(partial)
+            await self._record(job, "failed", repository.mark_failed, job.id, f"Timed out after {self.timeout}s")
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            _remove(partial)
+            await self._record(job, "failed", repository.mark_failed, job.id, str(exc) or type(exc).__name__)
+        else:
+            await self._record(job, "done", repository.mark_done, job.id, name, rows)
+
+    async def _record(self, job, status: str, mark: Callable[..., Awaitable[None]], *args):
+        """
+        Chama `mark(*args)` para gravar o status final de `job`, repetindo em
+        erros do banco. Se todas as tentativas falham o erro é registrado no log
+        e o worker segue; o job fica 'running' até requeue_stale().
+        """
+        for attempt in range(1, JOB_STATUS_ATTEMPTS + 1):
+            try:
+                await mark(*args)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if attempt == JOB_STATUS_ATTEMPTS:
+                    logger.exception("Could not mark job %s as %s after %d attempts", job.id, status, attempt)
+                    return
+                logger.warning("Could not mark job %s as %s (attempt %d); retrying", job.id, status, attempt)
+                await asyncio.sleep(JOB_STATUS_RETRY_SECONDS * attempt)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
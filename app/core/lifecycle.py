@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+import signal
+import threading
+from typing import Callable, List
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Longest drain on shutdown: the requests still in flight and then the connections in use in the pools.
+DRAIN_TIMEOUT_SECONDS = float(os.getenv("DRAIN_TIMEOUT_SECONDS", "25"))
+
+# Answered even while draining, so the load balancer sees the state.
+HEALTH_PATHS = ("/health/", "/metrics")
+
+
+class Lifecycle:
+    """
+    Worker state: starting -> ready -> draining. Readiness (GET /health/ready)
+    is only reported after the pools are warm and the projections loaded.
+
+    The drain starts on SIGTERM/SIGINT, before the server stops listening:
+    new requests get 503 with `Connection: close` and long-lived streams are
+    ended (on_drain callbacks), so they do not hold the server's own wait for
+    the requests in flight. That wait is unbounded unless uvicorn runs with
+    --timeout-graceful-shutdown; the lifespan shutdown then waits for whatever
+    is still in flight and for the pools, up to DRAIN_TIMEOUT_SECONDS in all.
+    """
+
+    STARTING, READY, DRAINING = "starting", "ready", "draining"
+
+    def __init__(self):
+        self.state = self.STARTING
+        self.in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._on_drain: List[Callable[[], None]] = []
+
+    @property
+    def ready(self) -> bool:
+        return self.state == self.READY
+
+    @property
+    def draining(self) -> bool:
+        return self.state == self.DRAINING
+
+    def mark_ready(self):
+        if self.state == self.STARTING:
+            self.state = self.READY
+
+    def on_drain(self, callback: Callable[[], None]):
+        self._on_drain.append(callback)
+
+    def begin_drain(self):
+        if self.state == self.DRAINING:
+            return
+        logger.info("Draining: refusing new requests, %d in flight", self.in_flight)
+        self.state = self.DRAINING
+        for callback in self._on_drain:
+            callback()
+
+    def request_started(self):
+        self.in_flight += 1
+        self._idle.clear()
+
+    def request_finished(self):
+        self.in_flight -= 1
+        if not self.in_flight:
+            self._idle.set()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Waits for the requests in flight to finish; False if the timeout ran out first."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning("%d requests still in flight after %.0fs of draining", self.in_flight, timeout)
+            return False
+
+    def install_signal_handlers(self):
+        """
+        Chains the start of the drain to the SIGTERM/SIGINT handlers already
+        installed (uvicorn's), which still run right after. Must be called
+        from the event loop, during startup.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return  # signals only reach the main thread (e.g. app run by a test client)
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            previous = signal.getsignal(signum)
+            if not callable(previous):
+                continue
+
+            def handler(sig, frame, previous=previous):
+                # The handler runs between bytecodes of the loop; the drain itself runs on the loop.
+                loop.call_soon_threadsafe(self.begin_drain)
+                previous(sig, frame)
+
+            signal.signal(signum, handler)
+
+
+class LifecycleMiddleware:
+    """Counts the requests in flight and refuses new ones while draining."""
+
+    def __init__(self, app: ASGIApp, lifecycle: Lifecycle):
+        self.app = app
+        self.lifecycle = lifecycle
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        lifecycle = self.lifecycle
+        if lifecycle.draining and not scope["path"].startswith(HEALTH_PATHS):
+            if scope["type"] == "websocket":
+                # 1012: service restart.
+                await send({"type": "websocket.close", "code": 1012})
+                return
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is shutting down"},
+                headers={"Retry-After": "1", "Connection": "close"},
+            )
+            await response(scope, receive, send)
+            return
+        lifecycle.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lifecycle.request_finished()
@@ -0,0 +1,74 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Set, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# Largest batch sent in one call (a single IN (...)).
+MAX_LOADER_BATCH = 500
+
+
+class BatchLoader(Generic[K, V]):
+    """
+    Coalesces keys requested in the same event-loop tick into one call to
+    `batch_fn(keys) -> {key: value}` (DataLoader-style). Calls made concurrently,
+    e.g. from asyncio.gather, share one query; the same key requested twice in a
+    tick is fetched once. Nothing is memoized once a batch resolves, so a load
+    after a write sees the new row.
+
+    A load that finds nothing queued or in flight runs right away, without
+    waiting for the tick: the common lone get_by_id pays no coalescing cost.
+    Loads made while it runs are queued and batched as usual, so a fan-out of
+    N keys costs two queries instead of one.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[K]], Awaitable[Dict[K, V]]], max_batch_size: int = MAX_LOADER_BATCH):
+        self._batch_fn = batch_fn
+        self._max_batch_size = max_batch_size
+        self._pending: Dict[K, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        # Direct loads in progress (see the class docstring).
+        self._direct = 0
+
+    async def load(self, key: K) -> Optional[V]:
+        if not self._pending and not self._direct and not self._tasks:
+            self._direct += 1
+            try:
+                return (await self._batch_fn([key])).get(key)
+            finally:
+                self._direct -= 1
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            if not self._pending:
+                # Runs after every coroutine already scheduled for this tick has had its turn.
+                loop.call_soon(self._dispatch)
+            future = self._pending[key] = loop.create_future()
+        # Shielded: one caller giving up must not cancel the result for the others.
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: List[K]) -> List[Optional[V]]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _dispatch(self):
+        pending, self._pending = self._pending, {}
+        keys = list(pending)
+        for start in range(0, len(keys), self._max_batch_size):
+            batch = {key: pending[key] for key in keys[start:start + self._max_batch_size]}
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[K, asyncio.Future]):
+        try:
+            results = await self._batch_fn(list(batch))
+        except BaseException as exc:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
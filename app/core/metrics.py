@@ -0,0 +1,214 @@
+import re
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+# Buckets in seconds, from sub-millisecond up to a few seconds.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> Dict[str, int]:
+        """Counts of observations <= each bound, keyed by the bound ('+Inf' last)."""
+        result, total = {}, 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result["+Inf" if bound == float("inf") else repr(bound)] = total
+        return result
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (an over-estimate)."""
+        if not self.count:
+            return 0.0
+        rank, total = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": self.cumulative(),
+        }
+
+
+_IN_LIST = re.compile(r"\((?:%s, )*%s\)(?:, \((?:%s, )*%s\))*")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql: str) -> str:
+    """
+    Query text used as a label: whitespace collapsed and placeholder lists
+    (IN lists, multi-row VALUES) reduced to "(...)", so every
+    batch size of the same statement shares one series.
+    """
+    return _IN_LIST.sub("(...)", " ".join(sql.split()))
+
+
+class QueryStats:
+    def __init__(self):
+        self.duration = Histogram()
+        self.pool_wait = 0.0
+        self.rows = 0
+        self.errors = 0
+
+
+class MetricsRegistry:
+    """
+    Application metrics: latency per route and per SQL statement.
+    Pool and cache metrics stay on their own objects and are read at render time.
+    """
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, str, str], Histogram] = {}
+        self.queries: Dict[str, QueryStats] = {}
+        # Transactions retried after a deadlock / lock wait timeout, by reason.
+        self.transaction_retries: Dict[str, int] = {}
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float):
+        key = (method, route, f"{status // 100}xx")
+        histogram = self.requests.get(key)
+        if histogram is None:
+            histogram = self.requests[key] = Histogram()
+        histogram.observe(seconds)
+
+    def observe_query(self, sql: str, seconds: float, rows: int = 0, pool_wait: float = 0.0, error: bool = False):
+        key = normalize_sql(sql)
+        stats = self.queries.get(key)
+        if stats is None:
+            stats = self.queries[key] = QueryStats()
+        stats.duration.observe(seconds)
+        stats.pool_wait += pool_wait
+        stats.rows += max(rows, 0)
+        if error:
+            stats.errors += 1
+
+    def observe_retry(self, reason: str):
+        self.transaction_retries[reason] = self.transaction_retries.get(reason, 0) + 1
+
+
+def _label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: Any) -> str:
+    return ",".join(f'{name}="{_label(value)}"' for name, value in labels.items())
+
+
+def _histogram_lines(name: str, histogram: Histogram, labels: str) -> List[str]:
+    prefix = labels + "," if labels else ""
+    lines = [
+        f'{name}_bucket{{{prefix}le="{bound}"}} {count}'
+        for bound, count in histogram.cumulative().items()
+    ]
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+def render_prometheus(
+    registry: MetricsRegistry, pools: Iterable = (), cache=None, events=None, admission=None
+) -> str:
+    """Exposition text format (version 0.0.4) of the registry, the pools, the cache, the event hub and admission control."""
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by route.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route, status), histogram in sorted(registry.requests.items()):
+        lines += _histogram_lines(
+            "http_request_duration_seconds", histogram, _labels(method=method, route=route, status=status)
+        )
+
+    lines += [
+        "# HELP db_query_duration_seconds Execution time by normalized statement (pool wait excluded).",
+        "# TYPE db_query_duration_seconds histogram",
+    ]
+    for sql, stats in sorted(registry.queries.items()):
+        lines += _histogram_lines("db_query_duration_seconds", stats.duration, _labels(statement=sql))
+    for name, kind, attr, help_text in (
+        ("db_query_rows_total", "counter", "rows", "Rows returned or affected."),
+        ("db_query_errors_total", "counter", "errors", "Statements that raised."),
+        ("db_query_pool_wait_seconds_total", "counter", "pool_wait", "Time spent waiting for a connection."),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        lines += [
+            f"{name}{{{_labels(statement=sql)}}} {getattr(stats, attr)}"
+            for sql, stats in sorted(registry.queries.items())
+        ]
+
+    lines += ["# HELP db_transaction_retries_total Transactions retried after a deadlock or lock wait timeout.",
+              "# TYPE db_transaction_retries_total counter"]
+    lines += [f"db_transaction_retries_total{{{_labels(reason=reason)}}} {count}"
+              for reason, count in sorted(registry.transaction_retries.items())]
+
+    pools = list(pools)
+    lines += ["# HELP db_pool_connections Connections by pool and state.", "# TYPE db_pool_connections gauge"]
+    for pool in pools:
+        lines.append(f"db_pool_connections{{{_labels(pool=pool.name, state='in_use')}}} {pool.size - pool.freesize}")
+        lines.append(f"db_pool_connections{{{_labels(pool=pool.name, state='free')}}} {pool.freesize}")
+    lines += ["# HELP db_pool_waiting Coroutines waiting for a connection.", "# TYPE db_pool_waiting gauge"]
+    lines += [f"db_pool_waiting{{{_labels(pool=pool.name)}}} {pool.metrics.waiting}" for pool in pools]
+    lines += ["# HELP db_pool_acquire_timeouts_total Acquisitions that timed out.",
+              "# TYPE db_pool_acquire_timeouts_total counter"]
+    lines += [f"db_pool_acquire_timeouts_total{{{_labels(pool=pool.name)}}} {pool.metrics.acquire_timeouts}"
+              for pool in pools]
+    lines += ["# HELP db_pool_wait_seconds Time waiting for a connection.", "# TYPE db_pool_wait_seconds histogram"]
+    for pool in pools:
+        lines += _histogram_lines("db_pool_wait_seconds", pool.metrics.wait_time, _labels(pool=pool.name))
+
+    if cache is not None:
+        stats = cache.stats()
+        lines += ["# HELP cache_requests_total Entity cache lookups.", "# TYPE cache_requests_total counter"]
+        for namespace, counts in sorted(stats["namespaces"].items()):
+            lines.append(f"cache_requests_total{{{_labels(namespace=namespace, result='hit')}}} {counts['hits']}")
+            lines.append(f"cache_requests_total{{{_labels(namespace=namespace, result='miss')}}} {counts['misses']}")
+
+    if events is not None:
+        lines += [
+            "# HELP event_subscribers Clients connected to /vehicles/stream.", "# TYPE event_subscribers gauge",
+            f"event_subscribers {events.subscribers}",
+            "# HELP events_published_total Events fanned out to at least one subscriber.", "# TYPE events_published_total counter",
+            f"events_published_total {events.published}",
+            "# HELP event_resyncs_total Times a slow client's queue overflowed and was replaced by a resync.",
+            "# TYPE event_resyncs_total counter",
+            f"event_resyncs_total {events.resyncs}",
+        ]
+
+    if admission is not None:
+        stats = admission.stats()
+        lines += ["# HELP admission_in_flight Requests being handled, by priority class.",
+                  "# TYPE admission_in_flight gauge"]
+        lines += [f"admission_in_flight{{{_labels(priority=name)}}} {count}"
+                  for name, count in sorted(stats["in_flight"].items())]
+        lines += ["# HELP admission_queued Requests waiting for a slot.", "# TYPE admission_queued gauge",
+                  f"admission_queued {stats['queued']}"]
+        lines += ["# HELP admission_admitted_total Requests admitted, by priority class.",
+                  "# TYPE admission_admitted_total counter"]
+        lines += [f"admission_admitted_total{{{_labels(priority=name)}}} {count}"
+                  for name, count in sorted(stats["admitted"].items())]
+        lines += ["# HELP admission_rejected_total Requests shed with 503, by priority class and reason.",
+                  "# TYPE admission_rejected_total counter"]
+        lines += [f"admission_rejected_total{{{_labels(priority=name, reason=reason)}}} {count}"
+                  for (name, reason), count in sorted(admission.rejected.items())]
+        lines += ["# HELP rate_limited_total Requests refused with 429 by the per-client rate limit.",
+                  "# TYPE rate_limited_total counter", f"rate_limited_total {stats['rate_limited']}"]
+    return "\n".join(lines) + "\n"
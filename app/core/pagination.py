@@ -0,0 +1,32 @@
+import base64
+import json
+from datetime import date
+from typing import Any, Tuple
+
+
+def encode_cursor(sort: str, descending: bool, value: Any, last_id: int) -> str:
+    """
+    Opaque keyset pagination cursor: the sort in use and the key (sort column
+    value, id) of the last row delivered.
+    """
+    if isinstance(value, date):
+        value = value.isoformat()
+    payload = json.dumps([sort, descending, value, last_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, descending: bool, date_sort: bool = False) -> Tuple[Any, int]:
+    """
+    Returns the (value, id) key stored in the cursor. Raises ValueError when the
+    cursor is malformed or was produced by a different sort order.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, cursor_descending, value, last_id = json.loads(raw)
+        if date_sort:
+            value = date.fromisoformat(value)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if (cursor_sort, cursor_descending) != (sort, descending) or not isinstance(last_id, int):
+        raise ValueError("Cursor does not belong to this sort order")
+    return value, last_id
@@ -0,0 +1,173 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from ..schemas.bulk import BulkRowError
+from ..schemas.rental import Quote, QuoteItem
+
+# Multiplier for Saturday and Sunday days.
+PRICING_WEEKEND_MULTIPLIER = float(os.getenv("PRICING_WEEKEND_MULTIPLIER", "1.2"))
+# Comma-separated "MM-DD:MM-DD:multiplier" seasons; a season may span the new year.
+PRICING_SEASONS = os.getenv("PRICING_SEASONS", "12-15:01-15:1.3,07-01:07-31:1.15")
+# Length discounts as "minimum days:discount", e.g. 10% from 7 days and 20% from 30.
+PRICING_LONG_RENTAL_DISCOUNTS = os.getenv("PRICING_LONG_RENTAL_DISCOUNTS", "7:0.10,30:0.20")
+# Longest period quoted, in days.
+MAX_QUOTE_DAYS = 366
+# Maximum age of the price table; bounds how stale it gets for writes the version counters
+# do not see (other workers with in-process counters, changes made outside the API).
+PRICE_TABLE_MAX_AGE_SECONDS = float(os.getenv("PRICE_TABLE_MAX_AGE_SECONDS", "60"))
+
+MonthDay = Tuple[int, int]
+
+
+def _month_day(value: str) -> MonthDay:
+    month, day = value.split("-")
+    return int(month), int(day)
+
+
+@dataclass(frozen=True)
+class Season:
+    start: MonthDay
+    end: MonthDay
+    multiplier: float
+
+    def contains(self, day: date) -> bool:
+        month_day = (day.month, day.day)
+        if self.start <= self.end:
+            return self.start <= month_day <= self.end
+        return month_day >= self.start or month_day <= self.end
+
+
+@dataclass(frozen=True)
+class PricingRules:
+    """
+    Pricing rules applied on top of the vehicle's daily charge. Each day of the rental
+    costs the daily charge times the weekend multiplier (Saturday, Sunday)
+    times the highest season multiplier of that day; the total then gets the
+    largest long-rental discount the length qualifies for.
+    """
+    weekend_multiplier: float = 1.0
+    seasons: Tuple[Season, ...] = ()
+    # (minimum days, discount), by ascending days.
+    long_rental_discounts: Tuple[Tuple[int, float], ...] = ()
+
+    @classmethod
+    def from_env(cls) -> "PricingRules":
+        seasons = []
+        for spec in filter(None, (part.strip() for part in PRICING_SEASONS.split(","))):
+            start, end, multiplier = spec.split(":")
+            seasons.append(Season(_month_day(start), _month_day(end), float(multiplier)))
+        discounts = []
+        for spec in filter(None, (part.strip() for part in PRICING_LONG_RENTAL_DISCOUNTS.split(","))):
+            days, rate = spec.split(":")
+            discounts.append((int(days), float(rate)))
+        return cls(PRICING_WEEKEND_MULTIPLIER, tuple(seasons), tuple(sorted(discounts)))
+
+    def day_multiplier(self, day: date) -> float:
+        multiplier = self.weekend_multiplier if day.weekday() >= 5 else 1.0
+        season = max((season.multiplier for season in self.seasons if season.contains(day)), default=1.0)
+        return multiplier * season
+
+    def discount(self, days: int) -> float:
+        rate = 0.0
+        for min_days, discount in self.long_rental_discounts:
+            if days >= min_days:
+                rate = discount
+        return rate
+
+
+@lru_cache(maxsize=4096)
+def period_factor(rules: PricingRules, start: date, end: date) -> Tuple[int, float, float]:
+    """
+    (days, equivalent daily charges, discount) of a period. The same for every
+    vehicle, so a batch evaluates each distinct period once and prices each
+    vehicle with one multiplication.
+    """
+    days = (end - start).days
+    units = sum(rules.day_multiplier(start + timedelta(days=offset)) for offset in range(days))
+    return days, units, rules.discount(days)
+
+
+@dataclass(frozen=True)
+class VehiclePrice:
+    daily_charge: Optional[float]
+    available: bool
+
+
+class PriceTable:
+    """
+    Daily charge and status of every vehicle, in memory. It is reloaded whenever the
+    version of the vehicle table changes (every write through the API bumps
+    it; see app.core.versions), so a price change applies to the next quote.
+    Concurrent quotes that find it outdated share one reload.
+    """
+
+    def __init__(self, max_age: float = PRICE_TABLE_MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self._prices: Dict[int, VehiclePrice] = {}
+        self._version: Optional[tuple] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self.reloads = 0
+
+    def _outdated(self, version: tuple) -> bool:
+        return version != self._version or time.monotonic() - self._loaded_at > self.max_age
+
+    async def get(self, versions, load: Callable[[], Awaitable[Iterable[dict]]]) -> Dict[int, VehiclePrice]:
+        version, _ = (await versions.current(("vehicle",)))["vehicle"]
+        current = (versions.epoch, version)
+        if self._outdated(current):
+            async with self._lock:
+                if self._outdated(current):
+                    # A write during the load bumps the version again, so it is picked up by the next quote.
+                    self._prices = {
+                        row["id"]: VehiclePrice(
+                            float(row["daily_charge"]) if row["daily_charge"] is not None else None,
+                            bool(row["available"]),
+                        )
+                        for row in await load()
+                    }
+                    self._version = current
+                    self._loaded_at = time.monotonic()
+                    self.reloads += 1
+        return self._prices
+
+
+def quote_many(
+    rules: PricingRules, prices: Dict[int, VehiclePrice], items: Sequence[QuoteItem]
+) -> Tuple[List[Quote], List[BulkRowError]]:
+    """
+    Quotes each item, in order. The items that cannot be quoted (unknown vehicle,
+    no daily charge, bad period) are reported as errors with their index.
+    """
+    quotes, errors = [], []
+    for index, item in enumerate(items):
+        start, end = item.rent_date, item.return_date
+        if end <= start:
+            errors.append(BulkRowError(index=index, detail="Return date must be after the rent date."))
+            continue
+        if (end - start).days > MAX_QUOTE_DAYS:
+            errors.append(BulkRowError(index=index, detail=f"Rentals are quoted for at most {MAX_QUOTE_DAYS} days."))
+            continue
+        price = prices.get(item.id_vehicle)
+        if price is None or price.daily_charge is None:
+            reason = "not found" if price is None else "has no daily charge"
+            errors.append(BulkRowError(index=index, detail=f"Vehicle {item.id_vehicle} {reason}."))
+            continue
+        days, units, discount = period_factor(rules, start, end)
+        base_value = round(round(price.daily_charge * 100) * units)
+        quotes.append(Quote.model_construct(
+            id_vehicle=item.id_vehicle,
+            rent_date=start,
+            return_date=end,
+            days=days,
+            daily_charge=price.daily_charge,
+            available=price.available,
+            base_value=base_value,
+            discount_rate=discount,
+            rent_value=round(base_value * (1 - discount)),
+        ))
+    return quotes, errors
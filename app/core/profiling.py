@@ -0,0 +1,163 @@
+import asyncio
+import functools
+import os
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import MetricsRegistry
+
+# Lets the client ask for the timing breakdown with the X-Profile header.
+REQUEST_PROFILING = os.getenv("REQUEST_PROFILING", "true").lower() in ("1", "true", "yes")
+PROFILE_HEADER = "x-profile"
+
+
+class RequestProfile:
+    """
+    Where the time of one request was spent. Filled in by the middleware,
+    the route handler (endpoint end) and the repositories (every statement).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.route: Optional[str] = None
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.endpoint_done: Optional[float] = None
+        self._db_at_endpoint_done = 0.0
+
+    def add_query(self, seconds: float, rows: int, pool_wait: float):
+        self.db_seconds += seconds
+        self.pool_wait_seconds += pool_wait
+        self.queries += 1
+        self.rows += max(rows, 0)
+
+    def mark_endpoint_done(self):
+        self.endpoint_done = time.perf_counter()
+        self._db_at_endpoint_done = self.db_seconds + self.pool_wait_seconds
+
+    def breakdown(self) -> dict:
+        """
+        Seconds per phase up to now. `serialize` is everything after the endpoint
+        returned (response validation and rendering) minus DB time spent there,
+        which only happens for streamed responses; `handler` is the rest.
+        """
+        now = time.perf_counter()
+        total = now - self.started
+        db = self.db_seconds + self.pool_wait_seconds
+        serialize = 0.0
+        if self.endpoint_done is not None:
+            serialize = max(0.0, (now - self.endpoint_done) - (db - self._db_at_endpoint_done))
+        return {
+            "db": self.db_seconds,
+            "pool": self.pool_wait_seconds,
+            "serialize": serialize,
+            "handler": max(0.0, total - db - serialize),
+            "total": total,
+        }
+
+    def server_timing(self) -> str:
+        parts = []
+        for name, seconds in self.breakdown().items():
+            entry = f"{name};dur={seconds * 1000:.3f}"
+            if name == "db":
+                entry += f';desc="{self.queries} queries, {self.rows} rows"'
+            parts.append(entry)
+        return ", ".join(parts)
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def current_profile() -> Optional[RequestProfile]:
+    """Profile of the request being handled, or None outside a request (background tasks)."""
+    return _current_profile.get()
+
+
+class InstrumentationMiddleware:
+    """
+    ASGI middleware that measures the latency of every request per route.
+    Requests sent with `X-Profile: 1` get a Server-Timing header splitting the
+    time into db, pool (waiting for a connection), serialize and handler.
+    """
+
+    def __init__(self, app: ASGIApp, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        wants_profile = REQUEST_PROFILING and any(
+            name == PROFILE_HEADER.encode() and value in (b"1", b"true")
+            for name, value in scope["headers"]
+        )
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if wants_profile:
+                    MutableHeaders(scope=message).append("Server-Timing", profile.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.registry.observe_request(
+                scope["method"], profile.route or "unmatched", status, time.perf_counter() - profile.started
+            )
+            _current_profile.reset(token)
+
+
+def _mark_endpoint_done():
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.mark_endpoint_done()
+
+
+class ProfiledRoute(APIRoute):
+    """
+    APIRoute that records the route template (to label the metrics) and the
+    moment the endpoint returned, separating handler time from serialization.
+    """
+
+    def get_route_handler(self) -> Callable:
+        call = self.dependant.call
+        if asyncio.iscoroutinefunction(call):
+            @functools.wraps(call)
+            async def timed_call(*args, **kwargs):
+                try:
+                    return await call(*args, **kwargs)
+                finally:
+                    _mark_endpoint_done()
+        else:
+            @functools.wraps(call)
+            def timed_call(*args, **kwargs):
+                try:
+                    return call(*args, **kwargs)
+                finally:
+                    _mark_endpoint_done()
+        self.dependant.call = timed_call
+
+        handler = super().get_route_handler()
+        route = self.path_format
+
+        async def profiled_handler(request):
+            profile = _current_profile.get()
+            if profile is not None:
+                profile.route = route
+            return await handler(request)
+
+        return profiled_handler
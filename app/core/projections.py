@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from .availability import AvailabilityIndex
+from .rental_summary import RentalSummary
+from .timeseries import TimeseriesCache
+from ..schemas.rental import RentalInDB
+
+logger = logging.getLogger(__name__)
+
+# Longest interval between full rebuilds from the database, to pick up
+# writes made outside the application.
+PROJECTION_REFRESH_SECONDS = float(os.getenv("PROJECTION_REFRESH_SECONDS", "300"))
+# Without shared version counters (Redis) other workers' writes are not seen, and the
+# periodic rebuild uses this interval instead of PROJECTION_REFRESH_SECONDS.
+PROJECTION_UNSHARED_REFRESH_SECONDS = float(os.getenv("PROJECTION_UNSHARED_REFRESH_SECONDS", "15"))
+
+
+class RentalProjections:
+    """
+    In-process views derived from the rental table, kept current by the
+    writes that go through RentalRepository.
+
+    Writes the repository cannot see row by row (ON DELETE CASCADE from user,
+    vehicle or employee deletes) mark the projections stale; the background
+    refresher then rebuilds them from the database. So do rental writes made
+    by other workers, seen through the shared table versions (check_versions).
+    Without shared versions the projections are rebuilt every `max_age`
+    seconds instead.
+    """
+
+    def __init__(self, max_age: float = PROJECTION_REFRESH_SECONDS):
+        self.availability = AvailabilityIndex()
+        self.summary = RentalSummary()
+        self.timeseries = TimeseriesCache()
+        self.stale = True
+        self.last_refresh: Optional[float] = None
+        # One rebuild at a time; whoever waited for the lock finds the projections already fresh.
+        self.refresh_lock = asyncio.Lock()
+        # Bumped by mark_stale: a rebuild started before that does not clear `stale`.
+        self.generation = 0
+        self.max_age = max_age
+        # Changes to the rental table made by other processes, as of the last check.
+        self._foreign_writes: Optional[int] = None
+
+    def apply(self, before: Optional[RentalInDB], after: Optional[RentalInDB]):
+        """Applies one rental write. `before`/`after` are None for creates/deletes."""
+        if after is not None:
+            self.availability.add(after.id, after.id_vehicle, after.rent_date, after.return_date)
+        elif before is not None:
+            self.availability.remove(before.id)
+        self.summary.apply(
+            (before.id_vehicle, before.rent_value) if before is not None else None,
+            (after.id_vehicle, after.rent_value) if after is not None else None,
+            (after or before).id,
+        )
+        for rental in (before, after):
+            if rental is not None:
+                self.timeseries.invalidate_range(rental.rent_date, rental.return_date)
+
+    def mark_stale(self):
+        self.stale = True
+        self.generation += 1
+        self.timeseries.clear()
+
+    def mark_fresh(self, generation: int):
+        """Ends a rebuild started at `generation`; it stays stale if it was marked stale meanwhile."""
+        if generation == self.generation:
+            self.stale = False
+        self.last_refresh = time.monotonic()
+
+    def needs_refresh(self) -> bool:
+        return (
+            self.stale
+            or self.last_refresh is None
+            or time.monotonic() - self.last_refresh >= self.max_age
+        )
+
+    async def check_versions(self, versions) -> bool:
+        """
+        Marks the projections stale when the rental version moved by more than
+        this process's own writes (versions.own_bumps), i.e. another worker
+        wrote rentals since the last check. Returns whether it did.
+        """
+        try:
+            (version, _), = (await versions.current(("rental",))).values()
+        except Exception:
+            logger.warning("Could not read the rental version", exc_info=True)
+            return False
+        foreign = version - versions.own_bumps.get("rental", 0)
+        # Only grows: an own write counted but not yet stored in Redis does not turn foreign later.
+        previous = self._foreign_writes
+        if previous is not None and foreign <= previous:
+            return False
+        self._foreign_writes = foreign
+        if previous is None:
+            return False
+        self.mark_stale()
+        return True
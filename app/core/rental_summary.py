@@ -0,0 +1,112 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# (id_vehicle, rent_value) of a rental.
+Contribution = Tuple[Optional[int], int]
+
+
+class RentalSummary:
+    """
+    Incrementally maintained rental summary: total revenue and number of
+    rentals per vehicle.
+
+    Vehicles are grouped in buckets by rental count and the distinct counts are
+    kept sorted, so moving a vehicle up or down one rental is O(1) amortized and
+    reading the top N only walks the highest buckets.
+
+    A rebuild from the database (begin_rebuild, load, finish_rebuild) records
+    the writes applied meanwhile, keyed by rental, and corrects the snapshot
+    for each rental from its state in the snapshot to the last one seen, so a
+    write is counted once whether or not the snapshot already includes it.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.total_revenue = 0
+        self._counts: Dict[int, int] = {}
+        self._buckets: Dict[int, Set[int]] = {}
+        self._levels: List[int] = []  # distinct counts, ascending
+        self.labels: Dict[int, Tuple[str, str]] = {}
+        # During a rebuild: rental id -> (id_vehicle, rent_value) after the last write seen.
+        self._pending: Optional[Dict[int, Optional[Contribution]]] = None
+
+    def begin_rebuild(self):
+        """Starts recording writes so they can be reconciled with the fresh snapshot."""
+        self._pending = {}
+
+    def pending_ids(self) -> List[int]:
+        """Rentals written since begin_rebuild."""
+        return list(self._pending or ())
+
+    def finish_rebuild(
+        self, total_revenue: int, rows: Iterable[dict], snapshot: Dict[int, Optional[Contribution]]
+    ):
+        """
+        Loads the snapshot (see load) and applies, for each rental written since
+        begin_rebuild, the change from its state in the snapshot (`snapshot`,
+        None if absent) to the last state seen.
+        """
+        pending, self._pending = self._pending or {}, None
+        self.load(total_revenue, rows)
+        for rental_id, current in pending.items():
+            self.apply(snapshot.get(rental_id), current)
+
+    def abort_rebuild(self):
+        self._pending = None
+
+    def load(self, total_revenue: int, rows: Iterable[dict]):
+        """Replaces the content with rows of (id_vehicle, brand, model, rental_count)."""
+        self.total_revenue = total_revenue
+        self._counts, self._buckets, self._levels = {}, {}, []
+        self.labels = {}
+        for row in rows:
+            self.labels[row['id_vehicle']] = (row['brand'], row['model'])
+            self._move(row['id_vehicle'], row['rental_count'])
+        self.ready = True
+
+    def _move(self, vehicle_id: int, count: int):
+        old = self._counts.get(vehicle_id, 0)
+        if old:
+            bucket = self._buckets[old]
+            bucket.discard(vehicle_id)
+            if not bucket:
+                del self._buckets[old]
+                del self._levels[bisect_left(self._levels, old)]
+        if count > 0:
+            self._counts[vehicle_id] = count
+            if count not in self._buckets:
+                self._buckets[count] = set()
+                insort(self._levels, count)
+            self._buckets[count].add(vehicle_id)
+        else:
+            self._counts.pop(vehicle_id, None)
+
+    def apply(
+        self, before: Optional[Contribution], after: Optional[Contribution], rental_id: Optional[int] = None
+    ):
+        """
+        Applies one rental write, given as (id_vehicle, rent_value) before and
+        after it; None stands for "did not exist".
+        """
+        if self._pending is not None and rental_id is not None:
+            self._pending[rental_id] = after
+        if before is not None:
+            vehicle_id, value = before
+            self.total_revenue -= value
+            if vehicle_id is not None:
+                self._move(vehicle_id, self._counts.get(vehicle_id, 0) - 1)
+        if after is not None:
+            vehicle_id, value = after
+            self.total_revenue += value
+            if vehicle_id is not None:
+                self._move(vehicle_id, self._counts.get(vehicle_id, 0) + 1)
+
+    def top(self, n: int) -> List[Tuple[int, int]]:
+        """The `n` most rented vehicles as (id_vehicle, rental_count), ties by id."""
+        result = []
+        for count in reversed(self._levels):
+            for vehicle_id in sorted(self._buckets[count]):
+                result.append((vehicle_id, count))
+                if len(result) == n:
+                    return result
+        return result
@@ -0,0 +1,47 @@
+from functools import lru_cache
+from typing import Any, List, Sequence, Type, TypeVar
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+from ..schemas.fields import STORED_ROWS
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """TypeAdapter for List[model], compiled once per model."""
+    return TypeAdapter(List[model])
+
+
+def build_models(model: Type[ModelT], rows: Sequence[dict]) -> List[ModelT]:
+    """
+    Validates the database rows in a single pydantic-core call instead of one
+    `model(**row)` (with its Python overhead) per row. E-mails, validated
+    when written, are not validated again (see schemas.fields.Email).
+    """
+    return list_adapter(model).validate_python(rows, context={STORED_ROWS: True})
+
+
+def json_list_response(
+    model: Type[BaseModel], items: Sequence[Any], status_code: int = 200, exclude_unset: bool = False
+) -> Response:
+    """
+    Serializes the list straight to JSON bytes with the compiled serializer.
+    Returning a Response skips FastAPI's response_model handling, which would
+    validate every item again and encode it through json.dumps; keep the
+    route's response_model anyway, for the OpenAPI schema.
+    """
+    return Response(
+        content=list_adapter(model).dump_json(items, exclude_unset=exclude_unset),
+        status_code=status_code,
+        media_type="application/json",
+    )
+
+
+def json_model_response(item: BaseModel, status_code: int = 200, exclude_unset: bool = False) -> Response:
+    """Same as json_list_response, for a single (usually large) model."""
+    return Response(
+        content=item.model_dump_json(exclude_unset=exclude_unset), status_code=status_code, media_type="application/json",
+    )
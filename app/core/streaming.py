@@ -0,0 +1,25 @@
+from typing import AsyncIterator
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+async def _ndjson_lines(items: AsyncIterator[BaseModel], batch_size: int) -> AsyncIterator[bytes]:
+    """Serializes the items as NDJSON, grouping lines to cut the number of writes."""
+    buffer = []
+    async for item in items:
+        buffer.append(item.model_dump_json())
+        if len(buffer) >= batch_size:
+            yield ("\n".join(buffer) + "\n").encode()
+            buffer.clear()
+    if buffer:
+        yield ("\n".join(buffer) + "\n").encode()
+
+
+def ndjson_response(items: AsyncIterator[BaseModel], batch_size: int = 500) -> StreamingResponse:
+    """
+    Returns a streaming response with one JSON object per line.
+    Memory stays constant no matter how many items the iterator produces.
+    """
+    return StreamingResponse(_ndjson_lines(items, batch_size), media_type=NDJSON_MEDIA_TYPE)
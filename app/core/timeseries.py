@@ -0,0 +1,134 @@
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Tuple
+
+GRANULARITIES = ("day", "week", "month")
+# Bucket limit per query (10 years at daily granularity).
+MAX_BUCKETS = 3660
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def next_bucket(start: date, granularity: str) -> date:
+    if granularity == "day":
+        return start + timedelta(days=1)
+    if granularity == "week":
+        return start + timedelta(days=7)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def bucket_count(first_day: date, last_day: date, granularity: str) -> int:
+    """Number of buckets `bucket_range` would return, without building them."""
+    first, last = bucket_start(first_day, granularity), bucket_start(last_day, granularity)
+    if granularity == "day":
+        return (last - first).days + 1
+    if granularity == "week":
+        return (last - first).days // 7 + 1
+    return (last.year - first.year) * 12 + last.month - first.month + 1
+
+
+def bucket_range(first_day: date, last_day: date, granularity: str) -> List[Tuple[date, date]]:
+    """Buckets [start, end) covering first_day..last_day (inclusive), aligned to the granularity."""
+    buckets = []
+    start = bucket_start(first_day, granularity)
+    while start <= last_day:
+        end = next_bucket(start, granularity)
+        buckets.append((start, end))
+        start = end
+    return buckets
+
+
+@dataclass
+class BucketRentals:
+    """Rental-derived figures of one bucket. Vehicle-derived ones are computed per request."""
+    revenue: int = 0
+    rental_count: int = 0
+    rented_days_by_type: Dict[str, int] = field(default_factory=dict)
+    rented_days_by_vehicle: Dict[int, int] = field(default_factory=dict)
+
+
+class BucketAggregator:
+    """
+    Spreads the rentals over the buckets in a single pass: revenue and count
+    go to the bucket of the pick-up date, and the rented days are split among
+    every bucket the rental spans.
+    Rows are added one at a time so they can come straight from a streaming cursor.
+    """
+
+    def __init__(self, buckets: List[Tuple[date, date]]):
+        self._buckets = buckets
+        self._starts = [start for start, _ in buckets]
+        self._range = (buckets[0][0], buckets[-1][1])
+        self.result = [BucketRentals() for _ in buckets]
+
+    def add(self, row: dict):
+        """`row` needs rent_date, return_date, rent_value, id_vehicle and vehicle_type."""
+        range_start, range_end = self._range
+        rent_date, return_date = row['rent_date'], row['return_date']
+        if range_start <= rent_date < range_end:
+            bucket = self.result[bisect_right(self._starts, rent_date) - 1]
+            bucket.revenue += row['rent_value']
+            bucket.rental_count += 1
+
+        start, end = max(rent_date, range_start), min(return_date, range_end)
+        i = bisect_right(self._starts, start) - 1
+        vehicle_id, vehicle_type = row['id_vehicle'], row['vehicle_type']
+        while start < end:
+            bucket_end = self._buckets[i][1]
+            days = (min(end, bucket_end) - start).days
+            bucket = self.result[i]
+            bucket.rented_days_by_type[vehicle_type] = bucket.rented_days_by_type.get(vehicle_type, 0) + days
+            bucket.rented_days_by_vehicle[vehicle_id] = bucket.rented_days_by_vehicle.get(vehicle_id, 0) + days
+            start = bucket_end
+            i += 1
+
+
+class FleetCalendar:
+    """
+    Available vehicle-days per interval, from the registration dates.
+    Sorted registration days plus prefix sums make each lookup O(log n).
+    """
+
+    def __init__(self, registrations: Iterable[date]):
+        self._days = sorted(day.toordinal() for day in registrations)
+        self._prefix = [0] + list(accumulate(self._days))
+
+    def available_days(self, start: date, end: date) -> int:
+        s, e = start.toordinal(), end.toordinal()
+        before = bisect_right(self._days, s)       # registered on or before `start`
+        within = bisect_left(self._days, e)        # registered before `end`
+        inside_sum = self._prefix[within] - self._prefix[before]
+        return before * (e - s) + (within - before) * e - inside_sum
+
+
+class TimeseriesCache:
+    """
+    Permanent cache of the buckets that already ended, by granularity and start.
+    Rental writes drop the buckets they touch; cascaded deletes clear everything.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[str, date], BucketRentals] = {}
+
+    def get(self, granularity: str, start: date) -> Optional[BucketRentals]:
+        return self._buckets.get((granularity, start))
+
+    def put(self, granularity: str, start: date, bucket: BucketRentals):
+        self._buckets[(granularity, start)] = bucket
+
+    def invalidate_range(self, start: date, end: date):
+        """Drops every cached bucket overlapping [start, end]."""
+        for granularity in GRANULARITIES:
+            for bucket, _ in bucket_range(start, end, granularity):
+                self._buckets.pop((granularity, bucket), None)
+
+    def clear(self):
+        self._buckets.clear()
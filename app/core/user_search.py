@@ -0,0 +1,178 @@
+import os
+import re
+import unicodedata
+from array import array
+from collections import Counter
+from heapq import nlargest
+from math import ceil
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Turns the index off (saves memory); searches become a prefix query on the database.
+USER_SEARCH_INDEX = os.getenv("USER_SEARCH_INDEX", "true").lower() in ("1", "true", "yes")
+# Interval between full rebuilds, to pick up writes from other workers (0 turns it off).
+USER_SEARCH_REFRESH_SECONDS = float(os.getenv("USER_SEARCH_REFRESH_SECONDS", "900"))
+# Minimum fraction of the query's trigrams a user must contain to be listed.
+MIN_SIMILARITY = 0.5
+# Ids counted per search. The lists are read from rarest to most common and the
+# last one read is cut at the limit, so a search made only of very common
+# trigrams ("silva") stays within a few ms; it then ranks the first ones found.
+MAX_SCANNED_POSTINGS = 50_000
+# Candidates scored exactly, per requested result.
+CANDIDATES_PER_RESULT = 4
+
+SEARCH_FIELDS = ("name", "last_name", "email", "cpf")
+
+# CPF punctuation (123.456.789-00) and separators between digits are dropped, so
+# the CPF is indexed as one word however it was typed.
+_DIGIT_SEPARATORS = re.compile(r"(?<=\d)[.\-/ ](?=\d)")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> List[str]:
+    """Lowercase words without accents ("João" -> "joao")."""
+    text = unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode("ascii")
+    text = _DIGIT_SEPARATORS.sub("", text)
+    return [word for word in _NON_ALNUM.split(text) if word]
+
+
+def trigrams(words: List[str], prefix_last: bool = False) -> Set[str]:
+    """
+    Trigrams of the words padded with two spaces before and one after, as in
+    pg_trgm. With `prefix_last` the last word is not closed, so a query still
+    being typed ("silv") matches it as a prefix.
+    """
+    grams = set()
+    last = len(words) - 1
+    for position, word in enumerate(words):
+        padded = f"  {word}" if prefix_last and position == last else f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class UserSearchIndex:
+    """
+    In-memory trigram index over name, last name, e-mail and CPF.
+
+    Each trigram maps to an array of user ids; each user keeps its normalized
+    text, which makes add() idempotent (an update re-adds the user) and lets
+    the best candidates be scored exactly. A search counts the ids in the
+    query's rarest posting lists, then ranks the top candidates by the share
+    of query trigrams they contain. A few hundred bytes per user.
+
+    Deletes and updates leave the old posting entries in place as tombstones
+    instead of searching the arrays for them: a search skips the ids that are
+    no longer indexed and scores the rest from their current text, and the
+    next rebuild drops the tombstones.
+
+    Writes made through UserRepository keep it current. A full rebuild from
+    the database runs at startup and, to pick up other workers' writes, every
+    USER_SEARCH_REFRESH_SECONDS (0 turns the refresh off): load() fills a
+    separate snapshot and is safe to run in a worker thread, searches keep
+    using the current one, and finish_rebuild() swaps it in and replays the
+    writes seen meanwhile.
+    """
+
+    def __init__(self):
+        self._docs: Dict[int, str] = {}
+        self._postings: Dict[str, array] = {}
+        self._pending: Optional[list] = None
+        self._next: Optional[Tuple[Dict[int, str], Dict[str, array]]] = None
+        self.ready = False
+
+    @property
+    def size(self) -> int:
+        return len(self._docs)
+
+    @staticmethod
+    def document(user) -> str:
+        """Indexed text of a user (model or database row)."""
+        get = user.get if isinstance(user, dict) else lambda field: getattr(user, field)
+        return " ".join(normalize(" ".join(str(get(field) or "") for field in SEARCH_FIELDS)))
+
+    def begin_rebuild(self):
+        """Starts a new snapshot, filled by load(); searches keep using the current one."""
+        self._pending = []
+        self._next = ({}, {})
+
+    def load(self, rows: Iterable[dict]):
+        docs, postings = self._next
+        for row in rows:
+            _add(docs, postings, row["id"], self.document(row))
+
+    def finish_rebuild(self):
+        """Swaps in the new snapshot and replays the writes seen since begin_rebuild."""
+        (self._docs, self._postings), self._next = self._next, None
+        pending, self._pending = self._pending or [], None
+        for op, args in pending:
+            getattr(self, op)(*args)
+        self.ready = True
+
+    def abort_rebuild(self):
+        self._next = self._pending = None
+
+    def add(self, user_id: int, user):
+        """Indexes (or reindexes) `user`, any object with the SEARCH_FIELDS attributes."""
+        text = self.document(user)
+        if self._pending is not None:
+            self._pending.append(("_add", (user_id, text)))
+        self._add(user_id, text)
+
+    def remove(self, user_id: int):
+        if self._pending is not None:
+            self._pending.append(("_remove", (user_id,)))
+        self._remove(user_id)
+
+    def _add(self, user_id: int, text: str):
+        _add(self._docs, self._postings, user_id, text)
+
+    def _remove(self, user_id: int):
+        # The user's entries in the lists become tombstones (see the class docstring).
+        self._docs.pop(user_id, None)
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[int, float]]:
+        """(id, similarity) of the users closest to `query`, best first."""
+        words = normalize(query)
+        if not words:
+            return []
+        grams = trigrams(words, prefix_last=not query[-1:].isspace())
+        counts: Counter = Counter()
+        budget = MAX_SCANNED_POSTINGS
+        for ids in sorted((self._postings[gram] for gram in grams if gram in self._postings), key=len):
+            if budget <= 0:
+                break
+            counts.update(ids[:budget] if len(ids) > budget else ids)
+            budget -= len(ids)
+        docs = self._docs
+        candidates = [(user_id, count) for user_id, count in counts.items() if user_id in docs]
+        if not candidates:
+            return []
+
+        needed = ceil(len(grams) * MIN_SIMILARITY)
+        scored = []
+        for user_id, _ in nlargest(limit * CANDIDATES_PER_RESULT, candidates, key=itemgetter(1)):
+            document = docs[user_id].split()
+            document_grams = trigrams(document)
+            hits = len(grams & document_grams)
+            if hits >= needed:
+                # Tie-break: query words starting the user's words, then the shorter text.
+                prefixes = all(any(word.startswith(term) for word in document) for term in words)
+                scored.append((hits / len(grams), prefixes, -len(document_grams), -user_id))
+        scored.sort(reverse=True)
+        return [(-negative_id, round(score, 3)) for score, _, _, negative_id in scored[:limit]]
+
+
+def _add(docs: Dict[int, str], postings: Dict[str, array], user_id: int, text: str):
+    current = docs.get(user_id)
+    if current == text:
+        return
+    grams = trigrams(text.split())
+    if current is not None:
+        # The previous text's trigrams already have an entry; those that left become tombstones.
+        grams -= trigrams(current.split())
+    docs[user_id] = text
+    for gram in grams:
+        ids = postings.get(gram)
+        if ids is None:
+            ids = postings[gram] = array("I")
+        ids.append(user_id)
@@ -0,0 +1,129 @@
+import os
+import secrets
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from .cache import CACHE_TTL_SECONDS, EntityCache, LRUBackend, RedisBackend
+
+RESPONSE_CACHE_MAXSIZE = int(os.getenv("RESPONSE_CACHE_MAXSIZE", "2000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(CACHE_TTL_SECONDS)))
+# Without Redis the counters are per process, and a write made on one worker does not change the
+# others' tags. Local tags then also change every window, which bounds how long a worker answers 304
+# (or serves from the response cache) for content that has changed. 0 turns the window off: single worker only.
+LOCAL_VERSIONS_WINDOW_SECONDS = float(os.getenv("LOCAL_VERSIONS_WINDOW_SECONDS", "5"))
+
+# (version, time of the last change in epoch seconds) of a table.
+TableVersion = Tuple[int, float]
+
+
+class LocalVersions:
+    """
+    In-memory version counters per table. Writes made by another worker do
+    not bump them, so unless `window` is 0 (a single worker) the ETags built
+    from them also change every `window` seconds (see conditional_response).
+    The random epoch keeps tags from a previous run from matching after a
+    restart.
+    """
+
+    def __init__(self, window: float = LOCAL_VERSIONS_WINDOW_SECONDS):
+        self.epoch = secrets.token_hex(4)
+        self.window = window
+        self._started = time.time()
+        self._tables: Dict[str, TableVersion] = {}
+        # Changes made by this process, per table (see RentalProjections.check_versions).
+        self.own_bumps: Dict[str, int] = {}
+
+    async def bump(self, tables: Sequence[str]):
+        now = time.time()
+        for table in tables:
+            self.own_bumps[table] = self.own_bumps.get(table, 0) + 1
+            version, _ = self._tables.get(table, (0, self._started))
+            self._tables[table] = (version + 1, now)
+
+    async def current(self, tables: Sequence[str]) -> Dict[str, TableVersion]:
+        return {table: self._tables.get(table, (0, self._started)) for table in tables}
+
+
+class RedisVersions:
+    """
+    Same counters in Redis (one hash per table), shared by every worker. The
+    epoch is created on first use, so a Redis restart changes every tag.
+    """
+    # Sees the writes of every worker: the tags need no window.
+    window = 0
+
+    def __init__(self, client: Any):
+        self.client = client
+        self.epoch: Optional[str] = None
+        self.own_bumps: Dict[str, int] = {}
+
+    async def _epoch(self) -> str:
+        if self.epoch is None:
+            await self.client.set("versions:epoch", secrets.token_hex(4), nx=True)
+            epoch = await self.client.get("versions:epoch")
+            self.epoch = epoch.decode() if isinstance(epoch, bytes) else str(epoch)
+        return self.epoch
+
+    async def bump(self, tables: Sequence[str]):
+        now = time.time()
+        # Counted before they reach Redis: a read in between does not take them for foreign writes.
+        for table in tables:
+            self.own_bumps[table] = self.own_bumps.get(table, 0) + 1
+        async with self.client.pipeline(transaction=True) as pipe:
+            for table in tables:
+                pipe.hincrby(f"versions:{table}", "n", 1)
+                pipe.hset(f"versions:{table}", "at", now)
+            await pipe.execute()
+
+    async def current(self, tables: Sequence[str]) -> Dict[str, TableVersion]:
+        await self._epoch()
+        async with self.client.pipeline(transaction=False) as pipe:
+            for table in tables:
+                pipe.hmget(f"versions:{table}", "n", "at")
+            rows = await pipe.execute()
+        return {
+            table: (int(version or 0), float(changed_at or 0))
+            for table, (version, changed_at) in zip(tables, rows)
+        }
+
+
+class ResponseCache:
+    """Corpos de respostas completas por ETag; the tag already encodes the versions, so nothing is invalidated."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, etag: str) -> Optional[bytes]:
+        body = await self.backend.get(f"response:{etag}")
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return body
+
+    async def set(self, etag: str, body: bytes):
+        await self.backend.set(f"response:{etag}", body)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def create_versions(cache: Optional[EntityCache]):
+    """
+    Redis counters when the entity cache is on Redis (shared by the workers),
+    in-process ones with a LOCAL_VERSIONS_WINDOW_SECONDS window otherwise.
+    """
+    if cache is not None and isinstance(cache.backend, RedisBackend):
+        return RedisVersions(cache.backend.client)
+    return LocalVersions()
+
+
+def create_response_cache(cache: Optional[EntityCache]) -> Optional[ResponseCache]:
+    """Follows CACHE_BACKEND: off with `none`, on the same Redis with `redis`, its own LRU with `memory`."""
+    if cache is None:
+        return None
+    if isinstance(cache.backend, RedisBackend):
+        return ResponseCache(RedisBackend(cache.backend.client, ttl=RESPONSE_CACHE_TTL_SECONDS))
+    return ResponseCache(LRUBackend(maxsize=RESPONSE_CACHE_MAXSIZE, ttl=RESPONSE_CACHE_TTL_SECONDS))
@@ -1,23 +1,119 @@
 # database.py
+import asyncio
 import aiomysql
+import logging
 import os
+from typing import Iterable
+from .pool import InstrumentedPool
+from .routing import ReplicaSet
+
+logger = logging.getLogger(__name__)
 
 # Em um projeto real, use variáveis de ambiente para segurança!
 DB_HOST = os.getenv("MARIADB_HOST", "localhost")
+DB_PORT = int(os.getenv("MARIADB_PORT", "3306"))
 DB_USER = os.getenv("MARIADB_USER", "root")
 DB_PASSWORD = os.getenv("MARIADB_PASSWORD", "qwe123poi")
 DB_NAME = os.getenv("MARIADB_DATABASE", "br-rental-car")
+# Réplicas de leitura opcionais, no formato "host1:3306,host2:3306".
+DB_REPLICA_HOSTS = os.getenv("MARIADB_REPLICA_HOSTS", "")
+
+# Dimensionamento do pool, por worker do uvicorn.
+DB_POOL_MINSIZE = int(os.getenv("DB_POOL_MINSIZE", "1"))
+DB_POOL_MAXSIZE = int(os.getenv("DB_POOL_MAXSIZE", "10"))
+# Pool separado para os jobs em segundo plano (relatórios, exportações), para que
+# análises longas nunca tomem as conexões de que as reservas precisam.
+JOB_POOL_MAXSIZE = int(os.getenv("JOB_POOL_MAXSIZE", "2"))
+# Segundos para abrir uma conexão nova e para esperar uma conexão livre do pool.
+DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", "10"))
+# Conexões mais velhas que isso (em segundos) são recriadas; -1 desliga.
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+# Conexões abertas e validadas antes de o worker ficar pronto (0 desliga); o padrão é DB_POOL_MINSIZE.
+DB_POOL_WARMUP_SIZE = int(os.getenv("DB_POOL_WARMUP_SIZE", str(DB_POOL_MINSIZE)))
+DB_VALIDATION_QUERY = os.getenv("DB_VALIDATION_QUERY", "SELECT 1;")
+# Faz um ping antes de entregar cada conexão, descartando as que morreram.
+DB_PRE_PING = os.getenv("DB_PRE_PING", "false").lower() in ("1", "true", "yes")
 
 # O 'pool' de conexões é uma coleção de conexões abertas que podem ser
 # reutilizadas, o que é muito mais eficiente do que abrir e fechar
 # uma conexão para cada operação.
-async def get_db_pool():
+async def get_db_pool(
+    host: str = DB_HOST,
+    port: int = DB_PORT,
+    name: str = "primary",
+    minsize: int = DB_POOL_MINSIZE,
+    maxsize: int = DB_POOL_MAXSIZE,
+) -> InstrumentedPool:
     """Cria e retorna um pool de conexões com o banco de dados."""
-    return await aiomysql.create_pool(
-        host=DB_HOST,
-        port=3306,
+    pool = await aiomysql.create_pool(
+        host=host,
+        port=port,
         user=DB_USER,
         password=DB_PASSWORD,
         db=DB_NAME,
+        minsize=minsize,
+        maxsize=maxsize,
+        connect_timeout=DB_CONNECT_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
         autocommit=True  # Salva as alterações automaticamente
-    )
\ No newline at end of file
+    )
+    return InstrumentedPool(
+        pool,
+        name=name,
+        acquire_timeout=DB_ACQUIRE_TIMEOUT,
+        pre_ping=DB_PRE_PING,
+    )
+
+
+async def get_job_pool() -> InstrumentedPool:
+    """Pool do primário reservado aos jobs; nenhuma conexão é aberta até que um job rode."""
+    return await get_db_pool(name="jobs", minsize=0, maxsize=JOB_POOL_MAXSIZE)
+
+
+async def get_replica_pools() -> ReplicaSet:
+    """
+    Cria um pool para cada réplica em MARIADB_REPLICA_HOSTS.
+    Réplicas inalcançáveis na inicialização são ignoradas com um aviso.
+    """
+    pools = []
+    for i, address in enumerate(filter(None, (part.strip() for part in DB_REPLICA_HOSTS.split(",")))):
+        host, _, port = address.partition(":")
+        try:
+            pools.append(await get_db_pool(host, int(port or DB_PORT), name=f"replica-{i}"))
+        except Exception:
+            logger.warning("Read replica %s is unreachable; starting without it", address, exc_info=True)
+    return ReplicaSet(pools)
+
+
+async def warm_up_pools(pools: Iterable[InstrumentedPool], size: int = DB_POOL_WARMUP_SIZE):
+    """Aquece os pools em paralelo; um banco inalcançável derruba a inicialização, e não as primeiras requisições."""
+    pools = list(pools)
+    if size <= 0 or not pools:
+        return
+    opened = await asyncio.gather(*(pool.warm_up(size, DB_VALIDATION_QUERY) for pool in pools))
+    for pool, count in zip(pools, opened):
+        logger.info("Pool '%s' warmed up with %d validated connections", pool.name, count)
+
+
+async def close_pools(pools: Iterable[InstrumentedPool], timeout: float) -> bool:
+    """
+    Fecha os pools esperando, por até `timeout` segundos, que as conexões em
+    uso sejam devolvidas; depois disso, as restantes são cortadas. Retorna
+    se todos os pools fecharam de forma limpa.
+    """
+    pools = list(pools)
+    for pool in pools:
+        pool.close()
+    try:
+        await asyncio.wait_for(asyncio.gather(*(pool.wait_closed() for pool in pools)), timeout)
+        return True
+    except asyncio.TimeoutError:
+        for pool in pools:
+            in_use = pool.size - pool.freesize
+            if in_use:
+                logger.warning("Pool '%s' still had %d connections in use after %.0fs; cutting them",
+                               pool.name, in_use, timeout)
+            pool.terminate()
+        await asyncio.gather(*(pool.wait_closed() for pool in pools))
+        return False
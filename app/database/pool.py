@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import aiomysql
+
+from ..core.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """No connection became free within the acquire timeout."""
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.wait_time = Histogram()
+        self.acquisitions = 0
+        self.acquire_timeouts = 0
+        self.ping_failures = 0
+        self.waiting = 0
+
+
+class InstrumentedPool:
+    """
+    Wraps an aiomysql.Pool with an acquire timeout, optional pre-ping and
+    metrics (connections in use/free, wait time, timeouts).
+    Exposes the subset of the aiomysql.Pool API the repositories use.
+    """
+
+    def __init__(
+        self,
+        pool: aiomysql.Pool,
+        name: str = "primary",
+        acquire_timeout: Optional[float] = None,
+        pre_ping: bool = False,
+    ):
+        self._pool = pool
+        self.name = name
+        self.acquire_timeout = acquire_timeout
+        self.pre_ping = pre_ping
+        self.metrics = PoolMetrics()
+
+    @property
+    def minsize(self) -> int:
+        return self._pool.minsize
+
+    @property
+    def maxsize(self) -> int:
+        return self._pool.maxsize
+
+    @property
+    def size(self) -> int:
+        return self._pool.size
+
+    @property
+    def freesize(self) -> int:
+        return self._pool.freesize
+
+    async def _checkout(self) -> aiomysql.Connection:
+        metrics = self.metrics
+        started = time.perf_counter()
+        metrics.waiting += 1
+        try:
+            conn = await asyncio.wait_for(self._pool.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            metrics.acquire_timeouts += 1
+            raise PoolTimeoutError(
+                f"Timed out after {self.acquire_timeout}s waiting for a '{self.name}' DB connection"
+            ) from None
+        finally:
+            metrics.waiting -= 1
+        metrics.wait_time.observe(time.perf_counter() - started)
+        metrics.acquisitions += 1
+        return conn
+
+    async def _checkout_alive(self) -> aiomysql.Connection:
+        conn = await self._checkout()
+        if not self.pre_ping:
+            return conn
+        try:
+            await conn.ping(reconnect=False)
+            return conn
+        except Exception:
+            # Connection died while idle (server restart, wait_timeout...): drop it and retry once.
+            self.metrics.ping_failures += 1
+            logger.warning("Discarding dead connection from pool '%s'", self.name)
+            conn.close()
+            self._pool.release(conn)
+            return await self._checkout()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiomysql.Connection]:
+        conn = await self._checkout_alive()
+        try:
+            yield conn
+        finally:
+            self._pool.release(conn)
+
+    async def warm_up(self, size: int, validation_query: str = "SELECT 1;") -> int:
+        """
+        Opens up to `size` connections (at most maxsize) and validates each with
+        `validation_query`; they go back to the pool open, so the first
+        requests do not pay for the connection setup. Raises if any fails.
+        """
+        size = min(size, self.maxsize)
+        results = await asyncio.gather(
+            *(asyncio.wait_for(self._pool.acquire(), self.acquire_timeout) for _ in range(size)),
+            return_exceptions=True,
+        )
+        conns = [result for result in results if not isinstance(result, BaseException)]
+        try:
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+
+            async def validate(conn):
+                async with conn.cursor() as cursor:
+                    await cursor.execute(validation_query)
+                    await cursor.fetchall()
+
+            await asyncio.gather(*(validate(conn) for conn in conns))
+        finally:
+            for conn in conns:
+                self._pool.release(conn)
+        return len(conns)
+
+    def close(self):
+        self._pool.close()
+
+    def terminate(self):
+        """Also closes the connections in use, interrupting their queries."""
+        self._pool.terminate()
+
+    async def wait_closed(self):
+        await self._pool.wait_closed()
+
+    def stats(self) -> dict:
+        metrics = self.metrics
+        return {
+            "name": self.name,
+            "minsize": self.minsize,
+            "maxsize": self.maxsize,
+            "size": self.size,
+            "in_use": self.size - self.freesize,
+            "free": self.freesize,
+            "waiting": metrics.waiting,
+            "acquisitions": metrics.acquisitions,
+            "acquire_timeouts": metrics.acquire_timeouts,
+            "ping_failures": metrics.ping_failures,
+            "wait_time_seconds": metrics.wait_time.snapshot(),
+        }
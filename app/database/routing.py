@@ -0,0 +1,99 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Sequence
+
+import pymysql
+
+from .pool import InstrumentedPool, PoolTimeoutError
+
+# How long (seconds) a failed replica stays out of the rotation.
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+# Exceptions that may mean an unreachable server; is_connection_error() decides by the code.
+CONNECTION_ERRORS = (pymysql.err.OperationalError, PoolTimeoutError, OSError, asyncio.TimeoutError)
+# OperationalError codes that mean a lost or refused connection: client errors
+# (2002-2055) and the server refusing connections (1040) or shutting down (1053, 1927).
+CONNECTION_ERROR_CODES = frozenset((1040, 1053, 1927, 2002, 2003, 2005, 2006, 2013, 2026, 2055))
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    """
+    Whether `exc` means "this server is unreachable". Lock wait timeouts,
+    deadlocks or interrupted queries are also OperationalErrors, but they say
+    nothing about the server's health and must not take a replica out.
+    """
+    if isinstance(exc, pymysql.err.OperationalError):
+        return bool(exc.args) and exc.args[0] in CONNECTION_ERROR_CODES
+    return isinstance(exc, CONNECTION_ERRORS)
+
+
+class ReplicaSet:
+    """
+    Read replica pools used in turn (round-robin).
+    A replica that fails is skipped for REPLICA_RETRY_SECONDS before being tried again.
+    """
+
+    def __init__(self, pools: Sequence[InstrumentedPool], retry_after: float = REPLICA_RETRY_SECONDS):
+        self.pools = list(pools)
+        self.retry_after = retry_after
+        self._next = 0
+        self._failed_at: Dict[str, float] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.pools)
+
+    def _healthy(self, pool: InstrumentedPool, now: float) -> bool:
+        failed_at = self._failed_at.get(pool.name)
+        return failed_at is None or now - failed_at >= self.retry_after
+
+    def candidates(self) -> List[InstrumentedPool]:
+        """Healthy replicas in round-robin order (all of them if none is healthy)."""
+        if not self.pools:
+            return []
+        start = self._next % len(self.pools)
+        self._next += 1
+        ordered = self.pools[start:] + self.pools[:start]
+        now = time.monotonic()
+        healthy = [pool for pool in ordered if self._healthy(pool, now)]
+        return healthy or ordered
+
+    def mark_failed(self, pool: InstrumentedPool):
+        self._failed_at[pool.name] = time.monotonic()
+
+    def mark_ok(self, pool: InstrumentedPool):
+        self._failed_at.pop(pool.name, None)
+
+    def close(self):
+        for pool in self.pools:
+            pool.close()
+
+    async def wait_closed(self):
+        for pool in self.pools:
+            await pool.wait_closed()
+
+    def stats(self) -> List[dict]:
+        now = time.monotonic()
+        return [
+            {**pool.stats(), "healthy": self._healthy(pool, now)}
+            for pool in self.pools
+        ]
+
+
+class ReadConsistency:
+    """
+    Read consistency state of one request, shared by all of its
+    repositories.
+
+    Once the request writes, its later reads go to the primary so it always
+    sees its own writes; `primary_reads=True` sends every read there (for
+    clients that just wrote in a previous request and cannot tolerate lag).
+    """
+
+    def __init__(self, primary_reads: bool = False):
+        self.primary_reads = primary_reads
+        self.wrote = False
+
+    @property
+    def use_primary(self) -> bool:
+        return self.primary_reads or self.wrote
@@ -1,17 +1,126 @@
-from fastapi import Request
+from datetime import date
+from typing import List, Literal, Optional, Tuple
+from fastapi import HTTPException, Query, Request
 from ..repositories.user_repository import UserRepository
 from ..repositories.vehicle_repository import VehicleRepository
 from ..repositories.employee_repository import EmployeeRepository
-from ..repositories.rental_repository import RentalRepository
+from ..repositories.rental_repository import RELATIONS, RentalRepository
+from ..repositories.job_repository import JobRepository
+from ..database.routing import ReadConsistency
+
+
+def get_read_consistency(request: Request) -> ReadConsistency:
+    """
+    Estado de consistência de leitura da requisição, compartilhado por todos os
+    seus repositórios. Envie `X-Read-Your-Writes: true` para ler só do primário,
+    p. ex. logo após uma escrita feita numa requisição anterior.
+    """
+    consistency = getattr(request.state, "read_consistency", None)
+    if consistency is None:
+        primary_reads = request.headers.get("x-read-your-writes", "").lower() in ("1", "true", "yes")
+        consistency = request.state.read_consistency = ReadConsistency(primary_reads=primary_reads)
+    return consistency
+
+
+def _repository_state(request: Request) -> dict:
+    """Recursos compartilhados da aplicação que todo repositório recebe."""
+    state = request.app.state
+    return dict(
+        pool=state.db_pool,
+        cache=state.cache,
+        projections=state.rental_projections,
+        replicas=state.replicas,
+        consistency=get_read_consistency(request),
+        metrics=state.metrics,
+        versions=state.table_versions,
+        events=state.events,
+    )
 
 def get_user_repo(request: Request) -> UserRepository:
-    return UserRepository(pool=request.app.state.db_pool)
+    return UserRepository(**_repository_state(request), search_index=request.app.state.user_search)
 
 def get_vehicle_repo(request: Request) -> VehicleRepository:
-    return VehicleRepository(pool=request.app.state.db_pool)
+    return VehicleRepository(**_repository_state(request))
 
 def get_employee_repo(request: Request) -> EmployeeRepository:
-    return EmployeeRepository(pool=request.app.state.db_pool)
+    return EmployeeRepository(**_repository_state(request))
 
 def get_rental_repo(request: Request) -> RentalRepository:
-    return RentalRepository(pool=request.app.state.db_pool)
\ No newline at end of file
+    return RentalRepository(**_repository_state(request))
+
+def get_job_repo(request: Request) -> JobRepository:
+    # Só o pool dos jobs: consultar um job não pode tomar uma conexão das reservas.
+    state = request.app.state
+    return JobRepository(state.job_pool, metrics=state.metrics)
+
+
+# Máximo de ids aceitos em `?ids=`.
+MAX_IDS = 1000
+
+
+class PageParams:
+    """Parâmetros de paginação por keyset compartilhados pelas rotas de listagem."""
+    def __init__(
+        self,
+        after_id: int = Query(0, ge=0, description="Return records with id greater than this value."),
+        limit: int = Query(100, ge=1, le=1000, description="Maximum number of records in the page."),
+        stream: bool = Query(False, description="Stream every record after `after_id` as NDJSON, ignoring `limit`."),
+        ids: Optional[str] = Query(
+            None, pattern=r"^\d+(,\d+)*$",
+            description=f"Comma-separated ids (at most {MAX_IDS}): return those records, in that order, instead of a page.",
+        ),
+    ):
+        self.after_id = after_id
+        self.limit = limit
+        self.stream = stream
+        self.ids: Optional[List[int]] = None
+        if ids is not None:
+            self.ids = [int(value) for value in ids.split(",")]
+            if len(self.ids) > MAX_IDS:
+                raise HTTPException(status_code=422, detail=f"At most {MAX_IDS} ids per request")
+
+
+class RentalSearchParams:
+    """Filtros, ordenação e paginação de GET /rental/search."""
+    def __init__(
+        self,
+        id_user: Optional[int] = Query(None, gt=0),
+        id_vehicle: Optional[int] = Query(None, gt=0),
+        id_employee: Optional[int] = Query(None, gt=0),
+        rent_from: Optional[date] = Query(None, description="rent_date on or after this day."),
+        rent_to: Optional[date] = Query(None, description="rent_date on or before this day."),
+        return_from: Optional[date] = Query(None, description="return_date on or after this day."),
+        return_to: Optional[date] = Query(None, description="return_date on or before this day."),
+        min_value: Optional[int] = Query(None, ge=0, description="Minimum rent_value, in cents."),
+        max_value: Optional[int] = Query(None, ge=0, description="Maximum rent_value, in cents."),
+        sort: Literal['id', 'rent_date', 'return_date', 'rent_value'] = Query('rent_date'),
+        order: Literal['asc', 'desc'] = Query('desc'),
+        limit: int = Query(100, ge=1, le=1000, description="Maximum number of records in the page."),
+        cursor: Optional[str] = Query(None, description="`next_cursor` of the previous page."),
+    ):
+        self.filters = {
+            name: value for name, value in (
+                ("id_user", id_user), ("id_vehicle", id_vehicle), ("id_employee", id_employee),
+                ("rent_from", rent_from), ("rent_to", rent_to),
+                ("return_from", return_from), ("return_to", return_to),
+                ("min_value", min_value), ("max_value", max_value),
+            )
+            if value is not None
+        }
+        self.sort = sort
+        self.descending = order == 'desc'
+        self.limit = limit
+        self.cursor = cursor
+
+
+def rental_expand(
+    expand: Optional[str] = Query(
+        None, pattern=r"^(user|vehicle|employee)(,(user|vehicle|employee))*$",
+        description="Comma-separated related entities to nest in each rental: user, vehicle, employee.",
+    ),
+) -> Tuple[str, ...]:
+    """Relações pedidas em `?expand=`, sem repetição e numa ordem fixa."""
+    if not expand:
+        return ()
+    requested = set(expand.split(","))
+    return tuple(name for name in RELATIONS if name in requested)
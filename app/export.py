@@ -0,0 +1,174 @@
+"""
+Exports the rental table to compressed columnar files for offline analytics,
+partitioned by month of `rent_date` (Hive-style `rent_month=YYYY-MM/` folders).
+
+    python -m app.export /data/rentals                           # Parquet, incremental
+    python -m app.export /data/rentals --with user,vehicle       # joined columns as vehicle__brand, ...
+    python -m app.export /data/rentals --format arrow --full     # Arrow IPC, from the first rental
+
+Rows come from MariaDB through a server-side cursor (a read replica when
+MARIADB_REPLICA_HOSTS is set) in chunks of --chunk-size, so memory stays
+bounded whatever the table size. Each run writes one `part-<first id>` file per
+month it touches and records the last exported id in `_watermark.json`.
+
+Ids are allocated when a rental is inserted but become visible only when its
+transaction commits, so a lower id can show up after a higher one was already
+exported. The next run therefore re-reads the last --overlap ids below the
+watermark, which also records the ids exported in that window, and skips the
+ones it already has: a rental committed late is picked up as long as fewer than
+--overlap ids were allocated while it was in flight. Only new rentals are
+picked up: changes to rentals that were already exported need a --full run
+(into an empty directory). Needs the optional pyarrow package.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Set, Tuple
+
+from .core.exports import COLUMNAR_FORMATS, EXPORT_BATCH_SIZE, parquet_available, write_partitioned
+from .database.db import get_db_pool, get_replica_pools
+from .repositories.rental_repository import RELATIONS, RentalRepository, export_columns
+
+WATERMARK_FILE = "_watermark.json"
+EXTENSIONS = {"parquet": "parquet", "arrow": "arrow"}
+# Ids below the watermark read again by every incremental export, to catch late commits.
+EXPORT_OVERLAP_IDS = int(os.getenv("EXPORT_OVERLAP_IDS", "1000"))
+
+
+def read_watermark(directory: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(directory, WATERMARK_FILE), encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def write_watermark(directory: str, watermark: dict):
+    """Written only once every file of the export is in place."""
+    path = os.path.join(directory, WATERMARK_FILE)
+    with open(f"{path}.part", "w", encoding="utf-8") as file:
+        json.dump(watermark, file, indent=2)
+    os.replace(f"{path}.part", path)
+
+
+def part_file_name(directory: str, first_id: int, format: str) -> str:
+    """`part-<first id>`, with a suffix if an earlier run already used that name."""
+    name, suffix = f"part-{first_id:012d}", 0
+    while glob.glob(os.path.join(directory, "*", f"{name}.{EXTENSIONS[format]}")):
+        suffix += 1
+        name = f"part-{first_id:012d}-{suffix}"
+    return f"{name}.{EXTENSIONS[format]}"
+
+
+async def skip_exported(rows: AsyncIterator[dict], exported: Set[int], ids: List[int]) -> AsyncIterator[dict]:
+    """Drops the rows re-read from the overlap window that are already exported; collects the ids of the rest."""
+    async for row in rows:
+        if row["id"] in exported:
+            continue
+        ids.append(row["id"])
+        yield row
+
+
+def rent_month(row: dict) -> str:
+    return f"rent_month={row['rent_date']:%Y-%m}"
+
+
+def parse_relations(value: str) -> Tuple[str, ...]:
+    requested = set(filter(None, value.split(",")))
+    unknown = requested - set(RELATIONS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown relation(s): {', '.join(sorted(unknown))}")
+    return tuple(name for name in RELATIONS if name in requested)
+
+
+async def main_async(args) -> int:
+    if not parquet_available():
+        print("The columnar export needs pyarrow: pip install pyarrow", file=sys.stderr)
+        return 2
+    os.makedirs(args.directory, exist_ok=True)
+    watermark = None if args.full else read_watermark(args.directory)
+    if watermark is not None and (
+        watermark["format"] != args.format or tuple(watermark["relations"]) != args.relations
+    ):
+        print(
+            f"{args.directory} holds a {watermark['format']} export with relations {watermark['relations']}; "
+            "use the same options or --full into another directory",
+            file=sys.stderr,
+        )
+        return 2
+    last_id, exported = 0, set()
+    if args.since_id is not None:
+        last_id = args.since_id
+    elif watermark is not None:
+        last_id, exported = watermark["last_id"], set(watermark.get("recent_ids", ()))
+    # Watermarks without `recent_ids` (older than the overlap) continue after the last id.
+    after_id = max(0, last_id - watermark["overlap"]) if exported else last_id
+    ids: List[int] = []
+
+    pool = await get_db_pool(name="export", minsize=1, maxsize=1)
+    replicas = await get_replica_pools()
+    try:
+        repo = RentalRepository(pool, replicas=replicas)
+        started = time.perf_counter()
+        result = await write_partitioned(
+            args.directory,
+            args.format,
+            export_columns(args.relations),
+            skip_exported(repo.stream_export(args.relations, after_id=after_id, chunk_size=args.chunk_size), exported, ids),
+            partition=rent_month,
+            file_name=part_file_name(args.directory, last_id + 1, args.format),
+            batch_size=args.chunk_size,
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        pool.close()
+        replicas.close()
+        await pool.wait_closed()
+        await replicas.wait_closed()
+
+    if ids:
+        exported.update(ids)
+        last_id = max(last_id, max(ids))
+        # Only the ids above after_id are known; the stored window does not reach below it.
+        floor = max(after_id, last_id - args.overlap)
+        write_watermark(args.directory, {
+            "last_id": last_id,
+            "overlap": last_id - floor,
+            "recent_ids": sorted(i for i in exported if i > floor),
+            "format": args.format,
+            "relations": list(args.relations),
+            "exported_at": datetime.now(timezone.utc).isoformat(),
+        })
+    rate = result.rows / elapsed if elapsed else 0.0
+    print(
+        f"Exported {result.rows} rentals after id {after_id} into {len(result.files)} files "
+        f"in {elapsed:.1f}s ({rate:.0f} rows/s); watermark is now {last_id}"
+    )
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="output directory (holds the partitions and the watermark)")
+    parser.add_argument("--format", choices=COLUMNAR_FORMATS, default="parquet")
+    parser.add_argument(
+        "--with", dest="relations", type=parse_relations, default=(),
+        help="comma-separated relations to join in: user, vehicle, employee",
+    )
+    parser.add_argument("--since-id", type=int, help="export rentals with id greater than this, ignoring the watermark")
+    parser.add_argument("--full", action="store_true", help="ignore the watermark and export every rental")
+    parser.add_argument(
+        "--overlap", type=int, default=EXPORT_OVERLAP_IDS,
+        help="ids below the watermark re-read on the next run, for rentals committed late",
+    )
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_BATCH_SIZE, help="rows per fetch and per write")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
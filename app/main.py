@@ -1,33 +1,174 @@
-from fastapi import FastAPI
-from .routers import user, vehicles, employee, rental
+import asyncio
+import time
+from datetime import date
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from .routers import user, vehicles, employee, rental, system, jobs
 from contextlib import asynccontextmanager
-from .database.db import get_db_pool
+from .database.db import DB_POOL_MAXSIZE, close_pools, get_db_pool, get_job_pool, get_replica_pools, warm_up_pools
+from .database.pool import PoolTimeoutError
+from .core.projections import PROJECTION_REFRESH_SECONDS, PROJECTION_UNSHARED_REFRESH_SECONDS, RentalProjections
+from .core.admission import (
+    ADMISSION_CONTROL, ADMISSION_MAX_CONCURRENCY, RATE_LIMIT_BURST, RATE_LIMIT_PER_SECOND,
+    AdmissionController, AdmissionMiddleware, RateLimiter,
+)
+from .core.background import run_periodically
+from .core.events import EventHub, TooManySubscribersError
+from .core.jobs import JobQueueFullError, JobRunner
+from .core.job_handlers import job_handlers
+from .core.lifecycle import DRAIN_TIMEOUT_SECONDS, Lifecycle, LifecycleMiddleware
+from .core.pricing import PriceTable, PricingRules
+from .core.user_search import USER_SEARCH_INDEX, USER_SEARCH_REFRESH_SECONDS, UserSearchIndex
+from .core.cache import create_cache
+from .core.versions import create_response_cache, create_versions
+from .core.metrics import MetricsRegistry
+from .core.profiling import InstrumentationMiddleware, ProfiledRoute
+from .repositories.rental_repository import RentalRepository
+from .repositories.job_repository import JobRepository
+from .repositories.user_repository import UserRepository
+from .repositories.base_repository import TransactionRetryError, VersionConflictError
+
+# Intervalo entre as verificações de projeções desatualizadas.
+PROJECTION_CHECK_SECONDS = 5
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # --- Code to run on startup ---
+    # --- Código executado na inicialização ---
     print("INFO:     Starting up and creating DB pool...")
-    # Create the pool and store it in the application's state.
-    # The 'state' is a special object to share resources.
+    lifecycle = app.state.lifecycle
+    lifecycle.install_signal_handlers()
+    # Cria o pool e o guarda no estado da aplicação.
+    # O 'state' é um objeto especial para compartilhar recursos.
     app.state.db_pool = await get_db_pool()
-    
-    yield # The application runs here
+    app.state.replicas = await get_replica_pools()
+    # Conexões abertas antes da primeira requisição, em paralelo (e não uma a uma na primeira rajada).
+    await warm_up_pools([app.state.db_pool, *app.state.replicas.pools])
+    app.state.cache = create_cache()
+    app.state.table_versions = create_versions(app.state.cache)
+    app.state.response_cache = create_response_cache(app.state.cache)
+    app.state.pricing_rules = PricingRules.from_env()
+    app.state.events = EventHub()
+    lifecycle.on_drain(app.state.events.close)
+    app.state.price_table = PriceTable()
+
+    # Com contadores por processo e vários workers (janela > 0), as escritas dos outros só entram
+    # nas projeções pela reconstrução periódica, que então fica mais frequente.
+    shared_versions = app.state.table_versions.window == 0
+    app.state.rental_projections = RentalProjections(
+        max_age=PROJECTION_REFRESH_SECONDS if shared_versions else PROJECTION_UNSHARED_REFRESH_SECONDS
+    )
+    rental_repo = RentalRepository(
+        app.state.db_pool, projections=app.state.rental_projections, metrics=app.state.metrics
+    )
+
+    async def refresh_projections():
+        # Antes da reconstrução: uma escrita alheia vista agora já entra no snapshot.
+        await app.state.rental_projections.check_versions(app.state.table_versions)
+        if app.state.rental_projections.needs_refresh():
+            await rental_repo.refresh_projections(today=date.today())
+
+    print("INFO:     Loading rental projections (availability index, summary)...")
+    await refresh_projections()
+    refresher = asyncio.create_task(
+        run_periodically(PROJECTION_CHECK_SECONDS, refresh_projections, "rental-projections")
+    )
 
-    # --- Code to run on shutdown ---
+    # Índice de busca de usuários, montado em segundo plano; até ficar pronto, /users/search usa o banco.
+    app.state.user_search = UserSearchIndex() if USER_SEARCH_INDEX else None
+    search_refresher = None
+    if app.state.user_search is not None:
+        user_repo = UserRepository(
+            app.state.db_pool, replicas=app.state.replicas, metrics=app.state.metrics,
+            search_index=app.state.user_search,
+        )
+        search_refresher = asyncio.create_task(run_periodically(
+            USER_SEARCH_REFRESH_SECONDS, user_repo.rebuild_search_index, "user-search-index", immediately=True
+        ))
+
+    # Relatórios e exportações rodam em segundo plano, no pool próprio dos jobs.
+    app.state.job_pool = await get_job_pool()
+    app.state.job_runner = JobRunner(
+        lambda: JobRepository(app.state.job_pool, metrics=app.state.metrics), job_handlers(app.state)
+    )
+    await app.state.job_runner.start()
+    lifecycle.mark_ready()
+
+    yield # A aplicação roda aqui
+
+    # --- Código executado no encerramento ---
+    # O drain começa no SIGTERM (install_signal_handlers); begin_drain() só cobre o caso sem sinal.
+    # A espera do servidor pelas requisições só tem limite com --timeout-graceful-shutdown, então o
+    # que ainda estiver em andamento tem até DRAIN_TIMEOUT_SECONDS, junto com o fechamento dos pools.
+    deadline = time.monotonic() + DRAIN_TIMEOUT_SECONDS
+    lifecycle.begin_drain()
+    await lifecycle.wait_idle(DRAIN_TIMEOUT_SECONDS)
+    refresher.cancel()
+    if search_refresher is not None:
+        search_refresher.cancel()
+    await app.state.job_runner.close()
+    if app.state.cache is not None:
+        await app.state.cache.close()
     print("INFO:     Shutting down and closing DB pool...")
-    app.state.db_pool.close()
-    await app.state.db_pool.wait_closed()
+    await close_pools(
+        [app.state.db_pool, app.state.job_pool, *app.state.replicas.pools], max(1.0, deadline - time.monotonic())
+    )
 
 
 app = FastAPI(lifespan=lifespan)
+app.router.route_class = ProfiledRoute
+# Registro de métricas exposto em /metrics, alimentado pelo middleware e pelos repositórios.
+app.state.metrics = MetricsRegistry()
+# Estado do worker (starting/ready/draining), lido por /health/ready e pelo middleware de drain.
+app.state.lifecycle = Lifecycle()
+# Controle de admissão por dentro da instrumentação, para que as requisições rejeitadas também sejam medidas.
+app.state.admission = None
+if ADMISSION_CONTROL:
+    app.state.admission = AdmissionController(ADMISSION_MAX_CONCURRENCY or 2 * DB_POOL_MAXSIZE)
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=app.state.admission,
+        limiter=RateLimiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST) if RATE_LIMIT_PER_SECOND > 0 else None,
+    )
+app.add_middleware(LifecycleMiddleware, lifecycle=app.state.lifecycle)
+app.add_middleware(InstrumentationMiddleware, registry=app.state.metrics)
+
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    # O pool está saturado: melhor falhar rápido do que enfileirar indefinidamente.
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+@app.exception_handler(JobQueueFullError)
+async def job_queue_full_handler(request: Request, exc: JobQueueFullError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "30"})
+
+
+@app.exception_handler(TooManySubscribersError)
+async def too_many_subscribers_handler(request: Request, exc: TooManySubscribersError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"})
+
+
+@app.exception_handler(VersionConflictError)
+async def version_conflict_handler(request: Request, exc: VersionConflictError):
+    # A linha mudou desde a leitura do cliente: ele relê e decide de novo.
+    return JSONResponse(status_code=409, content={"detail": str(exc), "current_version": exc.current_version})
+
+
+@app.exception_handler(TransactionRetryError)
+async def transaction_retry_handler(request: Request, exc: TransactionRetryError):
+    # Contenção persistente nos locks: o cliente pode repetir em seguida.
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
 
 
 app.include_router(user.router)
 app.include_router(vehicles.router)
 app.include_router(employee.router)
 app.include_router(rental.router)
+app.include_router(jobs.router)
+app.include_router(system.router)
 
 @app.get("/")
 async def root():
     return {"API V1": "BR RENTAL CAR"}
-
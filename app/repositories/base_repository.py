@@ -1,40 +1,577 @@
 # /app/database/base_repository.py
 
+import asyncio
+import logging
+import random
+import time
+
 import aiomysql
-from typing import Optional, Any
+import pymysql
+from contextlib import asynccontextmanager
+from typing import Optional, Any, AsyncIterator, Awaitable, Callable, Dict, List, Sequence, Tuple, Type, TypeVar
+from pydantic import BaseModel
+from ..core.bulk import BULK_BATCH_SIZE
+from ..core.cache import EntityCache
+from ..core.events import EventHub
+from ..core.loader import BatchLoader
+from ..core.metrics import MetricsRegistry
+from ..core.profiling import current_profile
+from ..core.serialization import build_models
+from ..core.projections import RentalProjections
+from ..database.routing import CONNECTION_ERRORS, ReadConsistency, ReplicaSet, is_connection_error
+from ..schemas.bulk import BulkRowError, BulkResult
+from .statements import Statement, StatementKind, TableStatements
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+ResultT = TypeVar("ResultT")
+
+logger = logging.getLogger(__name__)
+
+# InnoDB errors after which the whole transaction can be retried.
+RETRYABLE_TRANSACTION_ERRORS = {1213: "deadlock", 1205: "lock_wait_timeout"}
+TRANSACTION_ATTEMPTS = 3
+# Base of the jittered exponential backoff between attempts, in seconds.
+TRANSACTION_RETRY_BACKOFF = 0.02
+
+
+class TransactionRetryError(Exception):
+    """A transaction kept hitting deadlocks or lock wait timeouts after every attempt."""
+
+
+class VersionConflictError(Exception):
+    """The row's `version` is no longer the one the client based its update on."""
+
+    def __init__(self, table: str, entity_id: int, current_version: int):
+        self.table = table
+        self.entity_id = entity_id
+        self.current_version = current_version
+        super().__init__(f"{table} {entity_id} was modified concurrently (current version is {current_version})")
+
+
+class _TimedCursor:
+    """Transaction cursor that reports the time of each statement to the repository."""
+
+    def __init__(self, cursor: aiomysql.DictCursor, observe):
+        self._cursor = cursor
+        self._observe = observe
+
+    async def execute(self, query: str, args: Any = None):
+        started = time.perf_counter()
+        try:
+            result = await self._cursor.execute(query, args)
+        except BaseException:
+            self._observe(query, time.perf_counter() - started, error=True)
+            raise
+        self._observe(query, time.perf_counter() - started, rows=self._cursor.rowcount)
+        return result
+
+    async def executemany(self, query: str, args: Any):
+        started = time.perf_counter()
+        try:
+            result = await self._cursor.executemany(query, args)
+        except BaseException:
+            self._observe(query, time.perf_counter() - started, error=True)
+            raise
+        self._observe(query, time.perf_counter() - started, rows=self._cursor.rowcount)
+        return result
+
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
 
 class BaseRepository:
     """
-    Classe base que contém a lógica de execução de queries,
-    para ser reutilizada por todos os outros repositórios.
+    Base class holding the query execution logic,
+    reused by every other repository.
     """
-    def __init__(self, pool: aiomysql.Pool):
+    # Table name, used as the cache namespace.
+    table: str = ""
+    # Tables whose rows are removed by ON DELETE CASCADE when a row of this table is deleted.
+    cascades: tuple = ()
+    # The table's SQL statements, built once per class.
+    statements: TableStatements
+    # `*InDB` model of the table's rows.
+    model: Type[BaseModel]
+
+    def __init__(
+        self,
+        pool: aiomysql.Pool,
+        cache: Optional[EntityCache] = None,
+        projections: Optional[RentalProjections] = None,
+        replicas: Optional[ReplicaSet] = None,
+        consistency: Optional[ReadConsistency] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        versions=None,
+        events: Optional[EventHub] = None,
+    ):
         self.pool = pool
+        self.cache = cache
+        self.projections = projections
+        self.replicas = replicas
+        self.consistency = consistency if consistency is not None else ReadConsistency()
+        self.metrics = metrics
+        # Per-table version counters (ETags); LocalVersions or RedisVersions.
+        self.versions = versions
+        # Write events for /vehicles/stream.
+        self.events = events
+        # Repositories are created per request, so the loader is too.
+        self._loader: Optional[BatchLoader[int, dict]] = None
+
+    def _observe_query(
+        self, sql: str, seconds: float, rows: int = 0, pool_wait: float = 0.0, error: bool = False
+    ):
+        """Records one statement in the metrics registry and in the current request's profile."""
+        if self.metrics is not None:
+            self.metrics.observe_query(sql, seconds, rows=rows, pool_wait=pool_wait, error=error)
+        profile = current_profile()
+        if profile is not None:
+            profile.add_query(seconds, rows, pool_wait)
+
+    async def _cache_get(self, entity_id: int, model: Type[ModelT]) -> Optional[ModelT]:
+        if self.cache is None:
+            return None
+        return await self.cache.get(self.table, entity_id, model)
+
+    async def _cache_set(self, entity_id: int, entity: BaseModel):
+        if self.cache is not None:
+            await self.cache.set(self.table, entity_id, entity)
+
+    async def _invalidate(self, entity_id: int, cascade: bool = False):
+        """
+        Removes the entity from the cache. With `cascade=True` (deletes), also
+        invalidates whatever holds rows that ON DELETE CASCADE may have removed.
+        """
+        if self.cache is not None:
+            await self.cache.invalidate(self.table, entity_id)
+        if cascade:
+            await self._invalidate_cascades()
+
+    async def _invalidate_cascades(self):
+        if self.cache is not None:
+            for table in self.cascades:
+                await self.cache.clear(table)
+        if self.projections is not None and "rental" in self.cascades:
+            self.projections.mark_stale()
+        if "rental" in self.cascades:
+            # Bookings removed in cascade do not publish events of their own.
+            self._publish("resync")
+
+    def _publish(self, type: str, data: Any = None):
+        if self.events is not None:
+            self.events.publish(type, data)
+
+    def _to_models(self, records: Sequence[dict]) -> List[BaseModel]:
+        return build_models(self.model, records)
+
+    async def _load_record(self, entity_id: int) -> Optional[dict]:
+        """
+        Row by id through the request's BatchLoader: a lone call is a plain
+        SELECT ... WHERE id = %s, concurrent get_by_id calls made in the same
+        tick share one SELECT ... IN (...).
+        """
+        if self._loader is None:
+            self._loader = BatchLoader(self._fetch_records)
+        return await self._loader.load(entity_id)
+
+    async def _fetch_records(self, ids: List[int]) -> Dict[int, dict]:
+        if len(ids) == 1:
+            record = await self._execute_query(self.statements.select_by_id, params=(ids[0],), fetch='one')
+            return {ids[0]: record} if record else {}
+        statement, params = self.statements.padded(self.statements.select_in, ids)
+        records = await self._execute_query(statement, params=params, fetch='all') or []
+        return {record['id']: record for record in records}
+
+    async def get_many(self, ids: Sequence[int]) -> List[BaseModel]:
+        """
+        Entities for `ids`, in the order asked and without duplicates; missing
+        ids are left out. Cache hits are served from the cache, the rest come
+        from a single IN query.
+        """
+        unique_ids = list(dict.fromkeys(ids))
+        if self.cache is not None:
+            cached = await asyncio.gather(*(self._cache_get(entity_id, self.model) for entity_id in unique_ids))
+            found = {entity_id: entity for entity_id, entity in zip(unique_ids, cached) if entity is not None}
+        else:
+            found = {}
+        missing = [entity_id for entity_id in unique_ids if entity_id not in found]
+        if missing:
+            records = await self._fetch_records(missing)
+            for entity in self._to_models([records[entity_id] for entity_id in missing if entity_id in records]):
+                found[entity.id] = entity
+                await self._cache_set(entity.id, entity)
+        return [found[entity_id] for entity_id in unique_ids if entity_id in found]
+
+    async def _changed(self):
+        """Bumps the version of this table (and of the ones ON DELETE CASCADE reaches) after a write."""
+        if self.versions is not None:
+            await self.versions.bump((self.table,) + self.cascades)
+
+    def _read_pools(self) -> list:
+        """
+        Pools a read may use, in order: the replicas (round-robin) and then the
+        primary as a fallback; only the primary once this request has written.
+        """
+        if not self.replicas or self.consistency.use_primary:
+            return [self.pool]
+        return self.replicas.candidates() + [self.pool]
+
+    def _replica_failed(self, pool, exc: BaseException):
+        if pool is self.pool or not is_connection_error(exc):
+            raise exc
+        self.replicas.mark_failed(pool)
 
     async def _execute_query(
         self, 
-        query: str, 
+        statement: Statement, 
         params: Optional[tuple] = None, 
         fetch: Optional[str] = None
     ) -> Optional[Any]:
         """
-        Método auxiliar genérico para executar queries no banco de dados.
+        Generic helper to run queries against the database.
+        SELECTs go to a replica, when there is one; every other statement goes to the primary.
         """
-        async with self.pool.acquire() as conn:
+        if not statement.is_read:
+            self.consistency.wrote = True
+            result = await self._run_query(self.pool, statement, params, fetch)
+            await self._changed()
+            return result
+        for pool in self._read_pools():
+            try:
+                return await self._run_query(pool, statement, params, fetch)
+            except CONNECTION_ERRORS as exc:
+                self._replica_failed(pool, exc)
+
+    async def _run_query(self, pool, statement: Statement, params: Optional[tuple], fetch: Optional[str]) -> Optional[Any]:
+        started = time.perf_counter()
+        async with pool.acquire() as conn:
+            acquired = time.perf_counter()
             async with conn.cursor(aiomysql.DictCursor) as cursor:
+                try:
+                    result = await self._fetch_result(cursor, statement, params, fetch)
+                except BaseException:
+                    self._observe_query(
+                        statement.sql, time.perf_counter() - acquired, pool_wait=acquired - started, error=True
+                    )
+                    raise
+                self._observe_query(
+                    statement.sql, time.perf_counter() - acquired,
+                    rows=cursor.rowcount, pool_wait=acquired - started,
+                )
+                return result
+
+    @staticmethod
+    async def _fetch_result(cursor, statement: Statement, params: Optional[tuple], fetch: Optional[str]) -> Optional[Any]:
+        await cursor.execute(statement.sql, params or ())
+        
+        if fetch == 'one':
+            return await cursor.fetchone()
+        if fetch == 'all':
+            return await cursor.fetchall()
+        if fetch == 'results':
+            # Multi-statement: (rowcount, rows) of each statement, in order.
+            results = [(cursor.rowcount, await cursor.fetchall())]
+            while await cursor.nextset():
+                results.append((cursor.rowcount, await cursor.fetchall()))
+            return results
+        
+        # For INSERT, return the ID of the new row.
+        if statement.kind is StatementKind.INSERT:
+            return cursor.lastrowid
+        
+        # For UPDATE and DELETE, we can return the number of affected rows.
+        if statement.kind in (StatementKind.UPDATE, StatementKind.DELETE):
+            return cursor.rowcount
+        
+        return None
+
+    async def _update_returning(
+        self, entity_id: int, data: Dict[str, Any], expected_version: Optional[int] = None
+    ) -> Optional[dict]:
+        """
+        Partial UPDATE that returns the updated row in a single round-trip.
+        Returns None when the row does not exist; raises VersionConflictError
+        when `expected_version` is given and the row has moved on.
+        """
+        columns = self.statements.ordered_columns(data)
+        guarded = expected_version is not None
+        statement = self.statements.update_returning(columns, guarded)
+        params = (
+            tuple(data[column] for column in columns) + (entity_id,)
+            + ((expected_version,) if guarded else ())
+            + (entity_id,)
+        )
+        results = await self._execute_query(statement, params=params, fetch='results')
+        updated, after_rows = results[-2][0], results[-1][1]
+        after = after_rows[0] if after_rows else None
+        if after is not None and not updated:
+            raise VersionConflictError(self.table, entity_id, after['version'])
+        return after
+
+    async def _update_entity(
+        self, entity_id: int, data: Dict[str, Any], expected_version: Optional[int] = None
+    ) -> Optional[BaseModel]:
+        """Applies a partial update and returns the updated entity (None if it does not exist)."""
+        if not data:
+            entity = await self.get_by_id(entity_id)
+            if entity is not None and expected_version is not None and entity.version != expected_version:
+                raise VersionConflictError(self.table, entity_id, entity.version)
+            return entity
+        record = await self._update_returning(entity_id, data, expected_version)
+        if record is None:
+            return None
+        entity = self._to_models([record])[0]
+        await self._cache_set(entity_id, entity)
+        return entity
+
+    async def _stream_query(
+        self,
+        statement: Statement,
+        params: Optional[tuple] = None,
+        chunk_size: int = 1000
+    ) -> AsyncIterator[dict]:
+        """
+        Runs a query with a server-side cursor (SSDictCursor), yielding the
+        rows in blocks of `chunk_size` without loading the whole result into
+        memory. Runs on a replica when available; it can
+        only fall back to another server before the first row is delivered.
+        """
+        for pool in self._read_pools():
+            started = False
+            try:
+                async for row in self._stream_from(pool, statement.sql, params, chunk_size):
+                    started = True
+                    yield row
+                return
+            except CONNECTION_ERRORS as exc:
+                if started:
+                    raise
+                self._replica_failed(pool, exc)
+
+    async def _stream_from(self, pool, query: str, params: Optional[tuple], chunk_size: int) -> AsyncIterator[dict]:
+        started = time.perf_counter()
+        async with pool.acquire() as conn:
+            pool_wait = time.perf_counter() - started
+            # Only the time spent waiting on the server counts, not the consumer's.
+            db_seconds, row_count = 0.0, 0
+            cursor = await conn.cursor(aiomysql.SSDictCursor)
+            try:
+                started = time.perf_counter()
                 await cursor.execute(query, params or ())
-                
-                if fetch == 'one':
-                    return await cursor.fetchone()
-                if fetch == 'all':
-                    return await cursor.fetchall()
-                
-                # Para INSERT, retorna o ID da nova linha.
-                if query.strip().upper().startswith('INSERT'):
-                    return cursor.lastrowid
-                
-                # Para UPDATE e DELETE, podemos retornar o número de linhas afetadas.
-                if query.strip().upper().startswith(('UPDATE', 'DELETE')):
-                    return cursor.rowcount
-                
-                return None
\ No newline at end of file
+                db_seconds += time.perf_counter() - started
+                while True:
+                    started = time.perf_counter()
+                    rows = await cursor.fetchmany(chunk_size)
+                    db_seconds += time.perf_counter() - started
+                    if not rows:
+                        break
+                    row_count += len(rows)
+                    for row in rows:
+                        yield row
+            except BaseException as exc:
+                # If the consumer stops early (e.g. the client disconnected), the
+                # unread rows would have to be drained before the connection could
+                # be reused. Closing it is cheaper; the pool discards closed connections.
+                conn.close()
+                self._observe_query(
+                    query, db_seconds, rows=row_count, pool_wait=pool_wait,
+                    error=not isinstance(exc, (GeneratorExit, asyncio.CancelledError)),
+                )
+                raise
+            else:
+                await cursor.close()
+                self._observe_query(query, db_seconds, rows=row_count, pool_wait=pool_wait)
+
+    @asynccontextmanager
+    async def _transaction(self) -> AsyncIterator[aiomysql.DictCursor]:
+        """
+        Opens a transaction on a pooled connection and yields a cursor.
+        Commits when the block finishes and rolls back if it raises.
+        Always runs on the primary.
+        """
+        self.consistency.wrote = True
+        started = time.perf_counter()
+        async with self.pool.acquire() as conn:
+            profile = current_profile()
+            if profile is not None:
+                profile.pool_wait_seconds += time.perf_counter() - started
+            await conn.begin()
+            try:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    yield _TimedCursor(cursor, self._observe_query)
+            except BaseException:
+                await conn.rollback()
+                raise
+            await conn.commit()
+        await self._changed()
+
+    @asynccontextmanager
+    async def _snapshot(self) -> AsyncIterator[aiomysql.DictCursor]:
+        """
+        Read-only transaction on the primary with a consistent snapshot: every
+        query in the block sees the same committed state. For rebuilds that
+        combine several queries.
+        """
+        started = time.perf_counter()
+        async with self.pool.acquire() as conn:
+            profile = current_profile()
+            if profile is not None:
+                profile.pool_wait_seconds += time.perf_counter() - started
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY;")
+                try:
+                    yield _TimedCursor(cursor, self._observe_query)
+                finally:
+                    await conn.rollback()
+
+    async def _run_transaction(
+        self, work: Callable[[aiomysql.DictCursor], Awaitable[ResultT]], attempts: int = TRANSACTION_ATTEMPTS
+    ) -> ResultT:
+        """
+        Runs `work(cursor)` inside `_transaction()`, running it again from the
+        start when InnoDB rolls it back for a deadlock or a lock wait timeout.
+        `work` must only touch the database: it may run more than once.
+        """
+        for attempt in range(1, attempts + 1):
+            try:
+                async with self._transaction() as cursor:
+                    return await work(cursor)
+            except pymysql.err.OperationalError as exc:
+                reason = RETRYABLE_TRANSACTION_ERRORS.get(exc.args[0] if exc.args else None)
+                if reason is None:
+                    raise
+                if attempt == attempts:
+                    raise TransactionRetryError(f"Transaction on {self.table} failed after {attempts} attempts ({reason})") from exc
+                if self.metrics is not None:
+                    self.metrics.observe_retry(reason)
+                logger.info("Retrying transaction on %s after %s (attempt %d)", self.table, reason, attempt)
+                # Full jitter so that the transactions that collided don't collide again.
+                await asyncio.sleep(random.uniform(0, TRANSACTION_RETRY_BACKOFF * 2 ** (attempt - 1)))
+
+    @staticmethod
+    def _row_error(index: int, exc: pymysql.err.MySQLError) -> BulkRowError:
+        return BulkRowError(index=index, detail=exc.args[-1] if exc.args else str(exc))
+
+    async def _insert_returning_ids(self, cursor, rows: List[tuple]) -> List[int]:
+        """Multi-row INSERT ... RETURNING id: one round-trip for the whole batch."""
+        statement = self.statements.insert_many_returning_ids(len(rows))
+        await cursor.execute(statement.sql, tuple(value for row in rows for value in row))
+        return [record['id'] for record in await cursor.fetchall()]
+
+    async def _check_batch(self, cursor, batch: List[Tuple[int, BaseModel]]) -> Dict[int, BulkRowError]:
+        """
+        Hook run inside the create_many transaction before each batch is inserted.
+        Returns the rows to reject, by request index; by default none.
+        """
+        return {}
+
+    async def create_many(self, items: List[Tuple[int, BaseModel]]) -> BulkResult:
+        """
+        Inserts several rows in a single transaction, in multi-row INSERT batches.
+        `items` pairs each model with its position in the request. When a batch
+        hits an integrity error (e.g. a duplicate unique key) it is retried row by
+        row, so only the offending rows are reported and the rest are committed.
+        Savepoints do not commit anything: if the transaction gives up (e.g.
+        TransactionRetryError), no row of the call is committed.
+        """
+        if not items:
+            return BulkResult(ids=[])
+        columns = self.statements.columns
+
+        async def insert_batches(cursor) -> Tuple[Dict[int, int], List[BulkRowError]]:
+            created: Dict[int, int] = {}
+            errors: List[BulkRowError] = []
+            for start in range(0, len(items), BULK_BATCH_SIZE):
+                batch = items[start:start + BULK_BATCH_SIZE]
+                rejected = await self._check_batch(cursor, batch)
+                if rejected:
+                    errors.extend(rejected.values())
+                    batch = [(index, model) for index, model in batch if index not in rejected]
+                    if not batch:
+                        continue
+                rows = [tuple(getattr(model, column) for column in columns) for _, model in batch]
+                await cursor.execute("SAVEPOINT bulk_batch;")
+                try:
+                    ids = await self._insert_returning_ids(cursor, rows)
+                    created.update(zip((index for index, _ in batch), ids))
+                    continue
+                except pymysql.err.IntegrityError:
+                    await cursor.execute("ROLLBACK TO SAVEPOINT bulk_batch;")
+                for (index, _), row in zip(batch, rows):
+                    await cursor.execute("SAVEPOINT bulk_row;")
+                    try:
+                        created[index] = (await self._insert_returning_ids(cursor, [row]))[0]
+                    except pymysql.err.IntegrityError as exc:
+                        await cursor.execute("ROLLBACK TO SAVEPOINT bulk_row;")
+                        errors.append(self._row_error(index, exc))
+            return created, errors
+
+        created, errors = await self._run_transaction(insert_batches)
+        errors.sort(key=lambda error: error.index)
+        return BulkResult(ids=[created[index] for index in sorted(created)], errors=errors)
+
+    async def update_many(self, items: List[Tuple[int, int, BaseModel]]) -> BulkResult:
+        """
+        Updates several rows in a single transaction. `items` are (index, id, changes).
+        Rows changing the same set of columns share one `executemany` call.
+        """
+        if not items:
+            return BulkResult(ids=[])
+        errors: List[BulkRowError] = []
+        ids = list({entity_id for _, entity_id, _ in items})
+        updated: List[Tuple[int, int]] = []
+        async with self._transaction() as cursor:
+            statement, params = self.statements.padded(self.statements.select_ids_in, ids)
+            await cursor.execute(statement.sql, params)
+            existing = {record['id'] for record in await cursor.fetchall()}
+
+            groups: Dict[tuple, List[Tuple[int, int, tuple]]] = {}
+            for index, entity_id, changes in items:
+                if entity_id not in existing:
+                    errors.append(BulkRowError(index=index, detail=f"{self.table} {entity_id} not found"))
+                    continue
+                data = changes.model_dump(exclude_unset=True)
+                if not data:
+                    updated.append((index, entity_id))
+                    continue
+                columns = self.statements.ordered_columns(data)
+                values = tuple(data[column] for column in columns)
+                groups.setdefault(columns, []).append((index, entity_id, values))
+
+            for columns, rows in groups.items():
+                query = self.statements.update_columns(columns).sql
+                await cursor.execute("SAVEPOINT bulk_batch;")
+                try:
+                    await cursor.executemany(query, [values + (entity_id,) for _, entity_id, values in rows])
+                    updated.extend((index, entity_id) for index, entity_id, _ in rows)
+                    continue
+                except pymysql.err.IntegrityError:
+                    await cursor.execute("ROLLBACK TO SAVEPOINT bulk_batch;")
+                for index, entity_id, values in rows:
+                    await cursor.execute("SAVEPOINT bulk_row;")
+                    try:
+                        await cursor.execute(query, values + (entity_id,))
+                        updated.append((index, entity_id))
+                    except pymysql.err.IntegrityError as exc:
+                        await cursor.execute("ROLLBACK TO SAVEPOINT bulk_row;")
+                        errors.append(self._row_error(index, exc))
+
+        for _, entity_id in updated:
+            await self._invalidate(entity_id)
+        errors.sort(key=lambda error: error.index)
+        return BulkResult(ids=[entity_id for _, entity_id in sorted(updated)], errors=errors)
+
+    async def delete_many(self, ids: List[int]) -> BulkResult:
+        """Deletes several rows with a single DELETE ... RETURNING id."""
+        unique_ids = list(dict.fromkeys(ids))
+        statement, params = self.statements.padded(self.statements.delete_in_returning_ids, unique_ids)
+        async with self._transaction() as cursor:
+            await cursor.execute(statement.sql, params)
+            deleted = {record['id'] for record in await cursor.fetchall()}
+        for entity_id in deleted:
+            await self._invalidate(entity_id)
+        if deleted:
+            await self._invalidate_cascades()
+        errors = [
+            BulkRowError(index=index, detail=f"{self.table} {entity_id} not found")
+            for index, entity_id in enumerate(ids) if entity_id not in deleted
+        ]
+        return BulkResult(ids=[entity_id for entity_id in unique_ids if entity_id in deleted], errors=errors)
@@ -1,65 +1,74 @@
 # /app/repositories/employee_repository.py
 
 import aiomysql
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 from .base_repository import BaseRepository
+from .statements import TableStatements
 from ..schemas.employee import CreateEmployee, UpdateEmployee, EmployeeInDB
 
 class EmployeeRepository(BaseRepository):
-    
-    async def get_all(self) -> List[EmployeeInDB]:
-        """Busca todos os funcionários cadastrados."""
-        query = "SELECT * FROM employee;"
-        records = await self._execute_query(query, fetch='all')
-        # Adopts the more concise pattern for handling an empty result.
-        return [EmployeeInDB(**record) for record in (records or [])]
+    table = "employee"
+    model = EmployeeInDB
+    cascades = ("rental",)
+    statements = TableStatements("employee", columns=("name", "last_name", "cpf", "email", "role"))
+
+    async def get_all(self, after_id: int = 0, limit: int = 100) -> List[EmployeeInDB]:
+        """
+        Retorna uma página de registros ordenados por id (paginação por keyset).
+        Passe o id do último registro recebido como `after_id` para obter a próxima página.
+        """
+        records = await self._execute_query(self.statements.select_page, params=(after_id, limit), fetch='all')
+        return self._to_models(records or [])
+
+    async def stream_all(self, after_id: int = 0) -> AsyncIterator[EmployeeInDB]:
+        """Percorre todos os registros com id maior que `after_id` com um cursor do lado do servidor."""
+        async for record in self._stream_query(self.statements.select_stream, params=(after_id,)):
+            yield EmployeeInDB(**record)
 
     async def get_by_id(self, employee_id: int) -> Optional[EmployeeInDB]:
         """Busca um único funcionário pelo seu ID."""
-        query = "SELECT * FROM employee WHERE id = %s;"
-        record = await self._execute_query(query, params=(employee_id,), fetch='one')
-        return EmployeeInDB(**record) if record else None
+        cached = await self._cache_get(employee_id, EmployeeInDB)
+        if cached is not None:
+            return cached
+        record = await self._load_record(employee_id)
+        if not record:
+            return None
+        employee = EmployeeInDB(**record)
+        await self._cache_set(employee_id, employee)
+        return employee
 
     async def create(self, employee: CreateEmployee) -> EmployeeInDB:
         """
         Insere um novo funcionário no banco de dados.
         """
-        query = """
-            INSERT INTO employee (name, last_name, cpf, email, role)
-            VALUES (%s, %s, %s, %s, %s);
-        """
         params = (
             employee.name, employee.last_name, employee.cpf, 
             employee.email, employee.role
         )
-        new_id = await self._execute_query(query, params=params)
+        new_id = await self._execute_query(self.statements.insert, params=params)
         
         if new_id is None:
             raise ValueError("Failed to create employee: No ID returned from database.")
             
-        # Constructs the response object without a second DB query.
-        return EmployeeInDB(id=new_id, **employee.model_dump())
+        # Monta o objeto de resposta sem uma segunda consulta ao banco.
+        new_employee = EmployeeInDB(id=new_id, **employee.model_dump())
+        await self._cache_set(new_id, new_employee)
+        return new_employee
 
-    async def update(self, employee_id: int, employee_update: UpdateEmployee) -> Optional[EmployeeInDB]:
+    async def update(
+        self, employee_id: int, employee_update: UpdateEmployee, expected_version: Optional[int] = None
+    ) -> Optional[EmployeeInDB]:
         """Atualiza os dados de um funcionário existente."""
         update_data = employee_update.model_dump(exclude_unset=True)
-        
-        if not update_data:
-            return await self.get_by_id(employee_id)
-
-        set_clause = ", ".join([f"{key} = %s" for key in update_data.keys()])
-        query = f"UPDATE employee SET {set_clause} WHERE id = %s;"
-        
-        params = tuple(update_data.values()) + (employee_id,)
-        await self._execute_query(query, params=params)
-        return await self.get_by_id(employee_id)
+        return await self._update_entity(employee_id, update_data, expected_version)
 
     async def delete(self, employee_id: int) -> bool:
         """
         Deleta um funcionário do banco de dados.
-        Confirms deletion by checking if the record still exists.
+        O número de linhas afetadas indica se ele existia.
         """
-        query = "DELETE FROM employee WHERE id = %s;"
-        await self._execute_query(query, params=(employee_id,))
-        # This is a more robust way to confirm deletion.
-        return await self.get_by_id(employee_id) is None
+        rows_affected = await self._execute_query(self.statements.delete_by_id, params=(employee_id,))
+        if not rows_affected:
+            return False
+        await self._invalidate(employee_id, cascade=True)
+        return True
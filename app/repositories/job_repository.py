@@ -0,0 +1,82 @@
+import json
+from typing import Any, Dict, List, Optional
+from .base_repository import BaseRepository
+from .statements import TableStatements, select, update
+from ..schemas.job import JobInDB
+
+QUEUED_COUNT = select("SELECT COUNT(*) AS total FROM job WHERE status = 'queued';")
+# SKIP LOCKED: workers of other processes claiming at the same time take the next job instead of waiting.
+NEXT_QUEUED = select("SELECT * FROM job WHERE status = 'queued' ORDER BY id LIMIT 1 FOR UPDATE SKIP LOCKED;")
+MARK_RUNNING = update("UPDATE job SET status = 'running', attempts = attempts + 1, started_at = NOW() WHERE id = %s;")
+MARK_DONE = update("""
+    UPDATE job SET status = 'done', result_file = %s, result_rows = %s, error = NULL, finished_at = NOW()
+    WHERE id = %s;
+""")
+MARK_FAILED = update("UPDATE job SET status = 'failed', error = %s, finished_at = NOW() WHERE id = %s;")
+REQUEUE = update("UPDATE job SET status = 'queued', started_at = NULL WHERE id = %s AND status = 'running';")
+# Jobs 'running' for longer than any job can take: the process running them died.
+REQUEUE_STALE = update("""
+    UPDATE job SET status = 'queued', started_at = NULL
+    WHERE status = 'running' AND started_at < NOW() - INTERVAL %s SECOND AND attempts < %s;
+""")
+FAIL_STALE = update("""
+    UPDATE job SET status = 'failed', error = 'Interrupted too many times', finished_at = NOW()
+    WHERE status = 'running' AND started_at < NOW() - INTERVAL %s SECOND;
+""")
+
+
+class JobRepository(BaseRepository):
+    """
+    Tabela `job`. Built on the jobs' own pool and without cache or replicas:
+    a client polling its job right after creating it must see the row.
+    """
+    table = "job"
+    model = JobInDB
+    statements = TableStatements("job", columns=("kind", "params"))
+
+    def _to_models(self, records: List[dict]) -> List[JobInDB]:
+        return [JobInDB(**{**record, "params": json.loads(record["params"])}) for record in records]
+
+    async def get_by_id(self, job_id: int) -> Optional[JobInDB]:
+        record = await self._execute_query(self.statements.select_by_id, params=(job_id,), fetch='one')
+        return self._to_models([record])[0] if record else None
+
+    async def create(self, kind: str, params: Dict[str, Any]) -> JobInDB:
+        record = await self._execute_query(
+            self.statements.insert_returning, params=(kind, json.dumps(params, default=str)), fetch='one'
+        )
+        if record is None:
+            raise ValueError("Failed to create job: no row returned from database.")
+        return self._to_models([record])[0]
+
+    async def count_queued(self) -> int:
+        record = await self._execute_query(QUEUED_COUNT, fetch='one')
+        return record['total'] if record else 0
+
+    async def claim_next(self) -> Optional[JobInDB]:
+        """Marks the oldest queued job as running and returns it; None when the queue is empty."""
+        async def claim(cursor) -> Optional[dict]:
+            await cursor.execute(NEXT_QUEUED.sql)
+            record = await cursor.fetchone()
+            if record is not None:
+                await cursor.execute(MARK_RUNNING.sql, (record['id'],))
+                record['status'], record['attempts'] = 'running', record['attempts'] + 1
+            return record
+
+        record = await self._run_transaction(claim)
+        return self._to_models([record])[0] if record else None
+
+    async def mark_done(self, job_id: int, result_file: str, rows: int):
+        await self._execute_query(MARK_DONE, params=(result_file, rows, job_id))
+
+    async def mark_failed(self, job_id: int, error: str):
+        await self._execute_query(MARK_FAILED, params=(error, job_id))
+
+    async def requeue(self, job_id: int):
+        await self._execute_query(REQUEUE, params=(job_id,))
+
+    async def requeue_stale(self, older_than_seconds: int, max_attempts: int) -> int:
+        """Puts jobs left running by a dead process back in the queue, or fails them after `max_attempts`."""
+        requeued = await self._execute_query(REQUEUE_STALE, params=(older_than_seconds, max_attempts))
+        await self._execute_query(FAIL_STALE, params=(older_than_seconds,))
+        return requeued or 0
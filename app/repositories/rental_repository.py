@@ -1,89 +1,647 @@
 import aiomysql
-from typing import List, Optional
-from .base_repository import BaseRepository
-from ..schemas.rental import RentalCreate, RentalUpdate, RentalInDB, VehicleRentalCount, RentalReport
+from datetime import date
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+from .base_repository import BaseRepository, TransactionRetryError, VersionConflictError
+from .statements import Statement, TableStatements, placeholders, select
+from ..schemas.bulk import BulkResult, BulkRowError
+from ..core.booking import (
+    BOOKING_LOCK_WAIT_SECONDS, BatchCalendar, BookingConflictError, BookingError,
+    InvalidBookingError, VehicleNotFoundError, VehicleUnavailableError,
+)
+from ..core.timeseries import BucketAggregator, FleetCalendar, bucket_range
+from ..core.exports import Column, model_columns
+from ..schemas.rental import (
+    RentalCreate, RentalUpdate, RentalInDB, RentalExpanded, VehicleRentalCount, RentalReport,
+    RentalTimeSeries, RentalTimeBucket, TypeUtilization, VehicleUtilization,
+)
+from ..schemas.user import UserInDB
+from ..schemas.vehicles import VehicleInDB
+from ..schemas.employee import EmployeeInDB
+
+# Number of vehicles in the most-rented ranking.
+SUMMARY_TOP_N = 5
+
+ACTIVE_BOOKINGS = select("""
+    SELECT id, id_vehicle, rent_date, return_date FROM rental
+    WHERE return_date > %s AND id_vehicle IS NOT NULL;
+""")
+TOTAL_REVENUE = select("SELECT SUM(rent_value) as total FROM rental;")
+RENTALS_PER_VEHICLE = select("""
+    SELECT r.id_vehicle, v.brand, v.model, COUNT(r.id_vehicle) as rental_count
+    FROM rental r
+    JOIN vehicle v ON r.id_vehicle = v.id
+    GROUP BY r.id_vehicle, v.brand, v.model;
+""")
+BOOKED_VEHICLES = select("""
+    SELECT DISTINCT id_vehicle FROM rental
+    WHERE rent_date < %s AND return_date > %s AND id_vehicle IS NOT NULL;
+""")
+RENTALS_IN_RANGE = select("""
+    SELECT r.rent_date, r.return_date, r.rent_value, r.id_vehicle, v.vehicle_type
+    FROM rental r
+    JOIN vehicle v ON r.id_vehicle = v.id
+    WHERE r.return_date > %s AND r.rent_date < %s;
+""")
+FLEET = select("SELECT id, vehicle_type, registration_date FROM vehicle;")
+
+# Columns that change the vehicle's calendar: changing them goes through the booking path.
+BOOKING_COLUMNS = frozenset(("rent_date", "return_date", "id_vehicle"))
+# Locking read (LOCK IN SHARE MODE) so it sees the latest committed rentals, not the
+# transaction's snapshot; it runs while the vehicle row is held, so the range is tiny.
+OVERLAPPING_RENTAL = select("""
+    SELECT id FROM rental
+    WHERE id_vehicle = %s AND rent_date < %s AND return_date > %s AND id <> %s
+    LIMIT 1 LOCK IN SHARE MODE;
+""")
+LOCK_RENTAL = select(f"SELECT * FROM rental WHERE id = %s FOR UPDATE WAIT {BOOKING_LOCK_WAIT_SECONDS};")
+
+
+# Filters accepted by search(), in the order they enter the WHERE clause.
+SEARCH_FILTERS = {
+    "id_user": "id_user = %s",
+    "id_vehicle": "id_vehicle = %s",
+    "id_employee": "id_employee = %s",
+    "rent_from": "rent_date >= %s",
+    "rent_to": "rent_date <= %s",
+    "return_from": "return_date >= %s",
+    "return_to": "return_date <= %s",
+    "min_value": "rent_value >= %s",
+    "max_value": "rent_value <= %s",
+}
+SEARCH_SORTS = ("id", "rent_date", "return_date", "rent_value")
+
+
+@lru_cache(maxsize=512)
+def search_statement(filters: Tuple[str, ...], sort: str, descending: bool, after: bool) -> Statement:
+    """
+    SELECT for one page of the search. The keyset condition compares (sort column, id),
+    which is also the ORDER BY, so every page is an index range scan when an
+    index starts with the equality filters followed by the sort column.
+    """
+    conditions = [SEARCH_FILTERS[name] for name in filters]
+    op = "<" if descending else ">"
+    if after:
+        if sort == "id":
+            conditions.append(f"id {op} %s")
+        else:
+            # Same as (column, id) > (value, id), but with a plain bound on the sort column in front,
+            # which MariaDB uses as a range on the composite index (the OR alone is not sargable).
+            conditions.append(f"{sort} {op}= %s AND ({sort} {op} %s OR id {op} %s)")
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    direction = "DESC" if descending else "ASC"
+    order = f"id {direction}" if sort == "id" else f"{sort} {direction}, id {direction}"
+    return select(f"SELECT * FROM rental{where} ORDER BY {order} LIMIT %s;")
+
+
+@lru_cache(maxsize=64)
+def vehicle_labels_in(count: int) -> Statement:
+    return select(f"SELECT id, brand, model FROM vehicle WHERE id IN ({placeholders(count)});")
+
+
+@lru_cache(maxsize=64)
+def lock_vehicles_in(count: int) -> Statement:
+    """
+    Locks the vehicle rows in id order, so two transactions booking
+    the same vehicles always queue in the same order instead of deadlocking.
+    """
+    return select(f"""
+        SELECT id, available FROM vehicle WHERE id IN ({placeholders(count)})
+        ORDER BY id FOR UPDATE WAIT {BOOKING_LOCK_WAIT_SECONDS};
+    """)
+
+
+@lru_cache(maxsize=64)
+def bookings_of_vehicles_in(count: int) -> Statement:
+    return select(f"""
+        SELECT id, id_vehicle, rent_date, return_date FROM rental
+        WHERE rent_date < %s AND return_date > %s AND id_vehicle IN ({placeholders(count)})
+        LOCK IN SHARE MODE;
+    """)
+
+
+# Entities `?expand=` can nest: (table, alias, foreign key, model, validate?).
+# Users and employees are built without validation, as in their own repositories.
+RELATIONS = {
+    "user": ("user", "u", "id_user", UserInDB, False),
+    "vehicle": ("vehicle", "v", "id_vehicle", VehicleInDB, True),
+    "employee": ("employee", "e", "id_employee", EmployeeInDB, False),
+}
+EXPAND_BY_ID = "WHERE r.id = %s"
+EXPAND_PAGE = "WHERE r.id > %s ORDER BY r.id LIMIT %s"
+EXPAND_STREAM = "WHERE r.id > %s ORDER BY r.id"
+
+
+@lru_cache(maxsize=64)
+def expanded_statement(relations: Tuple[str, ...], tail: str) -> Statement:
+    """
+    SELECT of the rentals with the `relations` entities in a single LEFT JOIN.
+    Related columns come back as `<relation>__<field>`, one per field of the
+    relation's model, so each relation can be split off the row by prefix.
+    """
+    columns = ["r.*"]
+    joins = []
+    for name in relations:
+        table, alias, foreign_key, model, _ = RELATIONS[name]
+        columns += [f"{alias}.{field} AS {name}__{field}" for field in model.model_fields]
+        joins.append(f"LEFT JOIN {table} {alias} ON {alias}.id = r.{foreign_key}")
+    return select(f"SELECT {', '.join(columns)} FROM rental r {' '.join(joins)} {tail};")
+
+
+def export_columns(relations: Tuple[str, ...]) -> List[Column]:
+    """Columns of the stream_export() rows: the rental's and, flattened, those of each relation."""
+    columns = model_columns(RentalInDB)
+    for name in relations:
+        columns += model_columns(RELATIONS[name][3], prefix=f"{name}__")
+    return columns
+
+
+def _expanded_model(record: dict, relations: Tuple[str, ...]) -> RentalExpanded:
+    fields = {key: value for key, value in record.items() if "__" not in key}
+    for name in relations:
+        _, _, _, model, validate = RELATIONS[name]
+        prefix = f"{name}__"
+        related = {key[len(prefix):]: value for key, value in record.items() if key.startswith(prefix)}
+        if related["id"] is None:
+            fields[name] = None  # null or orphaned foreign key
+        else:
+            fields[name] = model(**related) if validate else model.model_construct(**related)
+    return RentalExpanded(**fields)
+
+
+def _booking(rental: RentalInDB) -> dict:
+    """Fields of a booking the availability feed cares about."""
+    return {
+        "id": rental.id,
+        "id_vehicle": rental.id_vehicle,
+        "rent_date": rental.rent_date,
+        "return_date": rental.return_date,
+    }
+
 
 class RentalRepository(BaseRepository):
-    async def get_all(self) -> List[RentalInDB]:
-        """Retrieves all rental records from the database."""
-        query = "SELECT * FROM rental;"
-        records = await self._execute_query(query, fetch='all')
-        return [RentalInDB(**record) for record in (records or [])]
+    table = "rental"
+    model = RentalInDB
+    statements = TableStatements(
+        "rental",
+        columns=("rent_date", "return_date", "rent_value", "id_user", "id_vehicle", "id_employee"),
+    )
+
+    async def get_all(self, after_id: int = 0, limit: int = 100) -> List[RentalInDB]:
+        """
+        Returns one page of records ordered by id (keyset pagination).
+        Pass the id of the last record received as `after_id` to get the next page.
+        """
+        records = await self._execute_query(self.statements.select_page, params=(after_id, limit), fetch='all')
+        return self._to_models(records or [])
+
+    async def stream_all(self, after_id: int = 0) -> AsyncIterator[RentalInDB]:
+        """Streams every record with id greater than `after_id` using a server-side cursor."""
+        async for record in self._stream_query(self.statements.select_stream, params=(after_id,)):
+            yield RentalInDB(**record)
+
+    def stream_export(
+        self, relations: Tuple[str, ...] = (), after_id: int = 0, chunk_size: int = 10000
+    ) -> AsyncIterator[dict]:
+        """
+        Rows for offline exports: every rental with id greater than `after_id`,
+        in id order, with the columns of `relations` flattened in (see
+        export_columns()). Plain rows from a server-side cursor, fetched
+        `chunk_size` at a time; no model is built per row.
+        """
+        statement = expanded_statement(relations, EXPAND_STREAM)
+        return self._stream_query(statement, params=(after_id,), chunk_size=chunk_size)
 
     async def get_by_id(self, rental_id: int) -> Optional[RentalInDB]:
         """Retrieves a single rental by its ID."""
-        query = "SELECT * FROM rental WHERE id = %s;"
-        record = await self._execute_query(query, params=(rental_id,), fetch='one')
-        return RentalInDB(**record) if record else None
+        cached = await self._cache_get(rental_id, RentalInDB)
+        if cached is not None:
+            return cached
+        record = await self._load_record(rental_id)
+        if not record:
+            return None
+        rental = RentalInDB(**record)
+        await self._cache_set(rental_id, rental)
+        return rental
+
+    async def _get_expanded(self, statement: Statement, relations: Tuple[str, ...], params: tuple) -> List[RentalExpanded]:
+        records = await self._execute_query(statement, params=params, fetch='all')
+        return [_expanded_model(record, relations) for record in records or []]
+
+    async def get_all_expanded(
+        self, relations: Tuple[str, ...], after_id: int = 0, limit: int = 100
+    ) -> List[RentalExpanded]:
+        """Same page as get_all(), with the related entities joined in the same query."""
+        return await self._get_expanded(expanded_statement(relations, EXPAND_PAGE), relations, (after_id, limit))
+
+    async def get_by_id_expanded(self, rental_id: int, relations: Tuple[str, ...]) -> Optional[RentalExpanded]:
+        items = await self._get_expanded(expanded_statement(relations, EXPAND_BY_ID), relations, (rental_id,))
+        return items[0] if items else None
+
+    async def get_many_expanded(self, ids: List[int], relations: Tuple[str, ...]) -> List[RentalExpanded]:
+        """Like get_many(): in the order asked, without duplicates or missing ids."""
+        unique_ids = list(dict.fromkeys(ids))
+        statement, params = TableStatements.padded(
+            lambda count: expanded_statement(relations, f"WHERE r.id IN ({placeholders(count)})"), unique_ids
+        )
+        found = {item.id: item for item in await self._get_expanded(statement, relations, params)}
+        return [found[rental_id] for rental_id in unique_ids if rental_id in found]
+
+    async def _lock_vehicles(self, cursor, vehicle_ids: List[int]) -> Dict[int, bool]:
+        """Locks the vehicle rows (FOR UPDATE) and returns their `available` flag by id."""
+        statement, params = TableStatements.padded(lock_vehicles_in, sorted(set(vehicle_ids)))
+        await cursor.execute(statement.sql, params)
+        return {record['id']: bool(record['available']) for record in await cursor.fetchall()}
+
+    @staticmethod
+    def _check_vehicle(vehicles: Dict[int, bool], vehicle_id: int):
+        if vehicle_id not in vehicles:
+            raise VehicleNotFoundError(vehicle_id)
+        if not vehicles[vehicle_id]:
+            raise VehicleUnavailableError(vehicle_id)
+
+    @staticmethod
+    async def _check_overlap(cursor, vehicle_id: int, start: date, end: date, exclude_id: int = 0):
+        await cursor.execute(OVERLAPPING_RENTAL.sql, (vehicle_id, end, start, exclude_id))
+        record = await cursor.fetchone()
+        if record is not None:
+            raise BookingConflictError(vehicle_id, record['id'])
 
     async def create(self, rental: RentalCreate) -> RentalInDB:
-        query = """
-            INSERT INTO rental (rent_date, return_date, rent_value, id_user, id_vehicle, id_employee)
-            VALUES (%s, %s, %s, %s, %s, %s);
         """
-        params = (
-            rental.rent_date, rental.return_date, rental.rent_value,
-            rental.id_user, rental.id_vehicle, rental.id_employee
-        )
-        new_id = await self._execute_query(query, params=params)
+        Books the vehicle in one transaction: locks the vehicle row, checks for
+        overlapping dates and inserts. Raises a BookingError when the vehicle does
+        not exist, is out of service or is already booked for overlapping dates.
+        Only these three statements run while the lock is held.
+        """
+        params = tuple(getattr(rental, column) for column in self.statements.columns)
+
+        async def book(cursor) -> int:
+            vehicles = await self._lock_vehicles(cursor, [rental.id_vehicle])
+            self._check_vehicle(vehicles, rental.id_vehicle)
+            await self._check_overlap(cursor, rental.id_vehicle, rental.rent_date, rental.return_date)
+            await cursor.execute(self.statements.insert.sql, params)
+            return cursor.lastrowid
+
+        new_id = await self._run_transaction(book)
         
         if new_id is None:
             raise ValueError("Failed to create rental: No ID returned from database.")
             
         # Constructs the response object without a second DB query.
-        return RentalInDB(id=new_id, **rental.model_dump())
+        new_rental = RentalInDB(id=new_id, **rental.model_dump())
+        await self._cache_set(new_id, new_rental)
+        self._apply(None, new_rental)
+        return new_rental
 
-    async def update(self, rental_id: int, rental_update: RentalUpdate) -> Optional[RentalInDB]:
+    async def update(
+        self, rental_id: int, rental_update: RentalUpdate, expected_version: Optional[int] = None
+    ) -> Optional[RentalInDB]:
+        """
+        Runs in one transaction with the rental row locked, so the previous
+        version fed to the projections (summary, availability) is the one this
+        UPDATE replaced, even with concurrent updates of the same rental.
+        Updates that move the dates or the vehicle also get the checks of
+        create(), with both vehicles (old and new) locked.
+        """
         update_data = rental_update.model_dump(exclude_unset=True)
-        
         if not update_data:
-            return await self.get_by_id(rental_id)
+            return await self._update_entity(rental_id, update_data, expected_version)
+        rebooking = bool(BOOKING_COLUMNS.intersection(update_data))
+        statement, columns = self.statements.update(update_data)
+        params = tuple(update_data[column] for column in columns) + (rental_id,)
 
-        set_clause = ", ".join([f"{key} = %s" for key in update_data.keys()])
-        query = f"UPDATE rental SET {set_clause} WHERE id = %s;"
-        
-        params = tuple(update_data.values()) + (rental_id,)
-        
-        await self._execute_query(query, params=params)
-        
-        return await self.get_by_id(rental_id)
+        async def locked_update(cursor) -> Optional[Tuple[dict, dict]]:
+            await cursor.execute(LOCK_RENTAL.sql, (rental_id,))
+            record = await cursor.fetchone()
+            if record is None:
+                return None
+            if expected_version is not None and record['version'] != expected_version:
+                raise VersionConflictError(self.table, rental_id, record['version'])
+            merged = {**record, **update_data, 'version': record['version'] + 1}
+            if rebooking:
+                await self._check_rebooking(cursor, record, merged)
+            await cursor.execute(statement.sql, params)
+            return record, merged
+
+        result = await self._run_transaction(locked_update)
+        if result is None:
+            return None
+        before, after = RentalInDB(**result[0]), RentalInDB(**result[1])
+        await self._cache_set(rental_id, after)
+        self._apply(before, after)
+        return after
+
+    async def _check_rebooking(self, cursor, record: dict, merged: dict):
+        """Checks of create() for a rental moving to `merged`'s dates or vehicle."""
+        if merged['return_date'] <= merged['rent_date']:
+            raise InvalidBookingError("Return date must be after the rent date.")
+        vehicle_id = merged['id_vehicle']
+        # id_vehicle is nullable in the table; without a vehicle there is nothing to lock or check.
+        locked = [vid for vid in (record['id_vehicle'], vehicle_id) if vid is not None]
+        vehicles = await self._lock_vehicles(cursor, locked) if locked else {}
+        if vehicle_id is not None:
+            if vehicle_id != record['id_vehicle']:
+                self._check_vehicle(vehicles, vehicle_id)
+            await self._check_overlap(cursor, vehicle_id, merged['rent_date'], merged['return_date'], record['id'])
 
     async def delete(self, rental_id: int) -> bool:
-        query = "DELETE FROM rental WHERE id = %s;"
-        await self._execute_query(query, params=(rental_id,))
-        
-        return await self.get_by_id(rental_id) is None
+        # DELETE ... RETURNING hands the removed row to the projections without a prior read.
+        record = await self._execute_query(self.statements.delete_by_id_returning, params=(rental_id,), fetch='one')
+        if record is None:
+            return False
+        await self._invalidate(rental_id)
+        self._apply(RentalInDB(**record), None)
+        return True
+
+    async def _get_many_records(self, ids: List[int]) -> List[dict]:
+        if not ids:
+            return []
+        statement, params = self.statements.padded(self.statements.select_in, ids)
+        return await self._execute_query(statement, params=params, fetch='all') or []
+
+    async def _check_batch(self, cursor, batch: List[Tuple[int, RentalCreate]]) -> Dict[int, BulkRowError]:
+        """
+        Locks every vehicle of the batch and rejects the rows that overlap a
+        booking in the database or an earlier row of the same request.
+        """
+        vehicle_ids = sorted({rental.id_vehicle for _, rental in batch})
+        vehicles = await self._lock_vehicles(cursor, vehicle_ids)
+        statement, ids = TableStatements.padded(bookings_of_vehicles_in, vehicle_ids)
+        start = min(rental.rent_date for _, rental in batch)
+        end = max(rental.return_date for _, rental in batch)
+        await cursor.execute(statement.sql, (end, start) + ids)
+        calendar = BatchCalendar(await cursor.fetchall())
+
+        rejected: Dict[int, BulkRowError] = {}
+        for index, rental in batch:
+            try:
+                self._check_vehicle(vehicles, rental.id_vehicle)
+                accepted, conflicting_id = calendar.book(rental.id_vehicle, rental.rent_date, rental.return_date)
+                if not accepted:
+                    raise BookingConflictError(rental.id_vehicle, conflicting_id)
+            except BookingError as exc:
+                rejected[index] = BulkRowError(index=index, detail=str(exc))
+        return rejected
+
+    async def create_many(self, items: List[Tuple[int, RentalCreate]]) -> BulkResult:
+        result = await super().create_many(items)
+        failed = {error.index for error in result.errors}
+        created = [rental for index, rental in items if index not in failed]
+        for new_id, rental in zip(result.ids, created):
+            self._apply(None, RentalInDB(id=new_id, **rental.model_dump()))
+        return result
+
+    async def update_many(self, items: List[Tuple[int, int, RentalUpdate]]) -> BulkResult:
+        """
+        Rows that move dates or vehicle go through update() one by one (locking
+        and conflict check), each in its own transaction; the others keep the
+        batched path. Since rows are then committed separately, a row that
+        fails (conflict, or lock contention that outlasted the retries) is
+        reported in `errors` and `ids` lists exactly the rows committed.
+        """
+        rebook = [item for item in items if BOOKING_COLUMNS.intersection(item[2].model_fields_set)]
+        if rebook:
+            plain = [item for item in items if not BOOKING_COLUMNS.intersection(item[2].model_fields_set)]
+            result = await self.update_many(plain)
+            for index, rental_id, changes in rebook:
+                try:
+                    updated = await self.update(rental_id, changes)
+                except (BookingError, TransactionRetryError) as exc:
+                    result.errors.append(BulkRowError(index=index, detail=str(exc)))
+                    continue
+                if updated is None:
+                    result.errors.append(BulkRowError(index=index, detail=f"{self.table} {rental_id} not found"))
+            failed = {error.index for error in result.errors}
+            result.ids = [rental_id for index, rental_id, _ in sorted(items, key=lambda item: item[0]) if index not in failed]
+            result.errors.sort(key=lambda error: error.index)
+            return result
+        if self.projections is None:
+            return await super().update_many(items)
+        ids = list({rental_id for _, rental_id, _ in items})
+        self.consistency.wrote = True
+        before = {record['id']: RentalInDB(**record) for record in await self._get_many_records(ids)}
+        result = await super().update_many(items)
+        for record in await self._get_many_records(result.ids):
+            self._apply(before.get(record['id']), RentalInDB(**record))
+        return result
+
+    async def delete_many(self, ids: List[int]) -> BulkResult:
+        if self.projections is None:
+            return await super().delete_many(ids)
+        self.consistency.wrote = True
+        before = {record['id']: RentalInDB(**record) for record in await self._get_many_records(list(set(ids)))}
+        result = await super().delete_many(ids)
+        for rental_id in result.ids:
+            if rental_id in before:
+                self._apply(before[rental_id], None)
+        return result
+
+    async def search(
+        self,
+        filters: Dict[str, Any],
+        sort: str = "rent_date",
+        descending: bool = True,
+        limit: int = 100,
+        after: Optional[Tuple[Any, int]] = None,
+    ) -> Tuple[List[RentalInDB], Optional[Tuple[Any, int]]]:
+        """
+        Rentals matching the SEARCH_FILTERS filters, ordered by `sort` and id.
+        `after` is the (sort value, id) key of the last row of the previous page.
+        Returns the page and the key to continue from (None on the last page).
+        """
+        if sort not in SEARCH_SORTS:
+            raise ValueError(f"Unknown sort column: {sort}")
+        names = tuple(name for name in SEARCH_FILTERS if name in filters)
+        params: List[Any] = [filters[name] for name in names]
+        if after is not None:
+            value, last_id = after
+            params += [last_id] if sort == "id" else [value, value, last_id]
+        # One extra row tells whether there is a next page.
+        params.append(limit + 1)
+        statement = search_statement(names, sort, descending, after is not None)
+        records = await self._execute_query(statement, params=tuple(params), fetch='all') or []
+        items = self._to_models(records[:limit])
+        if len(records) <= limit:
+            return items, None
+        last = items[-1]
+        return items, (getattr(last, sort), last.id)
+
+    def _apply(self, before: Optional[RentalInDB], after: Optional[RentalInDB]):
+        if self.projections is not None:
+            self.projections.apply(before, after)
+        if after is None:
+            self._publish("booking.deleted", _booking(before))
+        elif before is None:
+            self._publish("booking.created", _booking(after))
+        else:
+            self._publish("booking.updated", dict(_booking(after), previous=_booking(before)))
+
+    async def refresh_projections(self, today: date):
+        """
+        Rebuilds the in-memory projections (availability index and summary)
+        from the database. All queries read one consistent snapshot of the
+        primary, and the writes applied meanwhile are reconciled with it.
+        Concurrent callers share one rebuild.
+        """
+        projections = self.projections
+        async with projections.refresh_lock:
+            if not projections.needs_refresh():
+                return
+            generation = projections.generation
+            index, summary = projections.availability, projections.summary
+            index.begin_rebuild()
+            summary.begin_rebuild()
+            try:
+                async with self._snapshot() as cursor:
+                    await cursor.execute(ACTIVE_BOOKINGS.sql, (today,))
+                    bookings = await cursor.fetchall()
+                    await cursor.execute(TOTAL_REVENUE.sql)
+                    revenue_result = await cursor.fetchone()
+                    await cursor.execute(RENTALS_PER_VEHICLE.sql)
+                    count_records = await cursor.fetchall()
+                    states = await self._snapshot_states(cursor, summary)
+            except BaseException:
+                index.abort_rebuild()
+                summary.abort_rebuild()
+                raise
+            total_revenue = revenue_result['total'] if revenue_result and revenue_result['total'] else 0
+            index.finish_rebuild(today, bookings)
+            summary.finish_rebuild(int(total_revenue), count_records or [], states)
+            projections.mark_fresh(generation)
+
+    async def _snapshot_states(self, cursor, summary) -> Dict[int, Optional[Tuple[Optional[int], int]]]:
+        """
+        (id_vehicle, rent_value) in the snapshot of each rental written during
+        the rebuild (None if it is not there), repeated until no new write
+        shows up while the query runs.
+        """
+        states: Dict[int, Optional[Tuple[Optional[int], int]]] = {}
+        while True:
+            ids = [rental_id for rental_id in summary.pending_ids() if rental_id not in states]
+            if not ids:
+                return states
+            statement, params = self.statements.padded(self.statements.select_in, ids)
+            await cursor.execute(statement.sql, params)
+            found = {row['id']: (row['id_vehicle'], row['rent_value']) for row in await cursor.fetchall()}
+            for rental_id in ids:
+                states[rental_id] = found.get(rental_id)
+
+    async def get_booked_vehicle_ids(self, start: date, end: date) -> Set[int]:
+        """
+        Ids of vehicles with a booking overlapping [start, end). Answered from the
+        availability index when it covers the range, otherwise from the database.
+        """
+        projections = self.projections
+        if projections is not None and not projections.stale and projections.availability.covers(start):
+            return projections.availability.booked_vehicles(start, end)
+        records = await self._execute_query(BOOKED_VEHICLES, params=(end, start), fetch='all')
+        return {record['id_vehicle'] for record in (records or [])}
     
     async def get_summary_report(self) -> RentalReport:
         """
-        Gera um relatório de resumo com faturamento total e veículos mais alugados.
-        """
-        # Query 1: Calcular o faturamento total
-        revenue_query = "SELECT SUM(rent_value) as total FROM rental;"
-        revenue_result = await self._execute_query(revenue_query, fetch='one')
-        total_revenue = revenue_result['total'] if revenue_result and revenue_result['total'] else 0
-
-        # Query 2: Contar aluguéis por veículo e juntar com a tabela de veículos
-        # para obter os nomes, ordenando pelos mais alugados.
-        count_query = """
-            SELECT 
-                r.id_vehicle, 
-                v.brand, 
-                v.model, 
-                COUNT(r.id_vehicle) as rental_count
-            FROM rental r
-            JOIN vehicle v ON r.id_vehicle = v.id
-            GROUP BY r.id_vehicle, v.brand, v.model
-            ORDER BY rental_count DESC
-            LIMIT 5;
-        """
-        count_records = await self._execute_query(count_query, fetch='all')
-        
-        # Constrói a lista de veículos mais alugados
-        most_rented = [VehicleRentalCount(**record) for record in (count_records or [])]
-        
-        # Retorna o objeto de relatório completo
+        Builds the summary report: total revenue and most rented vehicles.
+        Served from the incrementally maintained summary; it is only rebuilt from
+        the database when it has been marked stale.
+        """
+        projections = self.projections
+        if projections is None:
+            raise RuntimeError("RentalRepository needs projections to build the summary report.")
+        if projections.stale or not projections.summary.ready:
+            await self.refresh_projections(date.today())
+        summary = projections.summary
+
+        top = summary.top(SUMMARY_TOP_N)
+        missing = [vehicle_id for vehicle_id, _ in top if vehicle_id not in summary.labels]
+        if missing:
+            # Vehicles that entered the ranking after the last rebuild.
+            statement, params = TableStatements.padded(vehicle_labels_in, missing)
+            for record in await self._execute_query(statement, params=params, fetch='all') or []:
+                summary.labels[record['id']] = (record['brand'], record['model'])
+
+        most_rented = [
+            VehicleRentalCount(
+                id_vehicle=vehicle_id,
+                brand=summary.labels[vehicle_id][0],
+                model=summary.labels[vehicle_id][1],
+                rental_count=count,
+            )
+            for vehicle_id, count in top if vehicle_id in summary.labels
+        ]
         return RentalReport(
-            total_revenue=total_revenue,
+            total_revenue=summary.total_revenue,
             most_rented_vehicle=most_rented
-        )
\ No newline at end of file
+        )
+
+    async def get_timeseries(self, granularity: str, first_day: date, last_day: date) -> RentalTimeSeries:
+        """
+        Revenue, rental count and fleet utilization per period.
+        Buckets that ended before today are cached for good (rental writes
+        invalidate the ones they touch); only the missing ones hit the database.
+        """
+        buckets = bucket_range(first_day, last_day, granularity)
+        cache = self.projections.timeseries if self.projections is not None else None
+        today = date.today()
+
+        cached = [cache.get(granularity, start) if cache is not None else None for start, _ in buckets]
+        missing = [i for i, bucket in enumerate(cached) if bucket is None]
+        if missing:
+            span = buckets[missing[0]:missing[-1] + 1]
+            aggregator = BucketAggregator(span)
+            async for row in self._stream_query(RENTALS_IN_RANGE, params=(span[0][0], span[-1][1])):
+                aggregator.add(row)
+            for offset, bucket in enumerate(aggregator.result):
+                i = missing[0] + offset
+                if cached[i] is None:
+                    cached[i] = bucket
+                    if cache is not None and buckets[i][1] <= today:
+                        cache.put(granularity, buckets[i][0], bucket)
+
+        vehicles = await self._execute_query(FLEET, fetch='all') or []
+        registered = {
+            vehicle['id']: (vehicle['registration_date'].date() if vehicle['registration_date'] else date.min)
+            for vehicle in vehicles
+        }
+        calendars = {}
+        for vehicle in vehicles:
+            calendars.setdefault(vehicle['vehicle_type'], []).append(registered[vehicle['id']])
+        calendars = {vehicle_type: FleetCalendar(days) for vehicle_type, days in calendars.items()}
+
+        def ratio(rented: int, available: int) -> float:
+            return round(rented / available, 4) if available else 0.0
+
+        result_buckets = []
+        rented_by_vehicle = {}
+        for (start, end), bucket in zip(buckets, cached):
+            by_type = []
+            for vehicle_type, calendar in sorted(calendars.items()):
+                rented = bucket.rented_days_by_type.get(vehicle_type, 0)
+                available = calendar.available_days(start, end)
+                by_type.append(TypeUtilization(
+                    vehicle_type=vehicle_type, rented_days=rented,
+                    available_days=available, utilization=ratio(rented, available),
+                ))
+            rented = sum(item.rented_days for item in by_type)
+            available = sum(item.available_days for item in by_type)
+            result_buckets.append(RentalTimeBucket(
+                start=start, end=end, revenue=bucket.revenue, rental_count=bucket.rental_count,
+                rented_days=rented, available_days=available, utilization=ratio(rented, available),
+                by_vehicle_type=by_type,
+            ))
+            for vehicle_id, days in bucket.rented_days_by_vehicle.items():
+                rented_by_vehicle[vehicle_id] = rented_by_vehicle.get(vehicle_id, 0) + days
+
+        range_start, range_end = buckets[0][0], buckets[-1][1]
+        vehicle_stats = []
+        for vehicle in vehicles:
+            available = max(0, (range_end - max(range_start, registered[vehicle['id']])).days)
+            rented = rented_by_vehicle.get(vehicle['id'], 0)
+            vehicle_stats.append(VehicleUtilization(
+                id_vehicle=vehicle['id'], vehicle_type=vehicle['vehicle_type'],
+                rented_days=rented, available_days=available, utilization=ratio(rented, available),
+            ))
+
+        return RentalTimeSeries(
+            granularity=granularity, start=range_start, end=range_end,
+            buckets=result_buckets, vehicles=vehicle_stats,
+        )
@@ -0,0 +1,136 @@
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
+from typing import Iterable, Sequence, Tuple
+
+
+class StatementKind(Enum):
+    SELECT = "select"
+    INSERT = "insert"
+    UPDATE = "update"
+    DELETE = "delete"
+
+
+@dataclass(frozen=True)
+class Statement:
+    """
+    A SQL statement built once, with its kind declared explicitly
+    (instead of inspecting the text on every execution).
+    """
+    sql: str
+    kind: StatementKind
+
+    @property
+    def is_read(self) -> bool:
+        return self.kind is StatementKind.SELECT
+
+
+def select(sql: str) -> Statement:
+    return Statement(" ".join(sql.split()), StatementKind.SELECT)
+
+
+def insert(sql: str) -> Statement:
+    return Statement(" ".join(sql.split()), StatementKind.INSERT)
+
+
+def update(sql: str) -> Statement:
+    return Statement(" ".join(sql.split()), StatementKind.UPDATE)
+
+
+def delete(sql: str) -> Statement:
+    return Statement(" ".join(sql.split()), StatementKind.DELETE)
+
+
+def placeholders(count: int) -> str:
+    return ", ".join(["%s"] * count)
+
+
+class TableStatements:
+    """
+    Registry of a table's statements. The fixed ones are built when the
+    repository class is defined; the variable ones (partial updates, IN lists,
+    multi-row inserts) are built on first use and memoized by their shape.
+    Column names only ever come from `columns`, never from request data.
+    """
+
+    def __init__(self, table: str, columns: Sequence[str], select_columns: str = "*"):
+        self.table = table
+        self.columns = tuple(columns)
+        self._column_order = {column: i for i, column in enumerate(self.columns)}
+        self.select_columns = select_columns
+
+        base = f"SELECT {select_columns} FROM {table}"
+        self.select_by_id = select(f"{base} WHERE id = %s;")
+        self.select_page = select(f"{base} WHERE id > %s ORDER BY id LIMIT %s;")
+        self.select_stream = select(f"{base} WHERE id > %s ORDER BY id;")
+        self.insert = insert(
+            f"INSERT INTO {table} ({', '.join(self.columns)}) VALUES ({placeholders(len(self.columns))});"
+        )
+        self.delete_by_id = delete(f"DELETE FROM {table} WHERE id = %s;")
+        # Write and read back in the same round-trip.
+        self.insert_returning = insert(
+            f"INSERT INTO {table} ({', '.join(self.columns)}) VALUES ({placeholders(len(self.columns))}) "
+            f"RETURNING {select_columns};"
+        )
+        self.delete_by_id_returning = delete(f"DELETE FROM {table} WHERE id = %s RETURNING {select_columns};")
+
+        # Memoized per instance: the number of distinct shapes is small and bounded.
+        self.update_columns = lru_cache(maxsize=256)(self._update_columns)
+        self.update_returning = lru_cache(maxsize=256)(self._update_returning)
+        self.select_in = lru_cache(maxsize=256)(self._select_in)
+        self.select_ids_in = lru_cache(maxsize=256)(self._select_ids_in)
+        self.insert_many_returning_ids = lru_cache(maxsize=64)(self._insert_many_returning_ids)
+        self.delete_in_returning_ids = lru_cache(maxsize=256)(self._delete_in_returning_ids)
+
+    @staticmethod
+    def padded(factory, ids: Sequence[int]) -> Tuple[Statement, tuple]:
+        """
+        Pads an IN list to the next power of two by repeating the last id, so
+        a handful of statements covers every list size. Same rows either way.
+        """
+        size = 1 << (len(ids) - 1).bit_length()
+        return factory(size), tuple(ids) + (ids[-1],) * (size - len(ids))
+
+    def ordered_columns(self, columns: Iterable[str]) -> Tuple[str, ...]:
+        """Puts the columns in table order so each distinct set maps to one statement."""
+        try:
+            return tuple(sorted(columns, key=self._column_order.__getitem__))
+        except KeyError as exc:
+            raise ValueError(f"Unknown column for {self.table}: {exc.args[0]}") from None
+
+    def update(self, columns: Iterable[str]) -> Tuple[Statement, Tuple[str, ...]]:
+        """
+        Statement for a partial update of `columns`, plus the column order its
+        parameters must follow (the id goes last).
+        """
+        ordered = self.ordered_columns(columns)
+        return self.update_columns(ordered), ordered
+
+    def _update_columns(self, columns: Tuple[str, ...]) -> Statement:
+        set_clause = ", ".join(f"{column} = %s" for column in columns)
+        return update(f"UPDATE {self.table} SET {set_clause}, version = version + 1 WHERE id = %s;")
+
+    def _update_returning(self, columns: Tuple[str, ...], guarded: bool) -> Statement:
+        """
+        UPDATE followed by the SELECT of the row, sent together (multi-statement)
+        so they cost one round-trip; MariaDB has no UPDATE ... RETURNING.
+        Parameters: values..., id, [expected version,] id. With `guarded` the
+        UPDATE only applies if the row still has the expected version.
+        """
+        set_clause = ", ".join(f"{column} = %s" for column in columns)
+        where = "id = %s AND version = %s" if guarded else "id = %s"
+        row = f"SELECT {self.select_columns} FROM {self.table} WHERE id = %s;"
+        return update(f"UPDATE {self.table} SET {set_clause}, version = version + 1 WHERE {where}; {row}")
+
+    def _select_in(self, count: int) -> Statement:
+        return select(f"SELECT {self.select_columns} FROM {self.table} WHERE id IN ({placeholders(count)});")
+
+    def _select_ids_in(self, count: int) -> Statement:
+        return select(f"SELECT id FROM {self.table} WHERE id IN ({placeholders(count)});")
+
+    def _insert_many_returning_ids(self, rows: int) -> Statement:
+        values = ", ".join([f"({placeholders(len(self.columns))})"] * rows)
+        return insert(f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES {values} RETURNING id;")
+
+    def _delete_in_returning_ids(self, count: int) -> Statement:
+        return delete(f"DELETE FROM {self.table} WHERE id IN ({placeholders(count)}) RETURNING id;")
@@ -1,46 +1,157 @@
-from typing import List, Optional
+import asyncio
+from typing import AsyncIterator, List, Optional, Tuple
+from pydantic import BaseModel
 from .base_repository import BaseRepository
-from ..schemas.user import UserCreate, UserUpdate, UserInDB
+from .statements import TableStatements, select
+from ..core.serialization import build_models
+from ..core.user_search import UserSearchIndex
+from ..schemas.bulk import BulkResult
+from ..schemas.user import UserCreate, UserUpdate, UserInDB, UserSearchResult
+
+SEARCH_ROWS = select("SELECT id, name, last_name, email, cpf FROM user;")
+# Busca por prefixo, usada enquanto o índice de trigramas não está pronto (ou está desligado).
+SEARCH_PREFIX = select("""
+    SELECT id, name, last_name, cpf, email, birth_at, version FROM user
+    WHERE name LIKE %s OR last_name LIKE %s OR email LIKE %s OR cpf LIKE %s
+    ORDER BY id LIMIT %s;
+""")
+# Linhas tokenizadas por vez numa thread durante a reconstrução.
+INDEX_LOAD_BATCH = 1000
+
+
+def _like_prefix(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%"
+
 
 class UserRepository(BaseRepository):
-    
-    async def get_all(self) -> List[UserInDB]:
-        query = "SELECT id, name, last_name, cpf, email, birth_at FROM user;"
-        records = await self._execute_query(query, fetch='all')
-        return [UserInDB(**record) for record in (records or [])]
+    table = "user"
+    model = UserInDB
+    cascades = ("rental",)
+    statements = TableStatements(
+        "user",
+        columns=("name", "last_name", "cpf", "email", "birth_at"),
+        select_columns="id, name, last_name, cpf, email, birth_at, version",
+    )
+
+    def __init__(self, *args, search_index: Optional[UserSearchIndex] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.search_index = search_index
+
+    async def get_all(self, after_id: int = 0, limit: int = 100) -> List[UserInDB]:
+        """
+        Retorna uma página de registros ordenados por id (paginação por keyset).
+        Passe o id do último registro recebido como `after_id` para obter a próxima página.
+        """
+        records = await self._execute_query(self.statements.select_page, params=(after_id, limit), fetch='all')
+        return self._to_models(records or [])
+
+    async def stream_all(self, after_id: int = 0) -> AsyncIterator[UserInDB]:
+        """Percorre todos os registros com id maior que `after_id` com um cursor do lado do servidor."""
+        async for record in self._stream_query(self.statements.select_stream, params=(after_id,)):
+            yield UserInDB(**record)
 
     async def get_by_id(self, user_id: int) -> Optional[UserInDB]:
-        query = "SELECT id, name, last_name, cpf, email, birth_at FROM user WHERE id = %s;"
-        record = await self._execute_query(query, (user_id,), fetch='one')
-        return UserInDB(**record) if record else None
+        cached = await self._cache_get(user_id, UserInDB)
+        if cached is not None:
+            return cached
+        record = await self._load_record(user_id)
+        if not record:
+            return None
+        user = UserInDB(**record)
+        await self._cache_set(user_id, user)
+        return user
 
     async def create(self, user: UserCreate) -> UserInDB:
-        query = """
-            INSERT INTO user (name, last_name, cpf, email, birth_at)
-            VALUES (%s, %s, %s, %s, %s);
-        """
         params = (user.name, user.last_name, user.cpf, user.email, user.birth_at)
-        new_id = await self._execute_query(query, params)
+        new_id = await self._execute_query(self.statements.insert, params)
         if new_id is None:
             raise ValueError("Failed to create user: no ID returned from database.")
-        return UserInDB(id=new_id, **user.model_dump())
+        new_user = UserInDB(id=new_id, **user.model_dump())
+        await self._cache_set(new_id, new_user)
+        if self.search_index is not None:
+            self.search_index.add(new_id, new_user)
+        return new_user
 
-    async def update(self, user_id: int, user_update: UserUpdate) -> Optional[UserInDB]:
+    async def update(
+        self, user_id: int, user_update: UserUpdate, expected_version: Optional[int] = None
+    ) -> Optional[UserInDB]:
         # Pega os dados que foram realmente enviados para atualização
         update_data = user_update.model_dump(exclude_unset=True)
-        if not update_data:
-            return await self.get_by_id(user_id) # Se nada foi enviado, retorna o usuário atual
-
-        # Monta a query dinamicamente para atualizar apenas os campos enviados
-        set_clause = ", ".join([f"{key} = %s" for key in update_data.keys()])
-        query = f"UPDATE user SET {set_clause} WHERE id = %s;"
-        params = tuple(update_data.values()) + (user_id,)
-        
-        await self._execute_query(query, params)
-        return await self.get_by_id(user_id)
+        updated = await self._update_entity(user_id, update_data, expected_version)
+        if updated is not None and self.search_index is not None:
+            self.search_index.add(user_id, updated)
+        return updated
 
     async def delete(self, user_id: int) -> bool:
-        query = "DELETE FROM user WHERE id = %s;"
-        await self._execute_query(query, (user_id,))
-        # Podemos verificar se a deleção foi bem-sucedida checando se o usuário ainda existe
-        return await self.get_by_id(user_id) is None
\ No newline at end of file
+        rows_affected = await self._execute_query(self.statements.delete_by_id, (user_id,))
+        if not rows_affected:
+            return False
+        await self._invalidate(user_id, cascade=True)
+        if self.search_index is not None:
+            self.search_index.remove(user_id)
+        return True
+
+    async def create_many(self, items: List[Tuple[int, BaseModel]]) -> BulkResult:
+        result = await super().create_many(items)
+        if self.search_index is not None:
+            # result.ids segue a ordem das linhas aceitas.
+            failed = {error.index for error in result.errors}
+            accepted = [user for index, user in sorted(items, key=lambda item: item[0]) if index not in failed]
+            for user_id, user in zip(result.ids, accepted):
+                self.search_index.add(user_id, user)
+        return result
+
+    async def update_many(self, items: List[Tuple[int, int, BaseModel]]) -> BulkResult:
+        result = await super().update_many(items)
+        if self.search_index is not None and result.ids:
+            # As mudanças são parciais: o índice precisa das linhas completas.
+            for user in await self.get_many(result.ids):
+                self.search_index.add(user.id, user)
+        return result
+
+    async def delete_many(self, ids: List[int]) -> BulkResult:
+        result = await super().delete_many(ids)
+        if self.search_index is not None:
+            for user_id in result.ids:
+                self.search_index.remove(user_id)
+        return result
+
+    async def search(self, query: str, limit: int = 20) -> List[UserSearchResult]:
+        """
+        Usuários parecidos com `query` (parte do nome, sobrenome, e-mail ou CPF),
+        do mais ao menos parecido. Servida pelo índice de trigramas, que tolera
+        erros de digitação; até que ele fique pronto, por prefixo no banco.
+        """
+        index = self.search_index
+        if index is None or not index.ready:
+            pattern = _like_prefix(query.strip())
+            records = await self._execute_query(SEARCH_PREFIX, params=(pattern,) * 4 + (limit,), fetch='all')
+            return build_models(UserSearchResult, records or [])
+        matches = index.search(query, limit)
+        # Usuários removidos por outro worker ainda podem estar no índice; get_many deixa-os de fora.
+        users = {user.id: user for user in await self.get_many([user_id for user_id, _ in matches])}
+        return [
+            UserSearchResult.model_construct(**dict(users[user_id]), score=score)
+            for user_id, score in matches if user_id in users
+        ]
+
+    async def rebuild_search_index(self):
+        """
+        Reconstrói o índice de busca a partir do banco, sem bloquear as buscas.
+        A tokenização de cada bloco roda numa thread, fora do event loop.
+        """
+        index = self.search_index
+        index.begin_rebuild()
+        try:
+            batch = []
+            async for record in self._stream_query(SEARCH_ROWS, chunk_size=INDEX_LOAD_BATCH):
+                batch.append(record)
+                if len(batch) >= INDEX_LOAD_BATCH:
+                    await asyncio.to_thread(index.load, batch)
+                    batch = []
+            await asyncio.to_thread(index.load, batch)
+        except BaseException:
+            index.abort_rebuild()
+            raise
+        index.finish_rebuild()
\ No newline at end of file
@@ -1,64 +1,125 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple
+from pydantic import BaseModel
 from .base_repository import BaseRepository
+from .statements import TableStatements, select
+from ..schemas.bulk import BulkResult
 from ..schemas.vehicles import VehicleCreate, VehicleUpdate, VehicleInDB
 
+BOOKABLE = select("SELECT * FROM vehicle WHERE available = TRUE ORDER BY id;")
+BOOKABLE_BY_TYPE = select("SELECT * FROM vehicle WHERE available = TRUE AND vehicle_type = %s ORDER BY id;")
+PRICES = select("SELECT id, daily_charge, available FROM vehicle;")
+
 class VehicleRepository(BaseRepository):
-    async def get_all(self) -> List[VehicleInDB]:
-        query = "SELECT * FROM vehicle;"
-        records = await self._execute_query(query, fetch='all')
-        return [VehicleInDB(**record) for record in records] if records else []
+    table = "vehicle"
+    model = VehicleInDB
+    cascades = ("rental",)
+    statements = TableStatements(
+        "vehicle",
+        columns=(
+            "brand", "model", "vehicle_type", "year", "license_plate",
+            "color", "mileage", "available", "daily_charge",
+        ),
+    )
+
+    async def get_all(self, after_id: int = 0, limit: int = 100) -> List[VehicleInDB]:
+        """
+        Retorna uma página de registros ordenados por id (paginação por keyset).
+        Passe o id do último registro recebido como `after_id` para obter a próxima página.
+        """
+        records = await self._execute_query(self.statements.select_page, params=(after_id, limit), fetch='all')
+        return self._to_models(records or [])
+
+    async def stream_all(self, after_id: int = 0) -> AsyncIterator[VehicleInDB]:
+        """Percorre todos os registros com id maior que `after_id` com um cursor do lado do servidor."""
+        async for record in self._stream_query(self.statements.select_stream, params=(after_id,)):
+            yield VehicleInDB(**record)
+
+    async def get_bookable(self, vehicle_type: Optional[str] = None) -> List[VehicleInDB]:
+        """
+        Busca os veículos marcados como disponíveis para locação,
+        opcionalmente filtrando pelo tipo.
+        """
+        if vehicle_type is None:
+            statement, params = BOOKABLE, ()
+        else:
+            statement, params = BOOKABLE_BY_TYPE, (vehicle_type,)
+        records = await self._execute_query(statement, params=params, fetch='all')
+        return self._to_models(records or [])
+
+    async def get_prices(self) -> List[dict]:
+        """Diária e situação de todos os veículos (a tabela de preços das cotações)."""
+        return await self._execute_query(PRICES, fetch='all') or []
 
     async def get_by_id(self, vehicle_id: int) -> Optional[VehicleInDB]:
         """
         Busca um único veículo pelo seu ID.
         """
-        query = "SELECT * FROM vehicle WHERE id = %s;"
-        record = await self._execute_query(query, params=(vehicle_id,), fetch='one')
-        return VehicleInDB(**record) if record else None
+        cached = await self._cache_get(vehicle_id, VehicleInDB)
+        if cached is not None:
+            return cached
+        record = await self._load_record(vehicle_id)
+        if not record:
+            return None
+        vehicle = VehicleInDB(**record)
+        await self._cache_set(vehicle_id, vehicle)
+        return vehicle
 
     async def create(self, vehicle: VehicleCreate) -> VehicleInDB:
         """
         Insere um novo veículo no banco de dados.
         """
-        query = """
-            INSERT INTO vehicle (brand, model, vehicle_type, year, license_plate, color, mileage, available, daily_charge)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s);
-        """
         params = (
             vehicle.brand, vehicle.model, vehicle.vehicle_type, vehicle.year, 
             vehicle.license_plate, vehicle.color, vehicle.mileage, 
             vehicle.available, vehicle.daily_charge
         )
-        new_id = await self._execute_query(query, params=params)
-        if new_id is None:
-            raise ValueError("Failed to create vehicle: no ID returned from database.")
-        vehicle_in_db = await self.get_by_id(new_id)
-        if vehicle_in_db is None:
-            raise ValueError("Failed to retrieve newly created vehicle from database.")
+        # INSERT ... RETURNING: a linha com os defaults do banco vem na mesma ida.
+        record = await self._execute_query(self.statements.insert_returning, params=params, fetch='one')
+        if record is None:
+            raise ValueError("Failed to create vehicle: no row returned from database.")
+        vehicle_in_db = VehicleInDB(**record)
+        await self._cache_set(vehicle_in_db.id, vehicle_in_db)
+        self._publish("vehicle.created", vehicle_in_db.model_dump(mode="json"))
         return vehicle_in_db
 
-    async def update(self, vehicle_id: int, vehicle_update: VehicleUpdate) -> Optional[VehicleInDB]:
+    async def update(
+        self, vehicle_id: int, vehicle_update: VehicleUpdate, expected_version: Optional[int] = None
+    ) -> Optional[VehicleInDB]:
         """
         Atualiza os dados de um veículo existente.
         """
         update_data = vehicle_update.model_dump(exclude_unset=True)
-        
-        if not update_data:
-            return await self.get_by_id(vehicle_id)
-
-        # Monta a query dinamicamente para atualizar apenas os campos enviados
-        set_clause = ", ".join([f"{key} = %s" for key in update_data.keys()])
-        query = f"UPDATE vehicle SET {set_clause} WHERE id = %s;"
-        
-        params = tuple(update_data.values()) + (vehicle_id,)
-
-        await self._execute_query(query, params=params)        
-        return await self.get_by_id(vehicle_id)
+        updated = await self._update_entity(vehicle_id, update_data, expected_version)
+        if updated is not None and update_data:
+            self._publish("vehicle.updated", updated.model_dump(mode="json"))
+        return updated
 
     async def delete(self, vehicle_id: int) -> bool:
         """
         Deleta um veículo do banco de dados.
         """
-        query = "DELETE FROM vehicle WHERE id = %s;"
-        rows_affected = await self._execute_query(query, params=(vehicle_id,))
-        return rows_affected is not None and rows_affected > 0
\ No newline at end of file
+        rows_affected = await self._execute_query(self.statements.delete_by_id, params=(vehicle_id,))
+        if not rows_affected:
+            return False
+        self._publish("vehicle.deleted", {"id": vehicle_id})
+        await self._invalidate(vehicle_id, cascade=True)
+        return True
+
+    # Escritas em lote publicam só os ids; o cliente os recarrega com GET /vehicles/?ids=.
+    async def create_many(self, items: List[Tuple[int, BaseModel]]) -> BulkResult:
+        result = await super().create_many(items)
+        if result.ids:
+            self._publish("vehicle.created", {"ids": result.ids})
+        return result
+
+    async def update_many(self, items: List[Tuple[int, int, BaseModel]]) -> BulkResult:
+        result = await super().update_many(items)
+        if result.ids:
+            self._publish("vehicle.updated", {"ids": result.ids})
+        return result
+
+    async def delete_many(self, ids: List[int]) -> BulkResult:
+        result = await super().delete_many(ids)
+        if result.ids:
+            self._publish("vehicle.deleted", {"ids": result.ids})
+        return result
\ No newline at end of file
@@ -1,21 +1,38 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
+from fastapi import APIRouter, Body, HTTPException, Query, Request, status, Depends
+from typing import Any, Dict, List, Optional
 from ..schemas.employee import CreateEmployee, UpdateEmployee, EmployeeInDB
 from ..repositories.employee_repository import EmployeeRepository
-from ..dependencies.dependencies import get_employee_repo
+from ..dependencies.dependencies import get_employee_repo, PageParams
+from ..core.streaming import ndjson_response
+from ..core.serialization import json_list_response, json_model_response
+from ..core.conditional import conditional_response
+from ..core.bulk import MAX_BULK_ROWS, validate_rows, validate_update_rows
+from ..schemas.bulk import BulkDelete, BulkResult
+from ..core.profiling import ProfiledRoute
 
 router = APIRouter(
     prefix="/employee", 
     tags=["employee"],
     responses={404: {"description": "Employee not found"}},
+    route_class=ProfiledRoute,
 )
 
 
 @router.get("/", response_model=List[EmployeeInDB])
 async def get_all_employees(
+    request: Request,
+    page: PageParams = Depends(),
     employee_repo: EmployeeRepository = Depends(get_employee_repo)
 ):
-    return await employee_repo.get_all()
+    if page.stream and page.ids is None:
+        return ndjson_response(employee_repo.stream_all(after_id=page.after_id))
+
+    async def build():
+        if page.ids is not None:
+            return json_list_response(EmployeeInDB, await employee_repo.get_many(page.ids))
+        return json_list_response(EmployeeInDB, await employee_repo.get_all(after_id=page.after_id, limit=page.limit))
+
+    return await conditional_response(request, (EmployeeRepository.table,), build)
 
 
 @router.post("/", response_model=EmployeeInDB, status_code=status.HTTP_201_CREATED)
@@ -26,27 +43,73 @@ async def create_employee(
     return await employee_repo.create(employee)
 
 
+@router.post("/bulk", response_model=BulkResult)
+async def create_employees_bulk(
+    rows: List[Dict[str, Any]] = Body(..., max_length=MAX_BULK_ROWS),
+    employee_repo: EmployeeRepository = Depends(get_employee_repo)
+):
+    """
+    Creates up to 1000 employees in one transaction. Invalid rows are reported in `errors`.
+    """
+    valid, errors = validate_rows(CreateEmployee, rows)
+    result = await employee_repo.create_many(valid)
+    result.errors = sorted(errors + result.errors, key=lambda error: error.index)
+    return result
+
+
+@router.put("/bulk", response_model=BulkResult)
+async def update_employees_bulk(
+    rows: List[Dict[str, Any]] = Body(..., max_length=MAX_BULK_ROWS),
+    employee_repo: EmployeeRepository = Depends(get_employee_repo)
+):
+    """
+    Applies partial updates; each row carries the `id` plus the fields to change.
+    """
+    valid, errors = validate_update_rows(UpdateEmployee, rows)
+    result = await employee_repo.update_many(valid)
+    result.errors = sorted(errors + result.errors, key=lambda error: error.index)
+    return result
+
+
+@router.post("/bulk/delete", response_model=BulkResult)
+async def delete_employees_bulk(
+    payload: BulkDelete,
+    employee_repo: EmployeeRepository = Depends(get_employee_repo)
+):
+    return await employee_repo.delete_many(payload.ids)
+
+
 @router.get("/{employee_id}", response_model=EmployeeInDB)
 async def get_employee_by_id(
     employee_id: int, 
+    request: Request,
     employee_repo: EmployeeRepository = Depends(get_employee_repo)
 ):
     """
     Retrieves a single employee by their ID.
     """
-    db_employee = await employee_repo.get_by_id(employee_id)
-    if db_employee is None:
-        raise HTTPException(status_code=404, detail="Employee not found")
-    return db_employee
+    async def build():
+        db_employee = await employee_repo.get_by_id(employee_id)
+        if db_employee is None:
+            raise HTTPException(status_code=404, detail="Employee not found")
+        return json_model_response(db_employee)
 
+    return await conditional_response(request, (EmployeeRepository.table,), build)
 
-@router.put("/{employee_id}", response_model=EmployeeInDB)
+
+@router.put(
+    "/{employee_id}", response_model=EmployeeInDB,
+    responses={409: {"description": "`expected_version` no longer matches the row"}},
+)
 async def update_employee(
     employee_id: int, 
     employee_update: UpdateEmployee, 
+    expected_version: Optional[int] = Query(
+        None, ge=1, description="Only update if the row still has this `version` (409 otherwise)."
+    ),
     employee_repo: EmployeeRepository = Depends(get_employee_repo)
 ):
-    updated_employee = await employee_repo.update(employee_id, employee_update)
+    updated_employee = await employee_repo.update(employee_id, employee_update, expected_version)
     if updated_employee is None:
         raise HTTPException(status_code=404, detail="Employee not found")
     return updated_employee
@@ -0,0 +1,113 @@
+import os
+from datetime import date
+from typing import Literal, Tuple
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status, Depends
+from fastapi.responses import FileResponse
+from ..schemas.job import JobInDB
+from ..repositories.job_repository import JobRepository
+from ..dependencies.dependencies import get_job_repo, rental_expand
+from ..core.exports import COLUMNAR_FORMATS, parquet_available
+from ..core.jobs import JOB_QUEUE_MAXSIZE, JobQueueFullError
+from ..core.timeseries import MAX_BUCKETS, bucket_count
+from ..core.profiling import ProfiledRoute
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+    responses={404: {"description": "Job not found"}},
+    route_class=ProfiledRoute,
+)
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+
+async def _enqueue(request: Request, response: Response, job_repo: JobRepository, kind: str, params: dict) -> JobInDB:
+    if await job_repo.count_queued() >= JOB_QUEUE_MAXSIZE:
+        raise JobQueueFullError(f"More than {JOB_QUEUE_MAXSIZE} jobs are waiting; try again later")
+    job = await job_repo.create(kind, params)
+    request.app.state.job_runner.notify()
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job
+
+
+@router.post("/reports/summary", response_model=JobInDB, status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_summary_report(
+    request: Request, response: Response, job_repo: JobRepository = Depends(get_job_repo)
+):
+    """
+    Gera o relatório de resumo (GET /rental/reports/summary) em segundo plano.
+    Consulte o job retornado em `Location`; o relatório fica em `result_url` quando ele terminar.
+    """
+    return await _enqueue(request, response, job_repo, "report.summary", {})
+
+
+@router.post("/reports/timeseries", response_model=JobInDB, status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_timeseries_report(
+    request: Request,
+    response: Response,
+    granularity: Literal['day', 'week', 'month'] = 'month',
+    start: date = Query(..., alias="from", description="First day of the range."),
+    end: date = Query(..., alias="to", description="Last day of the range (inclusive)."),
+    job_repo: JobRepository = Depends(get_job_repo),
+):
+    """Mesmo relatório de GET /rental/reports/timeseries, gerado por um job em segundo plano."""
+    if end < start:
+        raise HTTPException(status_code=422, detail="'to' must not be before 'from'")
+    if bucket_count(start, end, granularity) > MAX_BUCKETS:
+        raise HTTPException(status_code=422, detail=f"Range too large: at most {MAX_BUCKETS} buckets")
+    params = {"granularity": granularity, "from": start.isoformat(), "to": end.isoformat()}
+    return await _enqueue(request, response, job_repo, "report.timeseries", params)
+
+
+@router.post("/exports/rentals", response_model=JobInDB, status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_rentals_export(
+    request: Request,
+    response: Response,
+    format: Literal['csv', 'parquet', 'arrow'] = 'csv',
+    after_id: int = Query(0, ge=0, description="Only export rentals with an id greater than this one."),
+    expand: Tuple[str, ...] = Depends(rental_expand),
+    job_repo: JobRepository = Depends(get_job_repo),
+):
+    """
+    Exporta as locações para um arquivo CSV, Parquet ou Arrow IPC. Com
+    `expand=user,vehicle` as colunas relacionadas vêm achatadas como
+    `vehicle__brand` etc. Parquet e Arrow exigem o pacote opcional `pyarrow`
+    no servidor.
+    Para extrações particionadas e incrementais, use `python -m app.export`.
+    """
+    if format in COLUMNAR_FORMATS and not parquet_available():
+        raise HTTPException(status_code=422, detail=f"{format} exports need the 'pyarrow' package on the server")
+    params = {"format": format, "expand": list(expand), "after_id": after_id}
+    return await _enqueue(request, response, job_repo, "export.rentals", params)
+
+
+@router.get("/{job_id}", response_model=JobInDB)
+async def get_job(job_id: int, job_repo: JobRepository = Depends(get_job_repo)):
+    job = await job_repo.get_by_id(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get(
+    "/{job_id}/result",
+    response_class=FileResponse,
+    responses={409: {"description": "The job has not finished successfully"}},
+)
+async def get_job_result(job_id: int, request: Request, job_repo: JobRepository = Depends(get_job_repo)):
+    """Baixa o arquivo gerado pelo job."""
+    job = await job_repo.get_by_id(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    path = request.app.state.job_runner.result_path(job)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Result file not found")
+    extension = path.rsplit(".", 1)[-1]
+    return FileResponse(path, media_type=MEDIA_TYPES.get(extension), filename=f"{job.kind}-{job.id}.{extension}")
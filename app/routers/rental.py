@@ -1,29 +1,123 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
-from ..schemas.rental import RentalCreate, RentalUpdate, RentalInDB, RentalReport
+from fastapi import APIRouter, Body, HTTPException, Query, Request, status, Depends
+from datetime import date
+from typing import Any, Dict, List, Literal, Optional, Tuple
+from ..schemas.rental import (
+    RentalCreate, RentalUpdate, RentalInDB, RentalExpanded, RentalPage, RentalReport, RentalTimeSeries,
+    QuoteRequest, QuoteResult,
+)
 from ..repositories.rental_repository import RentalRepository
-from ..dependencies.dependencies import get_rental_repo
+from ..repositories.vehicle_repository import VehicleRepository
+from ..dependencies.dependencies import get_rental_repo, get_vehicle_repo, rental_expand, PageParams, RentalSearchParams
+from ..core.streaming import ndjson_response
+from ..core.serialization import json_list_response, json_model_response
+from ..core.pagination import decode_cursor, encode_cursor
+from ..core.bulk import MAX_BULK_ROWS, validate_rows, validate_update_rows
+from ..schemas.bulk import BulkDelete, BulkResult
+from ..core.timeseries import MAX_BUCKETS, bucket_count
+from ..core.profiling import ProfiledRoute
+from ..core.booking import BookingError
+from ..core.pricing import quote_many
 
 router = APIRouter(
     prefix="/rental", #
     tags=["rental"],
     responses={404: {"description": "Rental not found"}},
+    route_class=ProfiledRoute,
 )
 
 
-@router.get("/", response_model=List[RentalInDB])
+@router.get("/", response_model=List[RentalExpanded], response_model_exclude_unset=True)
 async def get_all_rentals(
+    page: PageParams = Depends(),
+    expand: Tuple[str, ...] = Depends(rental_expand),
     rental_repo: RentalRepository = Depends(get_rental_repo)
 ):
-    return await rental_repo.get_all()
+    """
+    Página de locações. Com `expand=user,vehicle,employee` cada locação traz
+    essas entidades, buscadas na mesma query (indisponível com `stream`).
+    """
+    if expand:
+        if page.stream:
+            raise HTTPException(status_code=422, detail="'expand' cannot be combined with 'stream'")
+        if page.ids is not None:
+            items = await rental_repo.get_many_expanded(page.ids, expand)
+        else:
+            items = await rental_repo.get_all_expanded(expand, after_id=page.after_id, limit=page.limit)
+        return json_list_response(RentalExpanded, items, exclude_unset=True)
+    if page.ids is not None:
+        return json_list_response(RentalInDB, await rental_repo.get_many(page.ids))
+    if page.stream:
+        return ndjson_response(rental_repo.stream_all(after_id=page.after_id))
+    return json_list_response(RentalInDB, await rental_repo.get_all(after_id=page.after_id, limit=page.limit))
 
 
-@router.post("/", response_model=RentalInDB, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/", response_model=RentalInDB, status_code=status.HTTP_201_CREATED,
+    responses={409: {"description": "Vehicle already booked for overlapping dates or out of service"}},
+)
 async def create_rental(
     rental: RentalCreate, 
     rental_repo: RentalRepository = Depends(get_rental_repo)
 ):
-    return await rental_repo.create(rental)
+    try:
+        return await rental_repo.create(rental)
+    except BookingError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
+
+
+@router.post("/bulk", response_model=BulkResult)
+async def create_rentals_bulk(
+    rows: List[Dict[str, Any]] = Body(..., max_length=MAX_BULK_ROWS),
+    rental_repo: RentalRepository = Depends(get_rental_repo)
+):
+    """
+    Cria até 1000 locações numa única transação. Linhas inválidas são informadas em `errors`.
+    """
+    valid, errors = validate_rows(RentalCreate, rows)
+    result = await rental_repo.create_many(valid)
+    result.errors = sorted(errors + result.errors, key=lambda error: error.index)
+    return result
+
+
+@router.put("/bulk", response_model=BulkResult)
+async def update_rentals_bulk(
+    rows: List[Dict[str, Any]] = Body(..., max_length=MAX_BULK_ROWS),
+    rental_repo: RentalRepository = Depends(get_rental_repo)
+):
+    """
+    Aplica atualizações parciais; cada linha traz o `id` e os campos a alterar.
+    """
+    valid, errors = validate_update_rows(RentalUpdate, rows)
+    result = await rental_repo.update_many(valid)
+    result.errors = sorted(errors + result.errors, key=lambda error: error.index)
+    return result
+
+
+@router.post("/bulk/delete", response_model=BulkResult)
+async def delete_rentals_bulk(
+    payload: BulkDelete,
+    rental_repo: RentalRepository = Depends(get_rental_repo)
+):
+    return await rental_repo.delete_many(payload.ids)
+
+
+@router.post("/quote", response_model=QuoteResult)
+async def quote_rentals(
+    payload: QuoteRequest,
+    request: Request,
+    vehicle_repo: VehicleRepository = Depends(get_vehicle_repo),
+):
+    """
+    Calcula no servidor o preço de até 1000 pares (veículo, período), a partir
+    da diária do veículo com os multiplicadores de fim de semana e temporada e
+    os descontos de locação longa. O `rent_value` de cada cotação é o que
+    POST /rental/ espera. A disponibilidade das datas não é verificada aqui;
+    veja /vehicles/availability.
+    """
+    state = request.app.state
+    prices = await state.price_table.get(state.table_versions, vehicle_repo.get_prices)
+    quotes, errors = quote_many(state.pricing_rules, prices, payload.items)
+    return json_model_response(QuoteResult(quotes=quotes, errors=errors))
 
 
 @router.get("/reports/summary", response_model=RentalReport)
@@ -32,24 +126,86 @@ async def get_rental_summary_report(
 ):
     return await rental_repo.get_summary_report()
 
-@router.get("/{rental_id}", response_model=RentalInDB)
+@router.get("/reports/timeseries", response_model=RentalTimeSeries)
+async def get_rental_timeseries(
+    granularity: Literal['day', 'week', 'month'] = 'month',
+    start: date = Query(..., alias="from", description="First day of the range."),
+    end: date = Query(..., alias="to", description="Last day of the range (inclusive)."),
+    rental_repo: RentalRepository = Depends(get_rental_repo)
+):
+    """
+    Receita, locações e utilização da frota por dia, semana ou mês.
+    O intervalo é ampliado para buckets inteiros.
+    """
+    if end < start:
+        raise HTTPException(status_code=422, detail="'to' must not be before 'from'")
+    if bucket_count(start, end, granularity) > MAX_BUCKETS:
+        raise HTTPException(status_code=422, detail=f"Range too large: at most {MAX_BUCKETS} buckets")
+    return await rental_repo.get_timeseries(granularity, start, end)
+
+@router.get("/search", response_model=RentalPage)
+async def search_rentals(
+    params: RentalSearchParams = Depends(),
+    rental_repo: RentalRepository = Depends(get_rental_repo)
+):
+    """
+    Busca locações por usuário, veículo, funcionário, períodos e valor.
+    Os resultados são ordenados por `sort` (empates desfeitos pelo id) e
+    paginados pelo `next_cursor` opaco; ao segui-lo, mantenha os mesmos
+    filtros e a mesma ordenação.
+    """
+    filters = params.filters
+    for low, high in (("rent_from", "rent_to"), ("return_from", "return_to"), ("min_value", "max_value")):
+        if low in filters and high in filters and filters[low] > filters[high]:
+            raise HTTPException(status_code=422, detail=f"'{low}' must not be after '{high}'")
+    after = None
+    if params.cursor is not None:
+        try:
+            after = decode_cursor(
+                params.cursor, params.sort, params.descending,
+                date_sort=params.sort in ("rent_date", "return_date"),
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=422, detail=str(exc))
+    items, next_key = await rental_repo.search(
+        filters, sort=params.sort, descending=params.descending, limit=params.limit, after=after,
+    )
+    next_cursor = encode_cursor(params.sort, params.descending, *next_key) if next_key else None
+    return json_model_response(RentalPage(items=items, next_cursor=next_cursor))
+
+@router.get("/{rental_id}", response_model=RentalExpanded, response_model_exclude_unset=True)
 async def get_rental_by_id(
     rental_id: int, 
+    expand: Tuple[str, ...] = Depends(rental_expand),
     rental_repo: RentalRepository = Depends(get_rental_repo)
 ):
+    if expand:
+        expanded = await rental_repo.get_by_id_expanded(rental_id, expand)
+        if expanded is None:
+            raise HTTPException(status_code=404, detail="Rental not found")
+        return json_model_response(expanded, exclude_unset=True)
     db_rental = await rental_repo.get_by_id(rental_id)
     if db_rental is None:
         raise HTTPException(status_code=404, detail="Rental not found")
     return db_rental
 
 
-@router.put("/{rental_id}", response_model=RentalInDB)
+@router.put(
+    "/{rental_id}", response_model=RentalInDB,
+    responses={409: {"description": "Vehicle already booked or out of service, or `expected_version` no longer matches"}},
+)
 async def update_rental(
     rental_id: int, 
     rental_update: RentalUpdate, 
+    expected_version: Optional[int] = Query(
+        None, ge=1, description="Only update if the row still has this `version` (409 otherwise)."
+    ),
     rental_repo: RentalRepository = Depends(get_rental_repo)
 ):
-    updated_rental = await rental_repo.update(rental_id, rental_update)
+    try:
+        updated_rental = await rental_repo.update(rental_id, rental_update, expected_version)
+    except BookingError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
     if updated_rental is None:
         raise HTTPException(status_code=404, detail="Rental not found")
     return updated_rental
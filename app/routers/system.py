@@ -0,0 +1,87 @@
+import time
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from ..core.metrics import render_prometheus
+from ..core.profiling import ProfiledRoute
+
+router = APIRouter(tags=["system"], route_class=ProfiledRoute)
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(request: Request):
+    """
+    Retorna os contadores de hit/miss do cache de entidades e do cache de respostas.
+    """
+    cache = request.app.state.cache
+    stats = cache.stats() if cache is not None else {"backend": None, "namespaces": {}}
+    responses = request.app.state.response_cache
+    stats["responses"] = responses.stats() if responses is not None else None
+    return stats
+
+
+@router.get("/health/db")
+async def get_db_health(request: Request):
+    """
+    Executa um SELECT 1 e retorna a latência junto com as métricas do pool.
+    Responde 503 quando o banco de dados não pode ser alcançado.
+    """
+    pool = request.app.state.db_pool
+    started = time.perf_counter()
+    try:
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT 1;")
+                await cursor.fetchone()
+    except Exception as exc:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "unavailable",
+                "error": str(exc),
+                "pool": pool.stats(),
+                "job_pool": request.app.state.job_pool.stats(),
+                "replicas": request.app.state.replicas.stats(),
+            },
+        )
+    return {
+        "status": "ok",
+        "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+        "pool": pool.stats(),
+        "job_pool": request.app.state.job_pool.stats(),
+        "replicas": request.app.state.replicas.stats(),
+    }
+
+
+@router.get("/health/ready")
+async def get_readiness(request: Request):
+    """
+    Prontidão do worker para o balanceador: 200 só depois que os pools estão
+    aquecidos e as projeções carregadas, 503 durante a inicialização e o drain.
+    """
+    lifecycle = request.app.state.lifecycle
+    if not lifecycle.ready:
+        return JSONResponse(
+            status_code=503, content={"status": lifecycle.state, "in_flight": lifecycle.in_flight}
+        )
+    return {
+        "status": lifecycle.state,
+        "in_flight": lifecycle.in_flight,
+        "pool": request.app.state.db_pool.stats(),
+        "replicas": request.app.state.replicas.stats(),
+    }
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(request: Request):
+    """
+    Métricas no formato de exposição do Prometheus: latência por rota e por
+    instrução SQL, estado dos pools de conexão e contadores do cache.
+    """
+    state = request.app.state
+    return PlainTextResponse(
+        render_prometheus(
+            state.metrics, pools=[state.db_pool, state.job_pool, *state.replicas.pools],
+            cache=state.cache, events=state.events, admission=state.admission,
+        ),
+        media_type="text/plain; version=0.0.4",
+    )
@@ -1,37 +1,119 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from ..schemas.user import UserCreate, UserInDB, UserUpdate
-from ..dependencies.dependencies import get_user_repo
-from typing import List
+from fastapi import APIRouter, Body, HTTPException, Query, Request, status, Depends
+from ..schemas.user import UserCreate, UserInDB, UserSearchResult, UserUpdate
+from ..dependencies.dependencies import get_user_repo, PageParams
+from ..core.streaming import ndjson_response
+from ..core.serialization import json_list_response, json_model_response
+from ..core.conditional import conditional_response
+from ..core.bulk import MAX_BULK_ROWS, validate_rows, validate_update_rows
+from ..schemas.bulk import BulkDelete, BulkResult
+from typing import Any, Dict, List, Optional
 from ..repositories.user_repository import UserRepository
+from ..core.profiling import ProfiledRoute
 
 
 router = APIRouter(
     prefix="/users",
     tags=["users"],
     responses={404: {"description": "User not found"}},
+    route_class=ProfiledRoute,
 )
 
 
 @router.get("/", response_model=List[UserInDB])
-async def get_all_users(user_repo: UserRepository = Depends(get_user_repo)):
-    return await user_repo.get_all()
+async def get_all_users(request: Request, page: PageParams = Depends(), user_repo: UserRepository = Depends(get_user_repo)):
+    if page.stream and page.ids is None:
+        return ndjson_response(user_repo.stream_all(after_id=page.after_id))
+
+    async def build():
+        if page.ids is not None:
+            return json_list_response(UserInDB, await user_repo.get_many(page.ids))
+        return json_list_response(UserInDB, await user_repo.get_all(after_id=page.after_id, limit=page.limit))
+
+    return await conditional_response(request, (UserRepository.table,), build)
+
+
+@router.get("/search", response_model=List[UserSearchResult])
+async def search_users(
+    q: str = Query(
+        ..., min_length=2, max_length=100,
+        description="Part of the name, last name, e-mail or CPF (with or without punctuation).",
+    ),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of users returned."),
+    user_repo: UserRepository = Depends(get_user_repo),
+):
+    """
+    Busca de clientes no balcão. Os resultados são ordenados por `score`, a
+    fração dos trigramas da busca que o usuário contém, então pequenos erros
+    de digitação ainda encontram o cliente; a última palavra de `q` também
+    vale como prefixo.
+    """
+    return json_list_response(UserSearchResult, await user_repo.search(q, limit))
 
 
 @router.post("/", response_model=UserInDB, status_code=status.HTTP_201_CREATED)
 async def create_user(user: UserCreate, user_repo: UserRepository = Depends(get_user_repo)):
     return await user_repo.create(user)
 
+@router.post("/bulk", response_model=BulkResult)
+async def create_users_bulk(
+    rows: List[Dict[str, Any]] = Body(..., max_length=MAX_BULK_ROWS),
+    user_repo: UserRepository = Depends(get_user_repo)
+):
+    """
+    Cria até 1000 usuários numa única transação. Linhas inválidas são informadas em `errors`.
+    """
+    valid, errors = validate_rows(UserCreate, rows)
+    result = await user_repo.create_many(valid)
+    result.errors = sorted(errors + result.errors, key=lambda error: error.index)
+    return result
+
+
+@router.put("/bulk", response_model=BulkResult)
+async def update_users_bulk(
+    rows: List[Dict[str, Any]] = Body(..., max_length=MAX_BULK_ROWS),
+    user_repo: UserRepository = Depends(get_user_repo)
+):
+    """
+    Aplica atualizações parciais; cada linha traz o `id` e os campos a alterar.
+    """
+    valid, errors = validate_update_rows(UserUpdate, rows)
+    result = await user_repo.update_many(valid)
+    result.errors = sorted(errors + result.errors, key=lambda error: error.index)
+    return result
+
+
+@router.post("/bulk/delete", response_model=BulkResult)
+async def delete_users_bulk(
+    payload: BulkDelete,
+    user_repo: UserRepository = Depends(get_user_repo)
+):
+    return await user_repo.delete_many(payload.ids)
+
+
 @router.get("/{user_id}", response_model=UserInDB, status_code=status.HTTP_200_OK)
-async def get_user_by_id(user_id: int, user_repo: UserRepository = Depends(get_user_repo)):
-    user = await user_repo.get_by_id(user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+async def get_user_by_id(user_id: int, request: Request, user_repo: UserRepository = Depends(get_user_repo)):
+    async def build():
+        user = await user_repo.get_by_id(user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return json_model_response(user)
+
+    return await conditional_response(request, (UserRepository.table,), build)
 
 
-@router.put("/{user_id}", response_model=UserInDB, status_code=status.HTTP_200_OK)
-async def update_user(user_id: int, user_update: UserUpdate, user_repo: UserRepository = Depends(get_user_repo)):
-    updated_user = await user_repo.update(user_id, user_update)
+@router.put(
+    "/{user_id}", response_model=UserInDB, status_code=status.HTTP_200_OK,
+    responses={409: {"description": "`expected_version` no longer matches the row"}},
+)
+async def update_user(
+    user_id: int,
+    user_update: UserUpdate,
+    expected_version: Optional[int] = Query(
+        None, ge=1, description="Only update if the row still has this `version` (409 otherwise)."
+    ),
+    user_repo: UserRepository = Depends(get_user_repo),
+):
+    updated_user = await user_repo.update(user_id, user_update, expected_version)
     if not updated_user:
         raise HTTPException(status_code=404, detail="User not found")
     return updated_user
@@ -1,22 +1,121 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
+from fastapi import APIRouter, Body, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status, Depends
+from fastapi.responses import StreamingResponse
+from datetime import date
+from typing import Any, Dict, List, Literal, Optional
 from ..schemas.vehicles import VehicleCreate, VehicleUpdate, VehicleInDB
-from ..dependencies.dependencies import get_vehicle_repo 
+from ..dependencies.dependencies import get_vehicle_repo, get_rental_repo, PageParams
+from ..core.streaming import ndjson_response
+from ..core.serialization import json_list_response, json_model_response
+from ..core.conditional import conditional_response
+from ..core.bulk import MAX_BULK_ROWS, validate_rows, validate_update_rows
+from ..schemas.bulk import BulkDelete, BulkResult
 from ..repositories.vehicle_repository import VehicleRepository
+from ..repositories.rental_repository import RentalRepository
+from ..core.events import TooManySubscribersError
+from ..core.profiling import ProfiledRoute
 
 router = APIRouter(
     prefix="/vehicles",
     tags=["vehicles"],
     responses={404: {"description": "Vehicle not found"}},
+    route_class=ProfiledRoute,
 )
 
 
 @router.get("/", response_model=List[VehicleInDB])
-async def get_all_vehicles(vehicle_repo: VehicleRepository = Depends(get_vehicle_repo)):
+async def get_all_vehicles(
+    request: Request, page: PageParams = Depends(), vehicle_repo: VehicleRepository = Depends(get_vehicle_repo)
+):
     """
-    Retorna uma lista de todos os veículos cadastrados.
+    Retorna uma página de veículos cadastrados, os veículos de `ids`, ou todos eles em NDJSON com `stream=true`.
+    As páginas levam um ETag: reenviado em If-None-Match, rende um 304 enquanto nenhum veículo mudar.
     """
-    return await vehicle_repo.get_all()
+    if page.stream and page.ids is None:
+        return ndjson_response(vehicle_repo.stream_all(after_id=page.after_id))
+
+    async def build():
+        if page.ids is not None:
+            return json_list_response(VehicleInDB, await vehicle_repo.get_many(page.ids))
+        return json_list_response(VehicleInDB, await vehicle_repo.get_all(after_id=page.after_id, limit=page.limit))
+
+    return await conditional_response(request, (VehicleRepository.table,), build)
+
+
+@router.websocket("/stream")
+async def vehicle_events_websocket(websocket: WebSocket):
+    """
+    Feed de disponibilidade: cada escrita de veículo e mudança de reserva,
+    enviada como frame de texto JSON `{"seq", "type", "data"}`. Os tipos são
+    vehicle.created, vehicle.updated, vehicle.deleted (escritas em lote levam
+    `{"ids": [...]}`), booking.created, booking.updated, booking.deleted e
+    `resync`, enviado quando o cliente ficou para trás ou linhas mudaram em
+    cascata: recarregue então GET /vehicles/. O primeiro frame é `hello` com o
+    `seq` atual; `shutdown` é o último antes de o worker reiniciar.
+    """
+    try:
+        subscription = websocket.app.state.events.subscribe()
+    except TooManySubscribersError as exc:
+        await websocket.close(code=1013, reason=str(exc))
+        return
+    try:
+        await websocket.accept()
+        await websocket.send_text(f'{{"seq":{subscription.hub.seq},"type":"hello","data":null}}')
+        while True:
+            event = await subscription.next()
+            if event is None:
+                await websocket.send_text('{"type":"ping"}')
+                continue
+            await websocket.send_text(event.json)
+            if event.type == "shutdown":
+                # 1012: reinício do serviço; o cliente reconecta em outro worker.
+                await websocket.close(code=1012)
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscription.close()
+
+
+@router.get(
+    "/stream",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"text/event-stream": {}}, "description": "Server-sent events"},
+        503: {"description": "Too many clients connected"},
+    },
+)
+async def vehicle_events_sse(request: Request):
+    """
+    O mesmo feed do WebSocket `/vehicles/stream`, como server-sent events,
+    para clientes ou proxies sem suporte a WebSocket. Cada evento tem
+    `id: <seq>` e `event: <type>`.
+    """
+    hub = request.app.state.events
+    # O 503 só pode sair antes da resposta; a inscrição é feita quando o corpo começa a ser enviado.
+    hub.ensure_capacity()
+
+    async def frames():
+        try:
+            subscription = hub.subscribe()
+        except TooManySubscribersError:
+            # Lotou entre a verificação e o início do corpo: o EventSource do cliente reconecta.
+            return
+        try:
+            yield f"id: {hub.seq}\nevent: hello\ndata: null\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.next()
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield event.sse
+                if event.type == "shutdown":
+                    break
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        frames(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.post("/", response_model=VehicleInDB, status_code=status.HTTP_201_CREATED)
@@ -24,24 +123,98 @@ async def create_vehicle(vehicle: VehicleCreate, vehicle_repo: VehicleRepository
    return await vehicle_repo.create(vehicle)
 
 
+@router.post("/bulk", response_model=BulkResult)
+async def create_vehicles_bulk(
+    rows: List[Dict[str, Any]] = Body(..., max_length=MAX_BULK_ROWS),
+    vehicle_repo: VehicleRepository = Depends(get_vehicle_repo)
+):
+    """
+    Cria até 1000 veículos numa única transação. Linhas inválidas são informadas em `errors`.
+    """
+    valid, errors = validate_rows(VehicleCreate, rows)
+    result = await vehicle_repo.create_many(valid)
+    result.errors = sorted(errors + result.errors, key=lambda error: error.index)
+    return result
+
+
+@router.put("/bulk", response_model=BulkResult)
+async def update_vehicles_bulk(
+    rows: List[Dict[str, Any]] = Body(..., max_length=MAX_BULK_ROWS),
+    vehicle_repo: VehicleRepository = Depends(get_vehicle_repo)
+):
+    """
+    Aplica atualizações parciais; cada linha traz o `id` e os campos a alterar.
+    """
+    valid, errors = validate_update_rows(VehicleUpdate, rows)
+    result = await vehicle_repo.update_many(valid)
+    result.errors = sorted(errors + result.errors, key=lambda error: error.index)
+    return result
+
+
+@router.post("/bulk/delete", response_model=BulkResult)
+async def delete_vehicles_bulk(
+    payload: BulkDelete,
+    vehicle_repo: VehicleRepository = Depends(get_vehicle_repo)
+):
+    return await vehicle_repo.delete_many(payload.ids)
+
+
+@router.get("/availability", response_model=List[VehicleInDB])
+async def get_available_vehicles(
+    request: Request,
+    start: date = Query(..., alias="from", description="First day of the rental."),
+    end: date = Query(..., alias="to", description="Return day (the vehicle is free again on this day)."),
+    vehicle_type: Optional[Literal['car', 'motorcycle']] = None,
+    vehicle_repo: VehicleRepository = Depends(get_vehicle_repo),
+    rental_repo: RentalRepository = Depends(get_rental_repo),
+):
+    """
+    Retorna os veículos disponíveis que não têm nenhuma locação no período informado.
+    """
+    if end <= start:
+        raise HTTPException(status_code=422, detail="'to' must be after 'from'")
+
+    async def build():
+        vehicles = await vehicle_repo.get_bookable(vehicle_type)
+        booked = await rental_repo.get_booked_vehicle_ids(start, end)
+        return json_list_response(VehicleInDB, [vehicle for vehicle in vehicles if vehicle.id not in booked])
+
+    return await conditional_response(request, (VehicleRepository.table, RentalRepository.table), build)
+
+
 @router.get("/{vehicle_id}", response_model=VehicleInDB, status_code=status.HTTP_200_OK)
-async def get_vehicle_by_id(vehicle_id: int, vehicle_repo: VehicleRepository = Depends(get_vehicle_repo)):
+async def get_vehicle_by_id(
+    vehicle_id: int, request: Request, vehicle_repo: VehicleRepository = Depends(get_vehicle_repo)
+):
     """
     Retorna os detalhes de um veículo específico pelo seu ID.
     """
-    vehicle = await vehicle_repo.get_by_id(vehicle_id) 
-    if not vehicle:
-        raise HTTPException(status_code=404, detail="Vehicle not found")
-    return vehicle
+    async def build():
+        vehicle = await vehicle_repo.get_by_id(vehicle_id) 
+        if not vehicle:
+            raise HTTPException(status_code=404, detail="Vehicle not found")
+        return json_model_response(vehicle)
 
+    return await conditional_response(request, (VehicleRepository.table,), build)
 
-@router.put("/{vehicle_id}", response_model=VehicleInDB, status_code=status.HTTP_200_OK)
-async def update_vehicle(vehicle_id: int, vehicle_update: VehicleUpdate, vehicle_repo: VehicleRepository = Depends(get_vehicle_repo)):
+
+@router.put(
+    "/{vehicle_id}", response_model=VehicleInDB, status_code=status.HTTP_200_OK,
+    responses={409: {"description": "`expected_version` no longer matches the row"}},
+)
+async def update_vehicle(
+    vehicle_id: int,
+    vehicle_update: VehicleUpdate,
+    expected_version: Optional[int] = Query(
+        None, ge=1, description="Only update if the row still has this `version` (409 otherwise)."
+    ),
+    vehicle_repo: VehicleRepository = Depends(get_vehicle_repo),
+):
     """
     Atualiza os dados de um veículo existente.
     """
-    updated_vehicle = await vehicle_repo.update(vehicle_id, vehicle_update)
-    if not update_vehicle:
+    updated_vehicle = await vehicle_repo.update(vehicle_id, vehicle_update, expected_version)
+    if updated_vehicle is None:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     return updated_vehicle
 
@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field
+from typing import Any, List
+
+
+class BulkRowError(BaseModel):
+    """Error of a specific row of a bulk operation."""
+    index: int = Field(..., ge=0, description="Position of the row in the request body.")
+    detail: Any
+
+
+class BulkResult(BaseModel):
+    """
+    Result of a bulk operation. `ids` lists the affected ids in request order,
+    skipping the rows reported in `errors`.
+    """
+    ids: List[int]
+    errors: List[BulkRowError] = []
+
+
+class BulkDelete(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
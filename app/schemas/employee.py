@@ -1,11 +1,12 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel
 from typing import Optional
+from .fields import Email
 
 class EmployeeBase(BaseModel): 
     name: str
     last_name: str
     cpf: Optional[str] = None
-    email: EmailStr
+    email: Email
     role: str
 
 class CreateEmployee(EmployeeBase):
@@ -15,8 +16,9 @@ class UpdateEmployee(BaseModel):
     name: Optional[str] = None
     last_name: Optional[str] = None
     cpf: Optional[str] = None
-    email: Optional[EmailStr] = None
+    email: Optional[Email] = None
     role: Optional[str] = None
 
 class EmployeeInDB(EmployeeBase):
     id: int
+    version: int = 1  # bumped by every update; see `expected_version` on PUT
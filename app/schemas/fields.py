@@ -0,0 +1,18 @@
+from typing import Annotated
+
+from pydantic import AfterValidator, ValidationInfo, WithJsonSchema
+from pydantic.networks import validate_email
+
+# Chave do contexto de validação que marca linhas lidas das nossas tabelas (ver build_models).
+STORED_ROWS = "stored_rows"
+
+
+def _check_email(value: str, info: ValidationInfo) -> str:
+    # Um e-mail gravado já foi validado na escrita; o email-validator roda em Python e custa mais que o resto da linha.
+    if info.context and info.context.get(STORED_ROWS):
+        return value
+    return validate_email(value)[1]
+
+
+# Igual a EmailStr, mas sem revalidar o endereço nas linhas lidas do banco.
+Email = Annotated[str, AfterValidator(_check_email), WithJsonSchema({"type": "string", "format": "email"})]
@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Any, Dict, Literal, Optional
+from pydantic import BaseModel, Field, computed_field
+
+
+class JobInDB(BaseModel):
+    """Job em segundo plano (relatório ou exportação) como está na tabela `job`."""
+    id: int
+    kind: str = Field(..., examples=["export.rentals"])
+    params: Dict[str, Any] = {}
+    status: Literal['queued', 'running', 'done', 'failed']
+    attempts: int = 0
+    result_rows: Optional[int] = Field(None, description="Rows written to the result file.")
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # Nome do arquivo no diretório de resultados; não faz parte da API.
+    result_file: Optional[str] = Field(None, exclude=True)
+
+    @computed_field
+    @property
+    def result_url(self) -> Optional[str]:
+        return f"/jobs/{self.id}/result" if self.status == 'done' else None
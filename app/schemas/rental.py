@@ -1,6 +1,10 @@
 from pydantic import BaseModel, Field, model_validator
-from typing import Optional, List
+from typing import Literal, Optional, List
 from datetime import date
+from .user import UserInDB
+from .vehicles import VehicleInDB
+from .employee import EmployeeInDB
+from .bulk import BulkRowError
 
 class RentalBase(BaseModel):
     """Base model with common fields for a rental."""
@@ -44,6 +48,18 @@ class RentalUpdate(BaseModel):
 class RentalInDB(RentalBase):
     """Model representing a rental as it exists in the database."""
     id: int
+    version: int = 1  # bumped by every update; see `expected_version` on PUT
+    rent_date: date
+    # The foreign keys are nullable in the table (rows written outside the API may lack them).
+    id_user: Optional[int] = None
+    id_vehicle: Optional[int] = None
+    id_employee: Optional[int] = None
+
+class RentalExpanded(RentalInDB):
+    """Rental with the related entities requested in `?expand=` nested in it."""
+    user: Optional[UserInDB] = None
+    vehicle: Optional[VehicleInDB] = None
+    employee: Optional[EmployeeInDB] = None
 
 class VehicleRentalCount(BaseModel):
     """Model to represent the count of rentals for a specific vehicle."""
@@ -54,4 +70,77 @@ class VehicleRentalCount(BaseModel):
     
 class RentalReport(BaseModel):
     total_revenue: int = Field(..., ge=0, description="Total revenue from rentals in cents.")
-    most_rented_vehicle: list[VehicleRentalCount]
\ No newline at end of file
+    most_rented_vehicle: list[VehicleRentalCount]
+
+
+class TypeUtilization(BaseModel):
+    """Fleet utilization per vehicle type over a period."""
+    vehicle_type: str
+    rented_days: int = Field(..., ge=0)
+    available_days: int = Field(..., ge=0)
+    utilization: float = Field(..., ge=0, description="rented_days / available_days")
+
+
+class VehicleUtilization(BaseModel):
+    """Utilization of one vehicle over the whole queried range."""
+    id_vehicle: int
+    vehicle_type: str
+    rented_days: int = Field(..., ge=0)
+    available_days: int = Field(..., ge=0)
+    utilization: float = Field(..., ge=0)
+
+
+class RentalTimeBucket(BaseModel):
+    start: date
+    end: date = Field(..., description="First day after the bucket.")
+    revenue: int = Field(..., description="Revenue of the rentals picked up in the bucket.")
+    rental_count: int = Field(..., ge=0)
+    rented_days: int = Field(..., ge=0)
+    available_days: int = Field(..., ge=0)
+    utilization: float = Field(..., ge=0)
+    by_vehicle_type: List[TypeUtilization]
+
+
+class RentalTimeSeries(BaseModel):
+    granularity: Literal['day', 'week', 'month']
+    start: date
+    end: date = Field(..., description="First day after the last bucket.")
+    buckets: List[RentalTimeBucket]
+    vehicles: List[VehicleUtilization]
+
+
+
+class RentalPage(BaseModel):
+    """One page of the GET /rental/search result."""
+    items: List[RentalInDB]
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to get the next page; null on the last page.")
+
+
+class QuoteItem(BaseModel):
+    """A vehicle and period to quote."""
+    id_vehicle: int = Field(..., gt=0, examples=[2])
+    rent_date: date = Field(..., examples=["2025-08-01"])
+    return_date: date = Field(..., examples=["2025-08-10"])
+
+
+class QuoteRequest(BaseModel):
+    items: List[QuoteItem] = Field(..., min_length=1, max_length=1000)
+
+
+class Quote(BaseModel):
+    """Server-computed price for a vehicle and period."""
+    id_vehicle: int
+    rent_date: date
+    return_date: date
+    days: int
+    daily_charge: float
+    available: bool = Field(..., description="False when the vehicle is out of service.")
+    base_value: int = Field(..., description="Daily charges with the weekend and season multipliers, in cents.")
+    discount_rate: float = Field(..., description="Long-rental discount applied to base_value.")
+    rent_value: int = Field(..., description="Price to send as RentalCreate.rent_value, in cents.")
+
+
+class QuoteResult(BaseModel):
+    """Quotes in item order; the items that could not be quoted go in `errors`."""
+    quotes: List[Quote]
+    errors: List[BulkRowError] = []
@@ -1,13 +1,14 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel
 from datetime import date
 from typing import Optional
+from .fields import Email
 
 class UserBase(BaseModel):
     "Modelo base para os usuários. Contém os campos comuns."
     name: str
     last_name: str
     cpf: str
-    email: EmailStr
+    email: Email
     birth_at: date
 
 class UserCreate(UserBase):
@@ -19,9 +20,15 @@ class UserUpdate(BaseModel):
     name: Optional[str] = None
     last_name: Optional[str] = None
     cpf: Optional[str] = None
-    email: Optional[EmailStr] = None
+    email: Optional[Email] = None
     birth_at: Optional[date] = None
 
 class UserInDB(UserBase):
     "Modelo para representar um usuário no banco de dados."
-    id: int
\ No newline at end of file
+    id: int
+    version: int = 1  # incrementada a cada atualização; ver `expected_version` no PUT
+
+class UserSearchResult(UserInDB):
+    "Usuário encontrado por GET /users/search."
+    # Fração dos trigramas da busca presentes no usuário; None quando o banco respondeu (busca por prefixo).
+    score: Optional[float] = None
@@ -15,7 +15,7 @@ class VehicleBase(BaseModel):
     daily_charge: float = Field(..., gt=0, examples=[120.50])
 
 class VehicleCreate(VehicleBase):
-    "Modelo para criar novo veículo."
+    "Model to create a new vehicle."
     pass
 
 class VehicleUpdate(BaseModel):
@@ -36,4 +36,5 @@ class VehicleUpdate(BaseModel):
 class VehicleInDB(VehicleBase):
     """Model representing the vehicle as it exists in the database."""
     id: int
+    version: int = 1  # bumped by every update; see `expected_version` on PUT
     registration_date: datetime
\ No newline at end of file
@@ -9,7 +9,8 @@ CREATE TABLE IF NOT EXISTS vehicle (
   mileage INT NOT NULL DEFAULT 0, 
   available BOOLEAN NOT NULL DEFAULT TRUE,
   daily_charge DECIMAL(10,2),
-  registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+  registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  version INT UNSIGNED NOT NULL DEFAULT 1
   ) ENGINE=InnoDB DEFAULT CHARSET=latin1
 
 CREATE TABLE IF NOT EXISTS user (
@@ -18,7 +19,8 @@ CREATE TABLE IF NOT EXISTS user (
   last_name VARCHAR(100) NOT NULL,
   cpf VARCHAR(11),
   email VARCHAR(100) UNIQUE NOT NULL,
-  birth_at DATE NOT NULL
+  birth_at DATE NOT NULL,
+  version INT UNSIGNED NOT NULL DEFAULT 1
   ) ENGINE=InnoDB DEFAULT CHARSET=latin1
 
 CREATE TABLE IF NOT EXISTS employee (
@@ -27,7 +29,8 @@ CREATE TABLE IF NOT EXISTS employee (
   last_name VARCHAR(100) NOT NULL,
   cpf VARCHAR(11),
   email VARCHAR(100) UNIQUE NOT NULL,
-  role VARCHAR(100)
+  role VARCHAR(100),
+  version INT UNSIGNED NOT NULL DEFAULT 1
   ) ENGINE=InnoDB DEFAULT CHARSET=latin1
 
 CREATE TABLE IF NOT EXISTS rental (
@@ -38,12 +41,43 @@ CREATE TABLE IF NOT EXISTS rental (
   id_user INT,
   id_vehicle INT,
   id_employee INT, 
+  -- Incremented by every UPDATE; PUT ?expected_version= compares against it.
+  version INT UNSIGNED NOT NULL DEFAULT 1,
   
+  -- Availability lookups: bookings of a vehicle overlapping a date range.
+  INDEX idx_rental_vehicle_dates (id_vehicle, rent_date, return_date),
+  -- Bookings still running after a given date (used to warm the in-process index).
+  INDEX idx_rental_return_date (return_date, rent_date),
+  -- GET /rental/search: equality filter first, then the default sort column.
+  -- InnoDB appends the primary key, so (rent_date, id) keyset pages stay index scans.
+  INDEX idx_rental_user_rent_date (id_user, rent_date),
+  INDEX idx_rental_employee_rent_date (id_employee, rent_date),
+  INDEX idx_rental_rent_date (rent_date),
+
   FOREIGN KEY (id_user) REFERENCES user(id) ON DELETE CASCADE,
   FOREIGN KEY (id_vehicle) REFERENCES vehicle(id) ON DELETE CASCADE,
   FOREIGN KEY (id_employee) REFERENCES employee(id) ON DELETE CASCADE
   ) ENGINE=InnoDB DEFAULT CHARSET=latin1
 
+-- Background jobs (reports, exports) run by the API workers; see /jobs.
+CREATE TABLE IF NOT EXISTS job (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  kind VARCHAR(50) NOT NULL,
+  params TEXT NOT NULL,
+  status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+  attempts INT NOT NULL DEFAULT 0,
+  result_file VARCHAR(255),
+  result_rows INT,
+  error TEXT,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  started_at TIMESTAMP NULL,
+  finished_at TIMESTAMP NULL,
+
+  -- Workers claim the oldest queued job; stale running jobs are found by start time.
+  INDEX idx_job_status (status, id),
+  INDEX idx_job_status_started (status, started_at)
+  ) ENGINE=InnoDB DEFAULT CHARSET=latin1
+
 -- Inserting sample data into the vehicle table
 INSERT INTO vehicle (brand, model, vehicle_type, year, license_plate, color, mileage, available, daily_charge) 
 VALUES ('Fiat', 'Strada Freedom', 'car', 2023, 'RGH1A23', 'Branco', 15000, TRUE, 120.50);
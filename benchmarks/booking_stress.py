@@ -0,0 +1,139 @@
+"""
+Concurrency stress test of the booking path: many clients book a handful of
+vehicles for overlapping dates at the same time, then the script checks the
+database for double-bookings.
+
+    python -m benchmarks.booking_stress --clients 64 --vehicles 3 --bookings 50
+    python -m benchmarks.booking_stress --blind     # plain INSERT, to see the double-bookings
+
+Runs against the MARIADB_* database through RentalRepository. The database must
+hold the vehicles (available) and at least one user and one employee, e.g. after
+benchmarks.seed. Bookings go in a window far in the future (--year) and are
+deleted at the end unless --keep is given. Exits with status 1 if any two
+rentals of the same vehicle overlap.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from datetime import date, timedelta
+from typing import Dict, List
+
+from app.core.booking import BookingError
+from app.core.metrics import MetricsRegistry
+from app.database.db import get_db_pool
+from app.database.pool import InstrumentedPool
+from app.repositories.base_repository import TransactionRetryError
+from app.repositories.rental_repository import RentalRepository
+from app.schemas.rental import RentalCreate
+
+from .common import print_table, summarize
+
+SETUP = "SELECT id FROM vehicle WHERE available = TRUE ORDER BY id LIMIT %s;"
+ANY_USER = "SELECT MIN(id) AS id FROM user;"
+ANY_EMPLOYEE = "SELECT MIN(id) AS id FROM employee;"
+OVERLAPS = """
+    SELECT COUNT(*) AS overlaps FROM rental a
+    JOIN rental b ON a.id_vehicle = b.id_vehicle AND a.id < b.id
+        AND a.rent_date < b.return_date AND a.return_date > b.rent_date
+    WHERE a.id_vehicle IN ({ids}) AND a.rent_date >= %s AND b.rent_date >= %s;
+"""
+CLEANUP = "DELETE FROM rental WHERE id_vehicle IN ({ids}) AND rent_date >= %s;"
+
+
+async def _query(pool: InstrumentedPool, sql: str, params: tuple = ()) -> List[dict]:
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql, params)
+            rows = await cursor.fetchall()
+            columns = [column[0] for column in cursor.description or ()]
+            return [dict(zip(columns, row)) for row in rows]
+
+
+async def _client(repo: RentalRepository, args, vehicles: List[int], user: int, employee: int,
+                  window: date, rng: random.Random, counts: Dict[str, int], latencies: List[float]):
+    for _ in range(args.bookings):
+        start = window + timedelta(days=rng.randrange(args.days))
+        rental = RentalCreate(
+            rent_date=start, return_date=start + timedelta(days=rng.randint(1, args.max_length)),
+            rent_value=10_000, id_user=user, id_vehicle=rng.choice(vehicles), id_employee=employee,
+        )
+        started = time.perf_counter()
+        try:
+            if args.blind:
+                params = tuple(getattr(rental, column) for column in repo.statements.columns)
+                await repo._execute_query(repo.statements.insert, params=params)
+            else:
+                await repo.create(rental)
+            counts["booked"] += 1
+        except BookingError:
+            counts["conflict"] += 1
+        except TransactionRetryError:
+            counts["gave_up"] += 1
+        latencies.append(time.perf_counter() - started)
+
+
+async def main_async(args) -> int:
+    pool = await get_db_pool()
+    try:
+        vehicles = [row["id"] for row in await _query(pool, SETUP, (args.vehicles,))]
+        user = (await _query(pool, ANY_USER))[0]["id"]
+        employee = (await _query(pool, ANY_EMPLOYEE))[0]["id"]
+        if not vehicles or user is None or employee is None:
+            print("Needs available vehicles, a user and an employee; run benchmarks.seed first.")
+            return 2
+        window = date(args.year, 1, 1)
+        ids = ", ".join(str(vehicle_id) for vehicle_id in vehicles)
+        await _query(pool, CLEANUP.format(ids=ids), (window,))
+
+        metrics = MetricsRegistry()
+        repo = RentalRepository(pool, metrics=metrics)
+        counts = {"booked": 0, "conflict": 0, "gave_up": 0}
+        latencies: List[float] = []
+        print(f"{args.clients} clients x {args.bookings} bookings on vehicles {vehicles} "
+              f"({'blind INSERT' if args.blind else 'locked booking'})...", flush=True)
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            _client(repo, args, vehicles, user, employee, window,
+                    random.Random(f"{args.seed}-{i}"), counts, latencies)
+            for i in range(args.clients)
+        ))
+        stats = summarize(latencies, time.perf_counter() - started)
+        overlaps = (await _query(pool, OVERLAPS.format(ids=ids), (window, window)))[0]["overlaps"]
+        if not args.keep:
+            await _query(pool, CLEANUP.format(ids=ids), (window,))
+    finally:
+        pool.close()
+        await pool.wait_closed()
+
+    print()
+    print_table(
+        ["booked", "409", "503", "deadlock retries", "lock wait retries", "p50 ms", "p99 ms", "bookings/s", "overlaps"],
+        [[counts["booked"], counts["conflict"], counts["gave_up"],
+          metrics.transaction_retries.get("deadlock", 0), metrics.transaction_retries.get("lock_wait_timeout", 0),
+          stats["p50_ms"], stats["p99_ms"], stats["ops_s"], overlaps]],
+    )
+    if overlaps:
+        print(f"\nFAIL: {overlaps} pairs of overlapping rentals")
+        return 1
+    print("\nOK: no double-bookings")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=64, help="concurrent booking clients")
+    parser.add_argument("--bookings", type=int, default=50, help="booking attempts per client")
+    parser.add_argument("--vehicles", type=int, default=3, help="how many vehicles the clients fight over")
+    parser.add_argument("--days", type=int, default=60, help="length of the booking window")
+    parser.add_argument("--max-length", type=int, default=5, help="longest booking, in days")
+    parser.add_argument("--year", type=int, default=2100, help="the booking window starts on Jan 1st of this year")
+    parser.add_argument("--blind", action="store_true", help="insert without locking or conflict checks")
+    parser.add_argument("--keep", action="store_true", help="keep the rentals created by the run")
+    parser.add_argument("--seed", type=int, default=42)
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
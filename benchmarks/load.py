@@ -0,0 +1,261 @@
+"""
+Drives every router of a running API and reports latency, throughput and DB
+queries per endpoint.
+
+    uvicorn app.main:app --workers 4 &
+    python -m benchmarks.load --url http://localhost:8000 --concurrency 32 --duration 20
+
+Each scenario runs on its own for --duration seconds with --concurrency
+concurrent clients, after --warmup seconds whose results are discarded. Ids
+are drawn from 1..N using the same volumes as benchmarks.seed (pass the same
+--vehicles/--users/... values). Write scenarios only run with --writes. They
+create their own rows and the delete scenarios remove those rows again.
+
+DB query counts come from the Server-Timing header that the API returns for
+requests sent with `X-Profile: 1`. Use --json to save the results for
+comparison between runs.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from .common import print_table, summarize
+
+_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries')
+
+
+@dataclass
+class Context:
+    """Volumes of the seeded data plus ids created by write scenarios (for the deletes)."""
+    vehicles: int
+    users: int
+    employees: int
+    rentals: int
+    created: Dict[str, List[int]] = field(default_factory=dict)
+
+    def new_ids(self, kind: str) -> List[int]:
+        return self.created.setdefault(kind, [])
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: Callable[[random.Random, Context], Optional[str]]
+    body: Optional[Callable[[random.Random, Context], Any]] = None
+    write: bool = False
+    # Kind of entity whose id the response carries, to be removed later by a delete scenario.
+    creates: Optional[str] = None
+
+
+def _day(rng: random.Random, years_back: int = 5) -> date:
+    return date.today() - timedelta(days=rng.randrange(365 * years_back))
+
+
+def _person(rng: random.Random, kind: str) -> dict:
+    n = rng.randrange(10**12)
+    person = {"name": "Bench", "last_name": f"Load {n}", "cpf": f"{n % 10**11:011d}", "email": f"load{n}@bench.example.com"}
+    if kind == "user":
+        person["birth_at"] = "1990-01-01"
+    else:
+        person["role"] = "attendant"
+    return person
+
+
+def _vehicle(rng: random.Random) -> dict:
+    return {
+        "brand": "Bench", "model": "Load", "vehicle_type": "car", "year": 2024,
+        "license_plate": f"L{rng.randrange(10**9):09d}", "mileage": 0, "daily_charge": 100.0,
+    }
+
+
+def _rental(rng: random.Random, ctx: Context) -> dict:
+    # Far in the future so it never collides with the seeded calendar.
+    start = date.today() + timedelta(days=3650 + rng.randrange(3650))
+    return {
+        "rent_date": start.isoformat(), "return_date": (start + timedelta(days=3)).isoformat(),
+        "rent_value": 10_000, "id_user": rng.randint(1, ctx.users),
+        "id_vehicle": rng.randint(1, ctx.vehicles), "id_employee": rng.randint(1, ctx.employees),
+    }
+
+
+def _pop(kind: str) -> Callable[[random.Random, Context], Optional[str]]:
+    prefix = {"user": "/users", "vehicle": "/vehicles", "employee": "/employee", "rental": "/rental"}[kind]
+
+    def path(rng: random.Random, ctx: Context) -> Optional[str]:
+        ids = ctx.new_ids(kind)
+        return f"{prefix}/{ids.pop()}" if ids else None
+
+    return path
+
+
+def _availability(rng: random.Random, ctx: Context) -> str:
+    start = date.today() + timedelta(days=rng.randrange(60))
+    return f"/vehicles/availability?from={start}&to={start + timedelta(days=rng.randint(1, 14))}"
+
+
+def _timeseries(rng: random.Random, ctx: Context) -> str:
+    start = _day(rng)
+    return f"/rental/reports/timeseries?granularity=month&from={start}&to={start + timedelta(days=365)}"
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario("users.list", "GET", lambda rng, ctx: f"/users/?after_id={rng.randint(0, ctx.users)}&limit=100"),
+    Scenario("users.get", "GET", lambda rng, ctx: f"/users/{rng.randint(1, ctx.users)}"),
+    Scenario("users.batch", "GET", lambda rng, ctx: "/users/?ids=" + ",".join(str(rng.randint(1, ctx.users)) for _ in range(50))),
+    Scenario("vehicles.list", "GET", lambda rng, ctx: f"/vehicles/?after_id={rng.randint(0, ctx.vehicles)}&limit=100"),
+    Scenario("vehicles.get", "GET", lambda rng, ctx: f"/vehicles/{rng.randint(1, ctx.vehicles)}"),
+    Scenario("vehicles.availability", "GET", _availability),
+    Scenario("employee.list", "GET", lambda rng, ctx: f"/employee/?after_id={rng.randint(0, ctx.employees)}&limit=100"),
+    Scenario("employee.get", "GET", lambda rng, ctx: f"/employee/{rng.randint(1, ctx.employees)}"),
+    Scenario("rental.list", "GET", lambda rng, ctx: f"/rental/?after_id={rng.randint(0, ctx.rentals)}&limit=100"),
+    Scenario("rental.get", "GET", lambda rng, ctx: f"/rental/{rng.randint(1, ctx.rentals)}"),
+    Scenario("rental.list_expanded", "GET",
+             lambda rng, ctx: f"/rental/?after_id={rng.randint(0, ctx.rentals)}&limit=100&expand=user,vehicle,employee"),
+    Scenario("rental.search", "GET",
+             lambda rng, ctx: f"/rental/search?id_user={rng.randint(1, ctx.users)}&rent_from={date.today().replace(month=1, day=1)}"),
+    Scenario("rental.summary", "GET", lambda rng, ctx: "/rental/reports/summary"),
+    Scenario("rental.timeseries", "GET", _timeseries),
+    Scenario("system.health", "GET", lambda rng, ctx: "/health/db"),
+    Scenario("system.cache_stats", "GET", lambda rng, ctx: "/cache/stats"),
+    Scenario("system.metrics", "GET", lambda rng, ctx: "/metrics"),
+
+    Scenario("users.create", "POST", lambda rng, ctx: "/users/", lambda rng, ctx: _person(rng, "user"),
+             write=True, creates="user"),
+    Scenario("users.update", "PUT", lambda rng, ctx: f"/users/{rng.randint(1, ctx.users)}",
+             lambda rng, ctx: {"name": f"Bench {rng.randrange(1000)}"}, write=True),
+    Scenario("users.bulk_create", "POST", lambda rng, ctx: "/users/bulk",
+             lambda rng, ctx: [_person(rng, "user") for _ in range(100)], write=True, creates="user"),
+    Scenario("vehicles.create", "POST", lambda rng, ctx: "/vehicles/", lambda rng, ctx: _vehicle(rng),
+             write=True, creates="vehicle"),
+    Scenario("vehicles.update", "PUT", lambda rng, ctx: f"/vehicles/{rng.randint(1, ctx.vehicles)}",
+             lambda rng, ctx: {"mileage": rng.randrange(300_000)}, write=True),
+    Scenario("employee.create", "POST", lambda rng, ctx: "/employee/", lambda rng, ctx: _person(rng, "employee"),
+             write=True, creates="employee"),
+    Scenario("employee.update", "PUT", lambda rng, ctx: f"/employee/{rng.randint(1, ctx.employees)}",
+             lambda rng, ctx: {"role": rng.choice(["attendant", "manager"])}, write=True),
+    Scenario("rental.create", "POST", lambda rng, ctx: "/rental/", _rental, write=True, creates="rental"),
+    Scenario("rental.update", "PUT", lambda rng, ctx: f"/rental/{rng.randint(1, ctx.rentals)}",
+             lambda rng, ctx: {"rent_value": rng.randint(5_000, 500_000)}, write=True),
+    # Deletes only remove what the create scenarios above inserted.
+    Scenario("rental.delete", "DELETE", _pop("rental"), write=True),
+    Scenario("users.delete", "DELETE", _pop("user"), write=True),
+    Scenario("vehicles.delete", "DELETE", _pop("vehicle"), write=True),
+    Scenario("employee.delete", "DELETE", _pop("employee"), write=True),
+]
+
+
+@dataclass
+class Result:
+    latencies: List[float] = field(default_factory=list)
+    queries: List[int] = field(default_factory=list)
+    errors: int = 0
+
+
+def _record_created(scenario: Scenario, ctx: Context, response: httpx.Response):
+    if scenario.creates is None or response.status_code >= 300:
+        return
+    payload = response.json()
+    ids = payload["ids"] if isinstance(payload, dict) and "ids" in payload else [payload["id"]]
+    ctx.new_ids(scenario.creates).extend(ids)
+
+
+async def _worker(client: httpx.AsyncClient, scenario: Scenario, ctx: Context, deadline: float,
+                  result: Optional[Result], rng: random.Random):
+    while time.perf_counter() < deadline:
+        path = scenario.path(rng, ctx)
+        if path is None:
+            return  # nothing left to delete
+        body = scenario.body(rng, ctx) if scenario.body is not None else None
+        started = time.perf_counter()
+        try:
+            response = await client.request(scenario.method, path, json=body, headers={"X-Profile": "1"})
+        except httpx.HTTPError:
+            if result is not None:
+                result.errors += 1
+            continue
+        elapsed = time.perf_counter() - started
+        _record_created(scenario, ctx, response)
+        if result is None:
+            continue
+        # 404s on random ids are expected after deletes; anything 5xx is an error.
+        if response.status_code >= 500:
+            result.errors += 1
+            continue
+        result.latencies.append(elapsed)
+        match = _QUERIES.search(response.headers.get("server-timing", ""))
+        if match:
+            result.queries.append(int(match.group(1)))
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, ctx: Context, args) -> Dict[str, Any]:
+    rngs = [random.Random(f"{args.seed}-{scenario.name}-{i}") for i in range(args.concurrency)]
+    if args.warmup > 0:
+        deadline = time.perf_counter() + args.warmup
+        await asyncio.gather(*(_worker(client, scenario, ctx, deadline, None, rng) for rng in rngs))
+    result = Result()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(_worker(client, scenario, ctx, deadline, result, rng) for rng in rngs))
+    stats = summarize(result.latencies, time.perf_counter() - started)
+    stats["errors"] = result.errors
+    stats["queries_per_request"] = sum(result.queries) / len(result.queries) if result.queries else None
+    return stats
+
+
+async def main_async(args):
+    ctx = Context(vehicles=args.vehicles, users=args.users, employees=args.employees, rentals=args.rentals)
+    selected = [
+        scenario for scenario in SCENARIOS
+        if (args.writes or not scenario.write)
+        and (not args.only or any(scenario.name.startswith(prefix) for prefix in args.only))
+    ]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results: Dict[str, Dict[str, Any]] = {}
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        for scenario in selected:
+            print(f"Running {scenario.name}...", flush=True)
+            results[scenario.name] = await run_scenario(client, scenario, ctx, args)
+
+    print()
+    print_table(
+        ["endpoint", "requests", "errors", "p50 ms", "p95 ms", "p99 ms", "req/s", "queries/req"],
+        [
+            [name, r["count"], r["errors"], r["p50_ms"], r["p95_ms"], r["p99_ms"], r["ops_s"],
+             "-" if r["queries_per_request"] is None else r["queries_per_request"]]
+            for name, r in results.items()
+        ],
+    )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2, default=str)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds per scenario, not measured")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--writes", action="store_true", help="also run the write scenarios")
+    parser.add_argument("--only", nargs="*", help="scenario name prefixes, e.g. users rental.get")
+    parser.add_argument("--vehicles", type=int, default=50_000)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--employees", type=int, default=500)
+    parser.add_argument("--rentals", type=int, default=10_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write the results to this file")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
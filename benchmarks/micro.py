@@ -0,0 +1,202 @@
+"""
+Microbenchmarks of the repository hot paths and of schema construction.
+
+    python -m benchmarks.micro            # in-memory connection: Python overhead only
+    python -m benchmarks.micro --db       # also against the MARIADB_* database (round trips)
+
+The in-memory connection answers every statement instantly with canned rows,
+so the _execute_query numbers isolate what the repository layer adds. That
+covers statement routing, pool checkout, metrics and row handling.
+"""
+import argparse
+import asyncio
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Awaitable, Callable, List
+
+from app.core.cache import EntityCache, LRUBackend
+from app.core.metrics import MetricsRegistry
+from app.core.serialization import build_models, list_adapter
+from app.database.pool import InstrumentedPool
+from app.repositories.rental_repository import RentalRepository
+from app.repositories.user_repository import UserRepository
+from app.schemas.rental import RentalInDB
+from app.schemas.user import UserInDB
+from app.schemas.vehicles import VehicleInDB
+
+from .common import print_table
+
+RENTAL = {
+    "id": 1, "rent_date": date(2025, 1, 1), "return_date": date(2025, 1, 5), "rent_value": 45_000,
+    "id_user": 10, "id_vehicle": 20, "id_employee": 3,
+}
+USER = {
+    "id": 1, "name": "Maria", "last_name": "Silva", "cpf": "12345678901",
+    "email": "maria@example.com", "birth_at": date(1990, 5, 15),
+}
+VEHICLE = {
+    "id": 1, "brand": "Fiat", "model": "Strada", "vehicle_type": "car", "year": 2023,
+    "license_plate": "RGH1A23", "color": "Branco", "mileage": 15000, "available": 1,
+    "daily_charge": Decimal("120.50"), "registration_date": datetime(2024, 1, 1),
+}
+
+
+class _MemoryCursor:
+    def __init__(self, rows: List[dict]):
+        self._rows = rows
+        self.rowcount = len(rows)
+        self.lastrowid = 1
+
+    async def execute(self, query, args=None):
+        return self.rowcount
+
+    async def fetchone(self):
+        return dict(self._rows[0]) if self._rows else None
+
+    async def fetchall(self):
+        return [dict(row) for row in self._rows]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _MemoryConnection:
+    def __init__(self, rows: List[dict]):
+        self._rows = rows
+
+    def cursor(self, *args):
+        return _MemoryCursor(self._rows)
+
+
+class _MemoryPool:
+    """The part of aiomysql.Pool that InstrumentedPool uses."""
+    minsize = maxsize = size = freesize = 1
+
+    def __init__(self, rows: List[dict]):
+        self._conn = _MemoryConnection(rows)
+
+    async def acquire(self):
+        return self._conn
+
+    def release(self, conn):
+        pass
+
+
+async def _timeit(func: Callable[[], Awaitable], iterations: int) -> float:
+    """Seconds per call, best of 3 rounds."""
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await func()
+        best = min(best, (time.perf_counter() - started) / iterations)
+    return best
+
+
+def _timeit_sync(func: Callable[[], object], iterations: int) -> float:
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        best = min(best, (time.perf_counter() - started) / iterations)
+    return best
+
+
+async def repository_benchmarks(pool_factory, iterations: int) -> List[tuple]:
+    page = [dict(RENTAL, id=i) for i in range(1, 101)]
+    single = await pool_factory([RENTAL])
+    paged = await pool_factory(page)
+    users = await pool_factory([USER])
+
+    plain = RentalRepository(single)
+    measured = RentalRepository(single, metrics=MetricsRegistry())
+    page_repo = RentalRepository(paged, metrics=MetricsRegistry())
+    cache = EntityCache(LRUBackend(maxsize=1000, ttl=3600))
+    cached_users = UserRepository(users, cache=cache)
+    await cached_users.get_by_id(1)
+
+    statement = RentalRepository.statements.select_by_id
+    return [
+        ("_execute_query (fetch one)", await _timeit(
+            lambda: plain._execute_query(statement, (1,), fetch='one'), iterations)),
+        ("_execute_query (fetch one, metrics)", await _timeit(
+            lambda: measured._execute_query(statement, (1,), fetch='one'), iterations)),
+        ("RentalRepository.get_by_id", await _timeit(lambda: measured.get_by_id(1), iterations)),
+        ("RentalRepository.get_all (100 rows)", await _timeit(lambda: page_repo.get_all(0, 100), iterations // 10)),
+        ("UserRepository.get_by_id (cache hit)", await _timeit(lambda: cached_users.get_by_id(1), iterations)),
+    ]
+
+
+def schema_benchmarks(iterations: int) -> List[tuple]:
+    rentals = [dict(RENTAL, id=i) for i in range(100)]
+    users = [dict(USER, id=i) for i in range(100)]
+    rental_models = build_models(RentalInDB, rentals)
+    adapter = list_adapter(RentalInDB)
+    model = RentalInDB(**RENTAL)
+    return [
+        ("RentalInDB(**row)", _timeit_sync(lambda: RentalInDB(**RENTAL), iterations)),
+        ("RentalInDB.model_validate(row)", _timeit_sync(lambda: RentalInDB.model_validate(RENTAL), iterations)),
+        ("VehicleInDB(**row)", _timeit_sync(lambda: VehicleInDB(**VEHICLE), iterations)),
+        ("UserInDB(**row)", _timeit_sync(lambda: UserInDB(**USER), iterations // 10)),
+        ("UserInDB.model_construct(**row)", _timeit_sync(lambda: UserInDB.model_construct(**USER), iterations)),
+        ("build_models(RentalInDB) per row", _timeit_sync(lambda: build_models(RentalInDB, rentals), iterations // 100) / 100),
+        ("build_models(UserInDB) per row", _timeit_sync(lambda: build_models(UserInDB, users), iterations // 100) / 100),
+        ("RentalInDB.model_dump_json()", _timeit_sync(model.model_dump_json, iterations)),
+        ("dump_json(List[RentalInDB]) per row", _timeit_sync(lambda: adapter.dump_json(rental_models), iterations // 100) / 100),
+    ]
+
+
+async def memory_pool(rows: List[dict]) -> InstrumentedPool:
+    return InstrumentedPool(_MemoryPool(rows), name="memory")
+
+
+async def database_benchmarks(iterations: int) -> List[tuple]:
+    from app.database.db import get_db_pool
+
+    pool = await get_db_pool()
+    try:
+        repo = RentalRepository(pool, metrics=MetricsRegistry())
+        first = await repo.get_all(0, 1)
+        rental_id = first[0].id if first else 1
+        return [
+            ("db: SELECT 1 round trip", await _timeit(lambda: _select_one(pool), iterations)),
+            ("db: RentalRepository.get_by_id", await _timeit(lambda: repo.get_by_id(rental_id), iterations)),
+            ("db: RentalRepository.get_all (100 rows)", await _timeit(lambda: repo.get_all(0, 100), iterations)),
+        ]
+    finally:
+        pool.close()
+        await pool.wait_closed()
+
+
+async def _select_one(pool: InstrumentedPool):
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute("SELECT 1;")
+            await cursor.fetchone()
+
+
+async def main_async(args):
+    rows = await repository_benchmarks(memory_pool, args.iterations)
+    rows += schema_benchmarks(args.iterations)
+    if args.db:
+        rows += await database_benchmarks(max(1, args.iterations // 100))
+    print_table(
+        ["benchmark", "µs/op", "ops/s"],
+        [[name, seconds * 1e6, int(1 / seconds) if seconds else 0] for name, seconds in rows],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20_000)
+    parser.add_argument("--db", action="store_true", help="also measure round trips to the configured database")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Seeds the database configured by the MARIADB_* variables (see compose.yml and
+bd.sql) with benchmark volumes. The schema must already exist.
+
+    python -m benchmarks.seed --vehicles 50000 --users 1000000 --rentals 10000000 --employees 500
+
+Data is deterministic for a given --seed, and each vehicle's rentals never
+overlap, so availability queries see a realistic calendar. Use --truncate to
+start from empty tables.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+from typing import Iterator, List, Sequence
+
+import aiomysql
+
+from app.database.db import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER
+
+BRANDS = {
+    "car": [("Fiat", "Strada"), ("Chevrolet", "Onix"), ("Hyundai", "HB20"), ("Volkswagen", "Polo"), ("Toyota", "Corolla")],
+    "motorcycle": [("Honda", "CG 160"), ("Yamaha", "Fazer 250"), ("BMW", "G 310 R")],
+}
+COLORS = ["Branco", "Prata", "Preto", "Vermelho", "Azul", "Cinza"]
+FIRST_NAMES = ["João", "Maria", "Pedro", "Ana", "Lucas", "Julia", "Marcos", "Beatriz", "Rafael", "Camila"]
+LAST_NAMES = ["Silva", "Oliveira", "Santos", "Souza", "Lima", "Pereira", "Costa", "Almeida"]
+ROLES = ["attendant", "manager", "mechanic"]
+# First rental day; rentals are laid out from here until a bit past today.
+CALENDAR_START = date(2015, 1, 1)
+
+
+def vehicles(count: int, rng: random.Random) -> Iterator[tuple]:
+    for i in range(1, count + 1):
+        vehicle_type = "car" if rng.random() < 0.8 else "motorcycle"
+        brand, model = rng.choice(BRANDS[vehicle_type])
+        yield (
+            brand, model, vehicle_type, rng.randint(2010, 2025), f"B{i:08d}", rng.choice(COLORS),
+            rng.randint(0, 250_000), rng.random() < 0.9, round(rng.uniform(50, 400), 2),
+        )
+
+
+def people(count: int, rng: random.Random, kind: str) -> Iterator[tuple]:
+    for i in range(1, count + 1):
+        row = (
+            rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), f"{rng.randrange(10**11):011d}",
+            f"{kind}{i}@bench.example.com",
+        )
+        if kind == "user":
+            yield row + (date(1950, 1, 1) + timedelta(days=rng.randrange(20_000)),)
+        else:
+            yield row + (rng.choice(ROLES),)
+
+
+def rentals(count: int, vehicle_count: int, user_count: int, employee_count: int, rng: random.Random) -> Iterator[tuple]:
+    """Round-robin over the fleet; each vehicle's next rental starts after its previous return."""
+    span = max(1, (date.today() + timedelta(days=60) - CALENDAR_START).days)
+    # Average gap so that each vehicle's rentals fill its share of the calendar.
+    per_vehicle = max(1, count // vehicle_count)
+    mean_gap = max(1, span // per_vehicle - 7)
+    next_free = [CALENDAR_START + timedelta(days=rng.randrange(mean_gap)) for _ in range(vehicle_count)]
+    for i in range(count):
+        vehicle = i % vehicle_count
+        rent_date = next_free[vehicle]
+        return_date = rent_date + timedelta(days=rng.randint(1, 14))
+        next_free[vehicle] = return_date + timedelta(days=rng.randint(0, 2 * mean_gap))
+        yield (
+            rent_date, return_date, rng.randint(5_000, 500_000),
+            rng.randint(1, user_count), vehicle + 1, rng.randint(1, employee_count),
+        )
+
+
+async def load(
+    conn: aiomysql.Connection, table: str, columns: Sequence[str], rows: Iterator[tuple],
+    total: int, batch_size: int,
+):
+    values = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    started, done = time.perf_counter(), 0
+    async with conn.cursor() as cursor:
+        batch: List[tuple] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                await _insert(cursor, table, columns, values, batch)
+                done += len(batch)
+                batch.clear()
+                if done % (batch_size * 20) == 0:
+                    rate = done / (time.perf_counter() - started)
+                    print(f"  {table}: {done:,}/{total:,} ({rate:,.0f} rows/s)", flush=True)
+        if batch:
+            await _insert(cursor, table, columns, values, batch)
+            done += len(batch)
+    await conn.commit()
+    print(f"  {table}: {done:,} rows in {time.perf_counter() - started:.1f}s")
+
+
+async def _insert(cursor, table: str, columns: Sequence[str], values: str, batch: List[tuple]):
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join([values] * len(batch))};"
+    await cursor.execute(query, tuple(value for row in batch for value in row))
+
+
+async def seed(args: argparse.Namespace):
+    rng = random.Random(args.seed)
+    conn = await aiomysql.connect(
+        host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASSWORD, db=DB_NAME, autocommit=False,
+    )
+    try:
+        async with conn.cursor() as cursor:
+            # Bulk-load settings for this session only.
+            await cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0;")
+            if args.truncate:
+                for table in ("rental", "vehicle", "user", "employee"):
+                    await cursor.execute(f"TRUNCATE TABLE {table};")
+        steps: List[tuple] = [
+            ("vehicle", ("brand", "model", "vehicle_type", "year", "license_plate", "color", "mileage",
+                         "available", "daily_charge"), args.vehicles, lambda: vehicles(args.vehicles, rng)),
+            ("user", ("name", "last_name", "cpf", "email", "birth_at"), args.users,
+             lambda: people(args.users, rng, "user")),
+            ("employee", ("name", "last_name", "cpf", "email", "role"), args.employees,
+             lambda: people(args.employees, rng, "employee")),
+            ("rental", ("rent_date", "return_date", "rent_value", "id_user", "id_vehicle", "id_employee"),
+             args.rentals, lambda: rentals(args.rentals, args.vehicles, args.users, args.employees, rng)),
+        ]
+        for table, columns, total, make_rows in steps:
+            print(f"Seeding {table}...")
+            await load(conn, table, columns, make_rows(), total, args.batch_size)
+        async with conn.cursor() as cursor:
+            await cursor.execute("ANALYZE TABLE vehicle, user, employee, rental;")
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vehicles", type=int, default=50_000)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--employees", type=int, default=500)
+    parser.add_argument("--rentals", type=int, default=10_000_000)
+    parser.add_argument("--batch-size", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--truncate", action="store_true", help="empty the tables first")
+    args = parser.parse_args()
+    if min(args.vehicles, args.users, args.employees) < 1:
+        parser.error("--vehicles, --users and --employees must be at least 1")
+    asyncio.run(seed(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+-- Indexes backing GET /vehicles/availability on databases created
+-- before they were added to bd.sql.
+CREATE INDEX IF NOT EXISTS idx_rental_vehicle_dates ON rental (id_vehicle, rent_date, return_date);
+CREATE INDEX IF NOT EXISTS idx_rental_return_date ON rental (return_date, rent_date);
@@ -0,0 +1,5 @@
+-- Indexes backing GET /rental/search on databases created before they were
+-- added to bd.sql. Lookups by vehicle reuse idx_rental_vehicle_dates (001).
+CREATE INDEX IF NOT EXISTS idx_rental_user_rent_date ON rental (id_user, rent_date);
+CREATE INDEX IF NOT EXISTS idx_rental_employee_rent_date ON rental (id_employee, rent_date);
+CREATE INDEX IF NOT EXISTS idx_rental_rent_date ON rental (rent_date);
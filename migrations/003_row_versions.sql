@@ -0,0 +1,6 @@
+-- Row versions for optimistic concurrency (PUT ?expected_version=) on
+-- databases created before the column was added to bd.sql.
+ALTER TABLE vehicle ADD COLUMN IF NOT EXISTS version INT UNSIGNED NOT NULL DEFAULT 1;
+ALTER TABLE user ADD COLUMN IF NOT EXISTS version INT UNSIGNED NOT NULL DEFAULT 1;
+ALTER TABLE employee ADD COLUMN IF NOT EXISTS version INT UNSIGNED NOT NULL DEFAULT 1;
+ALTER TABLE rental ADD COLUMN IF NOT EXISTS version INT UNSIGNED NOT NULL DEFAULT 1;
@@ -0,0 +1,16 @@
+-- Job table behind /jobs on databases created before it was added to bd.sql.
+CREATE TABLE IF NOT EXISTS job (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  kind VARCHAR(50) NOT NULL,
+  params TEXT NOT NULL,
+  status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+  attempts INT NOT NULL DEFAULT 0,
+  result_file VARCHAR(255),
+  result_rows INT,
+  error TEXT,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  started_at TIMESTAMP NULL,
+  finished_at TIMESTAMP NULL,
+  INDEX idx_job_status (status, id),
+  INDEX idx_job_status_started (status, started_at)
+  ) ENGINE=InnoDB DEFAULT CHARSET=latin1;
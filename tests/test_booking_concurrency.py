@@ -0,0 +1,235 @@
+"""
+Concurrent bookings of the same vehicle for overlapping dates: exactly one
+POST /rental/ gets 201, every other one gets 409.
+
+    python -m unittest discover tests
+
+By default the app runs against an in-memory database that emulates the
+parts of InnoDB the booking path relies on (FOR UPDATE row locks held until
+commit, locking reads). Every statement yields to the event loop, so the
+requests interleave the way they would over the network; booking without
+the vehicle lock lets several of them through. Set BOOKING_TEST_DATABASE=1
+to run the same test against the MARIADB_* database instead; it needs one
+available vehicle, one user and one employee (e.g. after benchmarks.seed)
+and deletes the rentals it creates.
+"""
+import asyncio
+import os
+import re
+import signal
+import unittest
+from datetime import date, timedelta
+
+import httpx
+
+import app.main as main
+from app.main import app
+
+CLIENTS = 20
+LIVE_DATABASE = os.getenv("BOOKING_TEST_DATABASE", "").lower() in ("1", "true", "yes")
+
+class FakeDatabase:
+    """In-memory vehicle and rental tables, with a row lock per vehicle."""
+
+    def __init__(self, vehicle_ids):
+        self.vehicles = {vehicle_id: True for vehicle_id in vehicle_ids}
+        self.rentals = {}
+        self.locks = {vehicle_id: asyncio.Lock() for vehicle_id in vehicle_ids}
+        self.next_id = 1
+
+    def overlapping(self, vehicle_id, start, end, exclude_id):
+        for rental_id, rental in self.rentals.items():
+            if (rental["id_vehicle"] == vehicle_id and rental_id != exclude_id
+                    and rental["rent_date"] < end and rental["return_date"] > start):
+                return rental_id
+        return None
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+        self.rowcount = 0
+        self.lastrowid = None
+
+    async def execute(self, sql, params=()):
+        # Every statement is a round trip to the server: the other requests run meanwhile.
+        await asyncio.sleep(0)
+        db, params = self.conn.db, tuple(params or ())
+        self.rows, self.lastrowid = [], None
+        if sql.lstrip().startswith("SELECT id, available FROM vehicle") and "FOR UPDATE" in sql:
+            for vehicle_id in sorted(set(params)):
+                if vehicle_id in db.locks and vehicle_id not in self.conn.held:
+                    await db.locks[vehicle_id].acquire()
+                    self.conn.held.add(vehicle_id)
+            self.rows = [dict(id=vid, available=db.vehicles[vid]) for vid in sorted(set(params)) if vid in db.vehicles]
+        elif sql.lstrip().startswith("SELECT id FROM rental") and "LOCK IN SHARE MODE" in sql:
+            vehicle_id, end, start, exclude_id = params
+            conflict = db.overlapping(vehicle_id, start, end, exclude_id)
+            self.rows = [dict(id=conflict)] if conflict is not None else []
+        elif sql.lstrip().startswith("INSERT INTO rental"):
+            rental_id, db.next_id = db.next_id, db.next_id + 1
+            columns = [column.strip() for column in re.search(r"\(([^)]*)\)", sql).group(1).split(",")]
+            db.rentals[rental_id] = dict(zip(columns, params), id=rental_id)
+            self.lastrowid = rental_id
+        self.rowcount = len(self.rows)
+        return self.rowcount
+
+    async def executemany(self, sql, seq):
+        for params in seq:
+            await self.execute(sql, params)
+
+    async def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    async def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    async def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    async def nextset(self):
+        return None
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    def __await__(self):
+        async def cursor():
+            return self
+        return cursor().__await__()
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+        self.held = set()
+
+    def cursor(self, *args):
+        return FakeCursor(self)
+
+    def _release_locks(self):
+        for vehicle_id in self.held:
+            self.db.locks[vehicle_id].release()
+        self.held.clear()
+
+    async def begin(self):
+        pass
+
+    async def commit(self):
+        self._release_locks()
+
+    async def rollback(self):
+        self._release_locks()
+
+    async def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self._release_locks()
+
+
+class FakePool:
+    """The subset of the aiomysql.Pool API that InstrumentedPool uses."""
+
+    minsize, maxsize, size, freesize = 0, CLIENTS, 0, 0
+
+    def __init__(self, db):
+        self.db = db
+
+    async def acquire(self):
+        return FakeConnection(self.db)
+
+    def release(self, conn):
+        pass
+
+    def close(self):
+        pass
+
+    def terminate(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+
+class OverlappingBookingsTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # The lifespan chains SIGTERM/SIGINT handlers; they are restored after the test.
+        self._signals = {signum: signal.getsignal(signum) for signum in (signal.SIGTERM, signal.SIGINT)}
+        self.db = None
+        if not LIVE_DATABASE:
+            from app.database.pool import InstrumentedPool
+            self.db = FakeDatabase([1])
+
+            async def fake_pool(*args, **kwargs):
+                return InstrumentedPool(FakePool(self.db), name=kwargs.get("name", "primary"))
+
+            self._patched = (main.get_db_pool, main.get_job_pool)
+            main.get_db_pool = main.get_job_pool = fake_pool
+
+    def tearDown(self):
+        if not LIVE_DATABASE:
+            main.get_db_pool, main.get_job_pool = self._patched
+        for signum, handler in self._signals.items():
+            signal.signal(signum, handler)
+
+    async def _booking_ids(self):
+        """(vehicle, user, employee) used for the booking."""
+        if self.db is not None:
+            return 1, 1, 1
+        ids = []
+        async with app.state.db_pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                for sql in (
+                    "SELECT MIN(id) FROM vehicle WHERE available = TRUE;",
+                    "SELECT MIN(id) FROM user;",
+                    "SELECT MIN(id) FROM employee;",
+                ):
+                    await cursor.execute(sql)
+                    (value,) = await cursor.fetchone()
+                    if value is None:
+                        self.skipTest("The database needs an available vehicle, a user and an employee")
+                    ids.append(value)
+        return tuple(ids)
+
+    async def test_overlapping_bookings_get_one_201_and_409s(self):
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                vehicle_id, user_id, employee_id = await self._booking_ids()
+                # Far-off dates, so as not to collide with real bookings; every request overlaps all the others.
+                start = date(2099, 1, 1) + timedelta(days=os.getpid() % 300)
+
+                async def book(offset):
+                    return await client.post("/rental/", json={
+                        "rent_date": (start + timedelta(days=offset % 2)).isoformat(),
+                        "return_date": (start + timedelta(days=3)).isoformat(),
+                        "rent_value": 10_000,
+                        "id_user": user_id,
+                        "id_vehicle": vehicle_id,
+                        "id_employee": employee_id,
+                    })
+
+                responses = await asyncio.gather(*(book(offset) for offset in range(CLIENTS)))
+                created = [response for response in responses if response.status_code == 201]
+                try:
+                    statuses = sorted(response.status_code for response in responses)
+                    self.assertEqual(statuses, [201] + [409] * (CLIENTS - 1))
+                    if self.db is not None:
+                        self.assertEqual(len(self.db.rentals), 1)
+                finally:
+                    for response in created:
+                        await client.delete(f"/rental/{response.json()['id']}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+"""
+Incremental exports (python -m app.export): the overlap window below the
+watermark picks up rentals whose id was allocated before the last export but
+that committed after it, without exporting any rental twice.
+
+    python -m unittest discover tests
+
+The database and the columnar writer are replaced by in-memory fakes, so
+pyarrow is not needed.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+
+import app.export as export
+from app.core.exports import PartitionedExport
+
+
+class FakeRentalRepository:
+    """Visible (committed) rentals, read in id order after `after_id`."""
+
+    visible = set()
+
+    def __init__(self, pool, replicas=None):
+        pass
+
+    async def stream_export(self, relations=(), after_id=0, chunk_size=10000):
+        for rental_id in sorted(self.visible):
+            if rental_id > after_id:
+                yield {"id": rental_id, "rent_date": date(2025, 1 + rental_id % 2, 1)}
+
+
+class FakePool:
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+
+async def fake_pool(*args, **kwargs):
+    return FakePool()
+
+
+class ExportWatermarkTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.exported = []
+        self._patched = {
+            name: getattr(export, name)
+            for name in ("RentalRepository", "get_db_pool", "get_replica_pools", "parquet_available", "write_partitioned")
+        }
+        FakeRentalRepository.visible = set()
+        export.RentalRepository = FakeRentalRepository
+        export.get_db_pool = export.get_replica_pools = fake_pool
+        export.parquet_available = lambda: True
+        export.write_partitioned = self.write_partitioned
+
+    def tearDown(self):
+        for name, value in self._patched.items():
+            setattr(export, name, value)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    async def write_partitioned(self, directory, format, columns, rows, partition, file_name, batch_size):
+        result = PartitionedExport()
+        files = set()
+        async for row in rows:
+            path = os.path.join(directory, partition(row), file_name)
+            self.assertFalse(os.path.exists(path) and path not in files, f"{path} would be overwritten")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, "a").close()
+            files.add(path)
+            self.exported.append(row["id"])
+            result.rows += 1
+        result.files = sorted(files)
+        return result
+
+    async def run_export(self, **options):
+        args = dict(
+            directory=self.directory, format="parquet", relations=(), since_id=None,
+            full=False, chunk_size=100, overlap=5,
+        )
+        args.update(options)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(await export.main_async(argparse.Namespace(**args)), 0)
+
+    def watermark(self):
+        with open(os.path.join(self.directory, export.WATERMARK_FILE), encoding="utf-8") as file:
+            return json.load(file)
+
+    async def test_late_commit_inside_the_window_is_exported_once(self):
+        FakeRentalRepository.visible = set(range(1, 11)) - {7}
+        await self.run_export()
+        FakeRentalRepository.visible.add(7)
+        await self.run_export()
+        await self.run_export()
+        FakeRentalRepository.visible.update({11, 12})
+        await self.run_export()
+
+        self.assertEqual(sorted(self.exported), list(range(1, 13)))
+        self.assertEqual(self.exported[-3:], [7, 11, 12])
+        watermark = self.watermark()
+        self.assertEqual(watermark["last_id"], 12)
+        self.assertEqual(watermark["recent_ids"], list(range(watermark["last_id"] - watermark["overlap"] + 1, 13)))
+
+    async def test_window_never_reaches_below_what_the_watermark_knows(self):
+        FakeRentalRepository.visible = set(range(1, 11))
+        await self.run_export(overlap=3)
+        FakeRentalRepository.visible.add(11)
+        # A larger window in this run does not export again the ids the previous one did not record.
+        await self.run_export(overlap=1000)
+        self.assertEqual(sorted(self.exported), list(range(1, 12)))
+        self.assertEqual(self.watermark()["overlap"], 4)
+
+    async def test_late_rows_alone_get_a_file_of_their_own(self):
+        FakeRentalRepository.visible = {1, 2, 5, 6}
+        await self.run_export()
+        FakeRentalRepository.visible.add(3)
+        await self.run_export()
+        FakeRentalRepository.visible.add(4)
+        await self.run_export()
+        self.assertEqual(self.exported, [1, 2, 5, 6, 3, 4])
+        names = sorted(name for _, _, files in os.walk(self.directory) for name in files if name.startswith("part-"))
+        self.assertEqual(names, ["part-000000000001.parquet", "part-000000000001.parquet",
+                                 "part-000000000007-1.parquet", "part-000000000007.parquet"])
+
+    async def test_watermark_without_recent_ids_continues_after_the_last_id(self):
+        with open(os.path.join(self.directory, export.WATERMARK_FILE), "w", encoding="utf-8") as file:
+            json.dump({"last_id": 5, "format": "parquet", "relations": []}, file)
+        FakeRentalRepository.visible = set(range(1, 9))
+        await self.run_export()
+        self.assertEqual(self.exported, [6, 7, 8])
+        self.assertEqual(self.watermark()["recent_ids"], [6, 7, 8])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+"""
+JobRunner against an in-memory job table: claim, run, failure, timeout,
+requeue on shutdown, and workers that keep going when the database fails
+while a job's final status is being stored.
+
+    python -m unittest discover tests
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import app.core.jobs as jobs
+from app.core.jobs import JobRunner
+
+
+class FakeJobRepository:
+    """In-memory `job` table, with failures injectable per method."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.failures = {}
+
+    def add(self, kind, params=None):
+        job_id = len(self.jobs) + 1
+        self.jobs[job_id] = SimpleNamespace(
+            id=job_id, kind=kind, params=params or {}, status="queued", attempts=0,
+            result_file=None, result_rows=None, error=None,
+        )
+        return job_id
+
+    def _fail(self, method):
+        # Each scheduled failure is used up by one call; "always" never runs out.
+        pending = self.failures.get(method)
+        if pending == "always":
+            raise ConnectionError(f"{method}: lost connection")
+        if pending:
+            self.failures[method] = pending - 1
+            raise ConnectionError(f"{method}: lost connection")
+
+    async def requeue_stale(self, older_than_seconds, max_attempts):
+        return 0
+
+    async def claim_next(self):
+        await asyncio.sleep(0)
+        self._fail("claim_next")
+        for job in self.jobs.values():
+            if job.status == "queued":
+                job.status, job.attempts = "running", job.attempts + 1
+                return job
+        return None
+
+    async def mark_done(self, job_id, result_file, rows):
+        self._fail("mark_done")
+        job = self.jobs[job_id]
+        job.status, job.result_file, job.result_rows = "done", result_file, rows
+
+    async def mark_failed(self, job_id, error):
+        self._fail("mark_failed")
+        job = self.jobs[job_id]
+        job.status, job.error = "failed", error
+
+    async def requeue(self, job_id):
+        self._fail("requeue")
+        job = self.jobs[job_id]
+        if job.status == "running":
+            job.status = "queued"
+
+
+async def write_rows(job, path):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("[]")
+    return 3
+
+
+async def fail(job, path):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("partial")
+    raise ValueError("bad params")
+
+
+async def hang(job, path):
+    await asyncio.sleep(3600)
+
+
+class JobRunnerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.repo = FakeJobRepository()
+        self.result_dir = tempfile.mkdtemp()
+        self._retry = jobs.JOB_STATUS_RETRY_SECONDS
+        jobs.JOB_STATUS_RETRY_SECONDS = 0
+        self.runner = None
+
+    async def asyncTearDown(self):
+        if self.runner is not None:
+            await self.runner.close()
+        jobs.JOB_STATUS_RETRY_SECONDS = self._retry
+
+    async def start(self, workers=1, timeout=5):
+        self.runner = JobRunner(
+            lambda: self.repo,
+            {"write": write_rows, "fail": fail, "hang": hang},
+            workers=workers, result_dir=self.result_dir, timeout=timeout, poll_interval=0.01,
+        )
+        await self.runner.start()
+
+    async def wait_for(self, condition, timeout=2.0):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not condition():
+            if asyncio.get_running_loop().time() > deadline:
+                self.fail(f"timed out; jobs: {self.repo.jobs}")
+            await asyncio.sleep(0.005)
+
+    def status(self, job_id):
+        return self.repo.jobs[job_id].status
+
+    async def test_runs_a_queued_job_and_stores_its_result(self):
+        job_id = self.repo.add("write", {"format": "json"})
+        await self.start()
+        await self.wait_for(lambda: self.status(job_id) == "done")
+        job = self.repo.jobs[job_id]
+        self.assertEqual((job.result_file, job.result_rows, job.attempts), (f"{job_id}.json", 3, 1))
+        self.assertEqual(os.listdir(self.result_dir), [f"{job_id}.json"])
+
+    async def test_failing_handler_marks_the_job_failed_and_removes_the_partial_file(self):
+        job_id = self.repo.add("fail")
+        await self.start()
+        with self.assertLogs("app.core.jobs", "ERROR"):
+            await self.wait_for(lambda: self.status(job_id) == "failed")
+        self.assertEqual(self.repo.jobs[job_id].error, "bad params")
+        self.assertEqual(os.listdir(self.result_dir), [])
+
+    async def test_unknown_kind_and_timeout_fail_the_job(self):
+        unknown = self.repo.add("nope")
+        slow = self.repo.add("hang")
+        await self.start(timeout=0.05)
+        await self.wait_for(lambda: self.status(unknown) == "failed" and self.status(slow) == "failed")
+        self.assertEqual(self.repo.jobs[unknown].error, "Unknown job kind 'nope'")
+        self.assertEqual(self.repo.jobs[slow].error, "Timed out after 0.05s")
+
+    async def test_storing_the_status_is_retried(self):
+        self.repo.failures["mark_done"] = jobs.JOB_STATUS_ATTEMPTS - 1
+        job_id = self.repo.add("write")
+        await self.start()
+        await self.wait_for(lambda: self.status(job_id) == "done")
+
+    async def test_worker_keeps_running_when_the_database_fails(self):
+        self.repo.failures["mark_failed"] = "always"
+        self.repo.failures["claim_next"] = 1
+        broken = [self.repo.add("fail") for _ in range(3)]
+        with self.assertLogs("app.core.jobs", "ERROR") as logs:
+            await self.start(workers=2)
+            await self.wait_for(lambda: all(self.status(job_id) == "running" for job_id in broken)
+                                and not any(job.status == "queued" for job in self.repo.jobs.values()))
+            self.repo.failures.clear()
+            job_id = self.repo.add("write")
+            self.runner.notify()
+            await self.wait_for(lambda: self.status(job_id) == "done")
+        self.assertTrue(any("Could not claim" in message for message in logs.output))
+        self.assertTrue(any("Could not mark job" in message for message in logs.output))
+        self.assertTrue(all(not task.done() for task in self.runner._tasks))
+
+    async def test_close_puts_the_running_job_back_in_the_queue(self):
+        job_id = self.repo.add("hang")
+        await self.start()
+        await self.wait_for(lambda: self.status(job_id) == "running")
+        await asyncio.sleep(0.01)
+        await self.runner.close()
+        self.assertEqual(self.status(job_id), "queued")
+        self.assertEqual(os.listdir(self.result_dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
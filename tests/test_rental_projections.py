@@ -0,0 +1,233 @@
+"""
+Rental projections (summary, availability) kept by RentalRepository writes:
+concurrent updates of the same rental apply each change exactly once, and
+rental writes made by another worker mark the projections stale.
+
+    python -m unittest discover tests
+
+The database is an in-memory rental table with FOR UPDATE row locks held
+until commit; every statement yields to the event loop, so concurrent
+updates interleave the way they would over the network. Redis is an
+in-memory stand-in for the commands RedisVersions sends.
+"""
+import asyncio
+import re
+import unittest
+from datetime import date
+
+from app.core.projections import RentalProjections
+from app.core.versions import RedisVersions
+from app.database.pool import InstrumentedPool
+from app.repositories.rental_repository import RentalRepository
+from app.schemas.rental import RentalUpdate
+
+UPDATES = 20
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+        self.rowcount = 0
+
+    async def execute(self, sql, params=()):
+        await asyncio.sleep(0)
+        db, self.rows = self.conn.db, []
+        if sql.startswith("SELECT * FROM rental WHERE id = %s FOR UPDATE"):
+            (rental_id,) = params
+            if rental_id in db.rentals and rental_id not in self.conn.held:
+                await db.locks[rental_id].acquire()
+                self.conn.held.add(rental_id)
+            self.rows = [dict(db.rentals[rental_id])] if rental_id in db.rentals else []
+        elif sql.startswith("UPDATE rental SET"):
+            columns = re.findall(r"(\w+) = %s", sql.split(" WHERE ")[0])
+            rental = db.rentals[params[-1]]
+            rental.update(zip(columns, params))
+            rental["version"] += 1
+            self.rows = []
+        else:
+            raise AssertionError(f"Unexpected statement: {sql}")
+        self.rowcount = len(self.rows)
+        return self.rowcount
+
+    async def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    async def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+        self.held = set()
+
+    def cursor(self, *args):
+        return FakeCursor(self)
+
+    def _release_locks(self):
+        for rental_id in self.held:
+            self.db.locks[rental_id].release()
+        self.held.clear()
+
+    async def begin(self):
+        pass
+
+    async def commit(self):
+        self._release_locks()
+
+    async def rollback(self):
+        self._release_locks()
+
+    def close(self):
+        self._release_locks()
+
+
+class FakePool:
+    """In-memory rental table behind the subset of the aiomysql.Pool API that InstrumentedPool uses."""
+
+    minsize, maxsize, size, freesize = 0, UPDATES, 0, 0
+
+    def __init__(self, rentals):
+        self.rentals = {rental["id"]: rental for rental in rentals}
+        self.locks = {rental_id: asyncio.Lock() for rental_id in self.rentals}
+        self.db = self
+
+    async def acquire(self):
+        return FakeConnection(self)
+
+    def release(self, conn):
+        pass
+
+
+def rental(rental_id, vehicle_id, value):
+    return dict(
+        id=rental_id, rent_date=date(2099, 1, 1), return_date=date(2099, 1, 5), rent_value=value,
+        id_user=1, id_vehicle=vehicle_id, id_employee=1, version=1,
+    )
+
+
+class ConcurrentUpdatesTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.pool = FakePool([rental(1, 1, 100), rental(2, 2, 50)])
+        self.projections = RentalProjections()
+        self.projections.summary.load(150, [
+            dict(id_vehicle=1, brand="F", model="A", rental_count=1),
+            dict(id_vehicle=2, brand="G", model="B", rental_count=1),
+        ])
+        self.repo = RentalRepository(InstrumentedPool(self.pool), projections=self.projections)
+
+    async def test_concurrent_value_updates_are_applied_once(self):
+        await asyncio.gather(*(
+            self.repo.update(1, RentalUpdate(rent_value=1000 + n)) for n in range(UPDATES)
+        ))
+        rentals = self.pool.rentals.values()
+        self.assertIn(self.pool.rentals[1]["rent_value"], range(1000, 1000 + UPDATES))
+        self.assertEqual(self.pool.rentals[1]["version"], 1 + UPDATES)
+        self.assertEqual(self.projections.summary.total_revenue, sum(r["rent_value"] for r in rentals))
+
+    async def test_rental_without_vehicle_can_be_updated(self):
+        self.pool.rentals[2]["id_vehicle"] = None
+        updated = await self.repo.update(2, RentalUpdate(rent_value=70))
+        self.assertEqual((updated.id_vehicle, updated.rent_value, updated.version), (None, 70, 2))
+        self.assertEqual(self.projections.summary.total_revenue, 170)
+
+    async def test_concurrent_updates_of_a_missing_rental_change_nothing(self):
+        results = await asyncio.gather(*(self.repo.update(3, RentalUpdate(rent_value=10)) for _ in range(3)))
+        self.assertEqual(results, [None] * 3)
+        self.assertEqual(self.projections.summary.total_revenue, 150)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def set(self, key, value, nx=False):
+        if not (nx and key in self.values):
+            self.values[key] = value
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def hincrby(self, key, field, amount):
+        self.commands.append((key, lambda hash: hash.__setitem__(field, int(hash.get(field, 0)) + amount)))
+
+    def hset(self, key, field, value):
+        self.commands.append((key, lambda hash: hash.__setitem__(field, value)))
+
+    def hmget(self, key, *fields):
+        self.commands.append((key, lambda hash: [hash.get(field) for field in fields]))
+
+    async def execute(self):
+        await asyncio.sleep(0)
+        return [command(self.redis.values.setdefault(key, {})) for key, command in self.commands]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+class OtherWorkersTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        redis = FakeRedis()
+        self.versions, self.other_worker = RedisVersions(redis), RedisVersions(redis)
+        self.projections = RentalProjections(max_age=60)
+        self.projections.mark_fresh(self.projections.generation)
+
+    async def test_only_writes_of_other_workers_mark_the_projections_stale(self):
+        self.assertFalse(await self.projections.check_versions(self.versions))
+        await self.versions.bump(("rental",))
+        self.assertFalse(await self.projections.check_versions(self.versions))
+        self.assertFalse(self.projections.needs_refresh())
+
+        await self.other_worker.bump(("vehicle", "rental"))
+        self.assertTrue(await self.projections.check_versions(self.versions))
+        self.assertTrue(self.projections.needs_refresh())
+        self.projections.mark_fresh(self.projections.generation)
+        self.assertFalse(await self.projections.check_versions(self.versions))
+
+    async def test_own_write_still_on_its_way_to_redis_is_not_taken_for_another_workers(self):
+        self.assertFalse(await self.projections.check_versions(self.versions))
+        # Counted in this process, not yet stored in Redis.
+        self.versions.own_bumps["rental"] = 1
+        self.assertFalse(await self.projections.check_versions(self.versions))
+        self.versions.own_bumps.clear()
+        await self.versions.bump(("rental",))
+        self.assertFalse(await self.projections.check_versions(self.versions))
+        self.assertFalse(self.projections.stale)
+
+    async def test_unreadable_versions_leave_the_projections_alone(self):
+        async def current(tables):
+            raise ConnectionError("redis is down")
+
+        self.versions.current = current
+        with self.assertLogs("app.core.projections", "WARNING"):
+            self.assertFalse(await self.projections.check_versions(self.versions))
+        self.assertFalse(self.projections.stale)
+
+    def test_projections_are_rebuilt_after_max_age(self):
+        self.assertFalse(self.projections.needs_refresh())
+        self.projections.last_refresh -= 60
+        self.assertTrue(self.projections.needs_refresh())
+
+
+if __name__ == "__main__":
+    unittest.main()